@@ -0,0 +1,131 @@
+import logging
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from .Comment_Batch import Comment_Batch
+from .Subreddit_Data_Collector import Subreddit_Data_Collector
+from .Task_Metrics import Task_Metrics
+
+
+class Rate_Limiter():
+    """
+    Thread safe token bucket shared by every worker that talks to the Reddit API.
+
+    Reddit grants each OAuth client a fixed number of requests per minute, the bucket
+    refills at that rate and allows a small burst so that idle workers can catch up.
+
+    Args:
+        calls_per_minute (int): The sustained number of calls allowed per minute.
+        burst (int): The maximum number of calls that may be made back to back.
+    """
+
+    def __init__(self, calls_per_minute: int = 60, burst: int = 10) -> None:
+        self.__rate = calls_per_minute / 60.0
+        self.__capacity = float(burst)
+        self.__tokens = float(burst)
+        self.__last = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a call may be made.
+
+        Returns:
+            float: The number of seconds spent waiting for a token.
+        """
+        waited = 0.0
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.__capacity,
+                                    self.__tokens + (now - self.__last) * self.__rate)
+                self.__last = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return waited
+                delay = (1 - self.__tokens) / self.__rate
+            time.sleep(delay)
+            waited += delay
+
+
+class Collection_Pool():
+    """
+    Crawls several subreddits at once with a bounded pool of worker threads.
+
+    Every worker shares the same `Subreddit_Data_Collector`, which gives each worker thread its
+    own PRAW client but the same `Rate_Limiter`, so adding workers never takes the task over
+    the per client quota.
+    A subreddit that raises is logged and reported back instead of aborting the task.
+
+    Args:
+        collector (Subreddit_Data_Collector): The collector used by every worker.
+        max_workers (int): The maximum number of subreddits crawled at the same time.
+        metrics (Task_Metrics): Times the streamed collection of each subreddit.
+    """
+
+    def __init__(self, collector: Subreddit_Data_Collector, max_workers: int = 4, metrics: Task_Metrics = None) -> None:
+        self.__collector = collector
+        self.__max_workers = max(1, max_workers)
+        self.__metrics = metrics if metrics is not None else Task_Metrics()
+
+    def stream(self, subreddits: list[str], sink: queue.Queue, chunk_size: int,
+               stop: threading.Event = None, **params) -> None:
+        """
+        Collects the comment data for every subreddit, feeding it into `sink` as it is harvested.
+
+        Each subreddit produces `('chunk', sub, Comment_Batch)` items of at most `chunk_size`
+        comments, followed by `('done', sub, None)`, or by `('failed', sub, traceback)` if it raised.
+        A bounded `sink` applies back pressure to the workers. Blocks until every subreddit is
+        finished or `stop` is set.
+
+        Args:
+            subreddits (list[str]): The display names of the subreddits to crawl.
+            sink (queue.Queue): The queue that receives the harvested chunks.
+            chunk_size (int): The number of comments per chunk.
+            stop (threading.Event): Set by the consumer to abandon the collection.
+            **params: Passed through to `Subreddit_Data_Collector.iter_Comment_Data`.
+        """
+        stop = stop if stop is not None else threading.Event()
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as pool, \
+                tqdm(total=len(subreddits), desc="Collection Pool") as t:
+            futures = [pool.submit(self.__stream_subreddit, sub, sink, chunk_size, stop, params)
+                       for sub in subreddits]
+            for _ in as_completed(futures):
+                t.update(1)
+
+    def __stream_subreddit(self, sub: str, sink: queue.Queue, chunk_size: int, stop: threading.Event, params: dict) -> None:
+        try:
+            # the wall time includes any wait on a full `sink`
+            with self.__metrics.stage('collection', sub) as stage:
+                chunk = []
+                for comment in self.__collector.iter_Comment_Data(display_name=sub, **params):
+                    if stop.is_set():
+                        return
+                    stage.items += 1
+                    chunk.append(comment)
+                    if len(chunk) == chunk_size:
+                        put_until_stopped(sink, ('chunk', sub, Comment_Batch.from_comments(chunk)), stop)
+                        chunk = []
+                if len(chunk) > 0:
+                    put_until_stopped(sink, ('chunk', sub, Comment_Batch.from_comments(chunk)), stop)
+            put_until_stopped(sink, ('done', sub, None), stop)
+        except Exception:
+            failure = traceback.format_exc()
+            logging.error(f"UNABLE TO COLLECT: {sub}\n{failure}")
+            put_until_stopped(sink, ('failed', sub, failure), stop)
+
+
+def put_until_stopped(sink: queue.Queue, item, stop: threading.Event, poll: float = 0.5) -> bool:
+    """Puts `item` on a bounded queue, giving up if `stop` is set while the queue is full."""
+    while not stop.is_set():
+        try:
+            sink.put(item, timeout=poll)
+            return True
+        except queue.Full:
+            continue
+    return False
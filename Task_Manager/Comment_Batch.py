@@ -0,0 +1,79 @@
+import sys
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from .Subreddit_Data_Collector import commentData
+
+
+class Comment_Batch():
+    """
+    Columnar batch of comments passed between the collector, the inferencer and the database writers.
+
+    Each field of `commentData` is held as one column instead of one object per comment. Usernames
+    are interned so repeat authors share a single string, `mhs_score` is a float32 array holding NaN
+    for comments without a score, and `edited` is a bool array.
+
+    Args:
+        comment_body (list[str]): The sanitized text of each comment.
+        username (list[str]): The author of each comment.
+        permalink (list[str]): The permalink of each comment.
+        mhs_score (np.ndarray): The score of each comment, NaN where there is none.
+        edited (np.ndarray): Whether each comment was edited.
+        reddit_id (list[str]): The reddit id of each comment, None where it is unknown.
+    """
+
+    __slots__ = ('comment_body', 'username', 'permalink', 'mhs_score', 'edited', 'reddit_id')
+
+    def __init__(self, comment_body: list[str] = None, username: list[str] = None, permalink: list[str] = None,
+                 mhs_score: np.ndarray = None, edited: np.ndarray = None, reddit_id: list[str] = None) -> None:
+        self.comment_body = comment_body if comment_body is not None else []
+        self.username = username if username is not None else []
+        self.permalink = permalink if permalink is not None else []
+        n = len(self.comment_body)
+        self.mhs_score = mhs_score if mhs_score is not None else np.full(n, np.nan, dtype=np.float32)
+        self.edited = edited if edited is not None else np.zeros(n, dtype=np.bool_)
+        self.reddit_id = reddit_id if reddit_id is not None else [None] * n
+
+    @classmethod
+    def from_comments(cls, comments: Iterable[commentData]) -> 'Comment_Batch':
+        """Builds a batch from `commentData` objects, a missing score becomes NaN."""
+        comments = list(comments)
+        return cls(comment_body=[c.comment_body for c in comments],
+                   username=[sys.intern(c.username) for c in comments],
+                   permalink=[c.permalink for c in comments],
+                   mhs_score=np.array([np.nan if c.mhs_score is None else c.mhs_score for c in comments],
+                                      dtype=np.float32),
+                   edited=np.array([bool(c.edited) for c in comments], dtype=np.bool_),
+                   reddit_id=[c.reddit_id for c in comments])
+
+    @classmethod
+    def concat(cls, batches: list['Comment_Batch']) -> 'Comment_Batch':
+        """Joins the batches, in order, into one batch."""
+        if len(batches) == 1:
+            return batches[0]
+        return cls(comment_body=[body for b in batches for body in b.comment_body],
+                   username=[name for b in batches for name in b.username],
+                   permalink=[link for b in batches for link in b.permalink],
+                   mhs_score=np.concatenate([b.mhs_score for b in batches]
+                                            or [np.empty(0, dtype=np.float32)]),
+                   edited=np.concatenate([b.edited for b in batches]
+                                         or [np.empty(0, dtype=np.bool_)]),
+                   reddit_id=[reddit_id for b in batches for reddit_id in b.reddit_id])
+
+    def scored(self) -> np.ndarray:
+        """Returns the scores of the comments that have one."""
+        return self.mhs_score[~np.isnan(self.mhs_score)]
+
+    def __len__(self) -> int:
+        return len(self.comment_body)
+
+    def __iter__(self) -> Iterator[commentData]:
+        for i in range(len(self)):
+            score = self.mhs_score[i]
+            yield commentData(comment_body=self.comment_body[i],
+                              username=self.username[i],
+                              permalink=self.permalink[i],
+                              mhs_score=None if np.isnan(score) else float(score),
+                              edited=bool(self.edited[i]),
+                              reddit_id=self.reddit_id[i])
@@ -0,0 +1,146 @@
+import logging
+import re
+
+from django.db import connections, transaction
+
+from gather.models import Comment_result
+
+# the bounds of a range partition as given by `pg_get_expr(relpartbound, oid)`
+BOUND = re.compile(r"FROM \('?(\d+)'?\) TO \('?(\d+)'?\)")
+
+
+class Comment_Partitions():
+    """
+    Optional PostgreSQL declarative partitioning of `Comment_result` by ranges of task ids.
+
+    Task ids grow with time, so each partition holds the comments of `tasks_per_partition`
+    consecutive tasks. Queries on recent tasks only touch recent partitions, and the comments
+    of old tasks are removed by detaching their partitions instead of a large DELETE.
+
+    The table is converted once with `convert`, from the `partition_comment_results` command.
+    `ensure` is called before each task is written and creates the task's partition when the
+    table is partitioned, on any other table or database every method does nothing.
+
+    Args:
+        tasks_per_partition (int): The number of task ids in each new partition.
+        using (str): The database alias of the table.
+    """
+
+    def __init__(self, tasks_per_partition: int = 100, using: str = 'default') -> None:
+        self.__size = tasks_per_partition
+        self.__using = using
+        self.__table = Comment_result._meta.db_table
+
+    @property
+    def partitioned(self) -> bool:
+        if connections[self.__using].vendor != 'postgresql':
+            return False
+        with connections[self.__using].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [self.__table])
+            return cursor.fetchone() is not None
+
+    def partitions(self) -> list[tuple[str, int, int]]:
+        """Returns the name and task id range `[low, high)` of every range partition, in order."""
+        with connections[self.__using].cursor() as cursor:
+            cursor.execute("SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+                           "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+                           [self.__table])
+            partitions = []
+            for name, bound in cursor.fetchall():
+                match = BOUND.search(bound)
+                if match is not None:
+                    partitions.append((name, int(match.group(1)), int(match.group(2))))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    def ensure(self, task_id: int) -> None:
+        """Creates the partition holding `task_id` if the table is partitioned and it is missing."""
+        if not self.partitioned:
+            return
+        low, high = self.range(task_id, [(low, high) for name, low, high in self.partitions()])
+        if low is None:
+            return
+        quote_name = connections[self.__using].ops.quote_name
+        with connections[self.__using].cursor() as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {quote_name(f'{self.__table}_t{low}')} "
+                           f"PARTITION OF {quote_name(self.__table)} FOR VALUES FROM ({int(low)}) TO ({int(high)})")
+
+    def range(self, task_id: int, ranges: list[tuple[int, int]]) -> tuple[int, int]:
+        """
+        Returns the range of the partition to create for `task_id`, aligned to `tasks_per_partition`
+        and clipped to the existing ranges, or `(None, None)` if a partition already holds it.
+        """
+        low = task_id // self.__size * self.__size
+        high = low + self.__size
+        for start, end in ranges:
+            if start <= task_id < end:
+                return None, None
+            if end <= task_id:
+                low = max(low, end)
+            if start > task_id:
+                high = min(high, start)
+        return low, high
+
+    def convert(self) -> None:
+        """
+        Converts the table into one partitioned by `inference_task_id`, moving the existing rows
+        into partitions and keeping the names of its indexes and foreign keys. The table is locked
+        for the duration.
+        """
+        if connections[self.__using].vendor != 'postgresql' or self.partitioned:
+            return
+        table = self.__table
+        old = f"{table}_unpartitioned"
+        sequence = f"{table}_id_part_seq"
+        with transaction.atomic(using=self.__using), connections[self.__using].cursor() as cursor:
+            cursor.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+                           "(SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))", [table, table])
+            indexes = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                           "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [table])
+            foreign_keys = cursor.fetchall()
+            cursor.execute("SELECT COALESCE(MIN(inference_task_id), 0), COALESCE(MAX(inference_task_id), 0), "
+                           f'COALESCE(MAX(id), 0) FROM "{table}"')
+            first_task, last_task, last_id = cursor.fetchone()
+
+            cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+            # partitioned tables cannot have identity columns, the ids continue from a sequence instead
+            cursor.execute(f'CREATE SEQUENCE "{sequence}"')
+            cursor.execute("SELECT setval(%s, %s, false)", [sequence, last_id + 1])
+            cursor.execute(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS) '
+                           "PARTITION BY RANGE (inference_task_id)")
+            cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{sequence}"\')')
+            cursor.execute(f'ALTER SEQUENCE "{sequence}" OWNED BY "{table}".id')
+            cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, inference_task_id)')
+            cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+            for low in range(first_task // self.__size * self.__size, last_task + 1, self.__size):
+                cursor.execute(f'CREATE TABLE "{table}_t{low}" PARTITION OF "{table}" '
+                               f"FOR VALUES FROM ({low}) TO ({low + self.__size})")
+
+            cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+            cursor.execute(f'DROP TABLE "{old}"')
+            # read before the rename, so they name the partitioned table
+            for indexdef in indexes:
+                cursor.execute(indexdef)
+            for name, definition in foreign_keys:
+                cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+        logging.info(f"Partitioned {table} by ranges of {self.__size} tasks")
+
+    def detach(self, before_task_id: int) -> list[str]:
+        """
+        Detaches every partition holding only tasks before `before_task_id`. The detached tables
+        are kept, to be archived or dropped.
+
+        Returns:
+            list[str]: The names of the detached tables.
+        """
+        if not self.partitioned:
+            return []
+        detached = []
+        quote_name = connections[self.__using].ops.quote_name
+        with connections[self.__using].cursor() as cursor:
+            for name, low, high in self.partitions():
+                if high <= before_task_id:
+                    cursor.execute(f"ALTER TABLE {quote_name(self.__table)} DETACH PARTITION {quote_name(name)}")
+                    detached.append(name)
+        return detached
@@ -0,0 +1,85 @@
+from typing import Iterable, Iterator
+
+from django.db import connections, models
+
+
+class Copy_Writer():
+    """
+    Writes rows of a model straight into its table with PostgreSQL's `COPY ... FROM STDIN`.
+
+    Rows are tuples in the order of `fields`, with the primary key in place of a foreign key.
+    They are formatted as CSV lazily and streamed to `copy_expert` through a file-like buffer,
+    so no INSERT statement or model instance is built in Python. On any other database, such
+    as SQLite in tests, the rows fall back to a batched `bulk_create`.
+
+    Args:
+        model (models.Model): The model whose table receives the rows.
+        fields (list[str]): The name of the field of each column, in row order.
+        batch_size (int): The rows per INSERT when falling back to `bulk_create`.
+        using (str): The database alias to write to.
+        enabled (bool): Set to False to always use `bulk_create`.
+    """
+
+    def __init__(self, model: models.Model, fields: list[str], batch_size: int = 1000, using: str = 'default',
+                 enabled: bool = True) -> None:
+        self.__model = model
+        self.__fields = [model._meta.get_field(name) for name in fields]
+        self.__batch_size = batch_size
+        self.__using = using
+        self.__enabled = enabled
+
+    @property
+    def supported(self) -> bool:
+        """Whether the database can take rows through `COPY`."""
+        return self.__enabled and connections[self.__using].vendor == 'postgresql'
+
+    def write(self, rows: Iterable[tuple]) -> None:
+        if not self.supported:
+            attnames = [field.attname for field in self.__fields]
+            self.__model.objects.using(self.__using).bulk_create(
+                (self.__model(**dict(zip(attnames, row))) for row in rows),
+                batch_size=self.__batch_size)
+            return
+
+        quote_name = connections[self.__using].ops.quote_name
+        columns = ", ".join(quote_name(field.column) for field in self.__fields)
+        sql = f"COPY {quote_name(self.__model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+        with connections[self.__using].cursor() as cursor:
+            cursor.copy_expert(sql, Row_Stream(csv_line(row) for row in rows))
+
+
+class Row_Stream():
+    """Read-only file-like object over a generator of strings, as consumed by `copy_expert`."""
+
+    def __init__(self, lines: Iterator[str]) -> None:
+        self.__lines = lines
+        self.__buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.__buffer) < size:
+            line = next(self.__lines, None)
+            if line is None:
+                break
+            self.__buffer += line
+        if size < 0:
+            size = len(self.__buffer)
+        data, self.__buffer = self.__buffer[:size], self.__buffer[size:]
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        return self.read(size)
+
+
+def csv_line(row: tuple) -> str:
+    """Formats a row for `COPY ... WITH (FORMAT csv)`, where only an unquoted empty field is NULL."""
+    fields = []
+    for value in row:
+        if value is None:
+            fields.append("")
+        elif isinstance(value, str):
+            fields.append('"' + value.replace('"', '""') + '"')
+        elif isinstance(value, bool):
+            fields.append("t" if value else "f")
+        else:
+            fields.append(str(value))
+    return ",".join(fields) + "\n"
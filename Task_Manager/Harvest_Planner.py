@@ -0,0 +1,98 @@
+import math
+from typing import Iterable, Iterator
+
+from praw.models import Submission
+
+
+class Harvest_Planner():
+    """
+    Plans which posts to fetch to harvest `comments_n` comments with as few Reddit API calls as possible.
+
+    A post from the listing already carries its `num_comments`, so the comments a post can
+    yield are estimated before it is fetched, as `min(num_comments, per_post_n)` times the
+    share of fetched comments that were eligible so far. The listing is only read as far as
+    needed for the planned posts to cover the remaining budget, and posts without comments are
+    never fetched. The planned posts are fetched in rank order, each asking for a fair share of
+    the remaining budget: the budget is spread evenly over the posts left in the plan, and only
+    the share that the smaller posts cannot yield is made up by the larger ones, so the sample
+    follows the ranking rather than the biggest threads. Once the budget is reached no further
+    page of the listing, or post, is requested.
+
+    Args:
+        comments_n (int): The number of comments to harvest.
+        per_post_n (int): The maximum number of comments fetched per post.
+        window (int): The most posts planned ahead, one page of a listing is 100 posts.
+        prior_rate (float): The share of comments assumed eligible before any post is fetched.
+        prior_weight (int): The number of comments that the prior is worth against the observed ones.
+    """
+
+    def __init__(self, comments_n: int, per_post_n: int, window: int = 100, prior_rate: float = 0.5,
+                 prior_weight: int = 20) -> None:
+        self.__comments_n = comments_n
+        self.__per_post_n = per_post_n
+        self.__window = window
+        self.__prior_rate = prior_rate
+        self.__prior_weight = prior_weight
+        self.__expected = 0
+        self.__limit = per_post_n
+        self.harvested = 0
+        self.fetched = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.__comments_n - self.harvested)
+
+    @property
+    def rate(self) -> float:
+        """The estimated share of a post's comments that are eligible."""
+        rate = (self.harvested + self.__prior_rate * self.__prior_weight) / (self.__expected + self.__prior_weight)
+        return min(1.0, max(0.01, rate))
+
+    def plan(self, posts: Iterable[Submission]) -> Iterator[tuple[Submission, int]]:
+        """
+        Yields each post to fetch with the number of comments to ask for, until the budget is
+        reached or the listing runs out. `record` must be called after each post is harvested.
+        """
+        posts = iter(posts)
+        window = []
+        listed = False
+        while self.remaining > 0:
+            # only list as far as needed for the planned posts to cover the budget
+            while not listed and len(window) < self.__window \
+                    and self.rate * sum(self.__available(post) for post in window) < self.remaining:
+                post = next(posts, None)
+                if post is None:
+                    listed = True
+                elif self.__available(post) > 0:
+                    window.append(post)
+            if len(window) == 0:
+                return
+
+            post = window[0]
+            limit = min(self.__available(post), self.__share(window))
+            window.pop(0)
+            self.__limit = limit
+            yield post, limit
+
+    def record(self, post: Submission, retained: int) -> None:
+        """Records the number of comments kept from a fetched post."""
+        self.fetched += 1
+        self.harvested += retained
+        self.__expected += min(self.__available(post), self.__limit)
+
+    def __share(self, window: list[Submission]) -> int:
+        # the most comments each planned post asks for, so that together they are expected to cover
+        # the remaining budget, where a post that has fewer comments gives all of them
+        needed = self.remaining / self.rate
+        available = sorted(self.__available(post) for post in window)
+        for i, count in enumerate(available):
+            if count * (len(available) - i) >= needed:
+                return min(self.__per_post_n, max(1, math.ceil(needed / (len(available) - i))))
+            needed -= count
+        return self.__per_post_n
+
+    def __available(self, post: Submission) -> int:
+        num_comments = getattr(post, 'num_comments', None)
+        if num_comments is None:
+            return self.__per_post_n
+        return min(num_comments, self.__per_post_n)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MHS_Stub_Server():
+    """
+    Local stand-in for the MHS inference API, for benchmarks and tests of the `Inferencer`.
+
+    It speaks the same protocol as the real API, a POST of `{"instances": [...]}` answered with
+    `{"predictions": [[score], ...]}`. Each score is derived from a hash of the comment and the
+    seed, so the same comment always gets the same score. The server can be slowed down and
+    made to fail like the real one: every request takes `latency` plus `per_item_latency` per
+    comment, a share `error_rate` of requests fail with `error_status`, requests beyond
+    `max_concurrency` at once are refused with 429 and a `Retry-After`, and payloads of more than
+    `max_instances` comments or `max_chars` characters are refused with 413.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 for any free port.
+        seed (int): Seeds the scores and the injected errors.
+        low (float): The lowest score.
+        high (float): The highest score.
+        latency (float): The seconds every request takes.
+        per_item_latency (float): The seconds added per comment in a request.
+        error_rate (float): The share of requests that fail.
+        error_status (int): The status of a failed request.
+        max_concurrency (int): The most requests served at once, None for no limit.
+        max_instances (int): The most comments per request, None for no limit.
+        max_chars (int): The most characters per request, None for no limit.
+        api_key (str): The `apikey` header required of every request, None to accept any.
+
+    Attributes:
+        requests (int): The number of requests received.
+        peak_concurrency (int): The most requests that were served at once.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, seed: int = 0, low: float = -4.0, high: float = 4.0,
+                 latency: float = 0.0, per_item_latency: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 max_concurrency: int = None, max_instances: int = None, max_chars: int = None,
+                 api_key: str = None) -> None:
+        self.seed = seed
+        self.low = low
+        self.high = high
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_instances = max_instances
+        self.max_chars = max_chars
+        self.api_key = api_key
+        self.requests = 0
+        self.peak_concurrency = 0
+        self.__max_concurrency = max_concurrency
+        self.__active = 0
+        self.__lock = threading.Lock()
+        self.__random = random.Random(seed)
+        self.__server = ThreadingHTTPServer((host, port), self.__handler())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}/v1/models/mhs:predict"
+
+    def score(self, text: str) -> float:
+        """The score the server gives a comment."""
+        digest = hashlib.sha256(f"{self.seed}\0{text}".encode('UTF-8')).digest()
+        return self.low + (self.high - self.low) * int.from_bytes(digest[:8], 'big') / 2**64
+
+    def start(self) -> 'MHS_Stub_Server':
+        """Serves requests from a background thread."""
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="mhs-stub", daemon=True)
+        self.__thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.__server.serve_forever()
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def __enter__(self) -> 'MHS_Stub_Server':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def respond(self, headers: dict, body: bytes) -> tuple[int, dict, dict]:
+        """Returns the status, headers and JSON body answering a request."""
+        with self.__lock:
+            self.requests += 1
+            if self.__max_concurrency is not None and self.__active >= self.__max_concurrency:
+                return 429, {'Retry-After': '1'}, {"error": "Too many concurrent requests"}
+            fail = self.__random.random() < self.error_rate
+            self.__active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.__active)
+        try:
+            if self.api_key is not None and headers.get('apikey') != self.api_key:
+                return 401, {}, {"error": "Invalid api key"}
+            try:
+                instances = json.loads(body)["instances"]
+            except (ValueError, KeyError, TypeError):
+                return 400, {}, {"error": "Expected a JSON object with instances"}
+            if (self.max_instances is not None and len(instances) > self.max_instances) or \
+                    (self.max_chars is not None and sum(len(text) for text in instances) > self.max_chars):
+                return 413, {}, {"error": "Payload too large"}
+
+            delay = self.latency + self.per_item_latency * len(instances)
+            if delay > 0:
+                time.sleep(delay)
+            if fail:
+                return self.error_status, {}, {"error": "Injected failure"}
+            return 200, {}, {"predictions": [[self.score(text)] for text in instances]}
+        finally:
+            with self.__lock:
+                self.__active -= 1
+
+    def __handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, headers, data = server.respond(self.headers, body)
+                payload = json.dumps(data).encode('UTF-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logging.debug(f"MHS stub: {format % args}")
+
+        return Handler
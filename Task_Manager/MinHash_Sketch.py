@@ -0,0 +1,96 @@
+import hashlib
+from typing import Iterable
+
+import numpy as np
+
+# fixed so that sketches built by different workers or tasks are comparable
+SEED = 476
+
+
+class MinHash_Sketch():
+    """
+    Fixed size MinHash signature of a subreddit's author set.
+
+    The signature holds the minimum of `num_perm` independent 64 bit hashes over every
+    username, so the share of equal positions between two signatures estimates the Jaccard
+    similarity of the two author sets with a standard error of at most `0.5 / sqrt(num_perm)`.
+    Together with the number of distinct authors this estimates the size of the intersection
+    without keeping either set.
+
+    A set may be added whole with `update`, which keeps an exact count, or chunk by chunk with
+    `add`, where an author may appear in several chunks. The count is then estimated from the
+    signature as well.
+
+    Args:
+        num_perm (int): The number of hash functions in the signature.
+    """
+
+    __slots__ = ('signature', '_count', '_seeds')
+
+    def __init__(self, num_perm: int = 128) -> None:
+        self._seeds = np.random.default_rng(SEED).integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self.signature = np.full(num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        self._count = 0
+
+    @property
+    def num_perm(self) -> int:
+        return len(self.signature)
+
+    @property
+    def count(self) -> int:
+        """The number of distinct authors, estimated once any were added in chunks."""
+        if self._count is not None:
+            return self._count
+        if np.all(self.signature == np.iinfo(np.uint64).max):
+            return 0
+        # each minimum of n uniform hashes is about exponential with rate n, so (k - 1) over
+        # their sum is an unbiased estimate of n with a relative error of 1 / sqrt(k - 2)
+        minima = self.signature.astype(np.float64) / 2.0**64
+        return int(round((self.num_perm - 1) / minima.sum()))
+
+    @classmethod
+    def error_bound(cls, num_perm: int = 128, estimated_count: bool = False) -> float:
+        """
+        The worst case standard error of an estimated weight, relative to the sum of both set sizes,
+        which grows by the error of the counts when they are estimated.
+        """
+        bound = 0.5 / np.sqrt(num_perm)
+        if estimated_count:
+            bound += 0.5 / np.sqrt(num_perm - 2)
+        return bound
+
+    def update(self, usernames: Iterable[str]) -> None:
+        """
+        Adds a complete set of distinct authors to the sketch.
+
+        `count` is only exact if the usernames are not already in the sketch.
+        """
+        usernames = set(usernames)
+        if self._count is not None:
+            self._count += len(usernames)
+        self.__hash(usernames)
+
+    def add(self, usernames: Iterable[str]) -> None:
+        """Adds a chunk of authors, who may already be in the sketch, after which `count` is estimated."""
+        self._count = None
+        self.__hash(set(usernames))
+
+    def jaccard(self, other: 'MinHash_Sketch') -> float:
+        return float(np.mean(self.signature == other.signature))
+
+    def __hash(self, usernames: set[str]) -> None:
+        if len(usernames) == 0:
+            return
+        hashes = np.array([int.from_bytes(hashlib.blake2b(name.encode('UTF-8'), digest_size=8).digest(), 'little')
+                           for name in usernames], dtype=np.uint64)
+        # bound the temporary hash matrix for large author sets
+        for i in range(0, len(hashes), 4096):
+            mixed = self.__mix(hashes[i:i + 4096, None] ^ self._seeds[None, :])
+            np.minimum(self.signature, mixed.min(axis=0), out=self.signature)
+
+    def __mix(self, x: np.ndarray) -> np.ndarray:
+        # splitmix64 finaliser, numpy's uint64 arithmetic wraps like the reference implementation
+        with np.errstate(over='ignore'):
+            x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+            x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+            return x ^ (x >> np.uint64(31))
@@ -0,0 +1,81 @@
+from typing import Iterable
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .MinHash_Sketch import MinHash_Sketch
+
+
+class Overlap_Engine():
+    """
+    Computes the pairwise overlap between the user sets of many subreddits at once.
+
+    Usernames are mapped to integer IDs and the sets are laid out as a sparse
+    subreddit x user incidence matrix `M`. Every pairwise intersection size is then an
+    entry of `M @ M.T`, which replaces a Python loop over every pair of subreddits with a
+    single sparse matrix product. `sketch_overlaps` estimates the same weights from
+    `MinHash_Sketch` signatures when the sets are too large to keep.
+
+    Args:
+        min_weight (int): Pairs with fewer users in common than this are dropped.
+    """
+
+    def __init__(self, min_weight: int = 1) -> None:
+        self.__min_weight = max(1, min_weight)
+
+    def overlaps(self, memberships: dict[str, Iterable[str]]) -> list[tuple[str, str, int]]:
+        """
+        Returns every pair of keys sharing at least `min_weight` users.
+
+        Args:
+            memberships (dict[str, Iterable[str]]): The users of each subreddit.
+
+        Returns:
+            list[tuple[str, str, int]]: `(from_key, to_key, weight)` for every pair, with `from_key`
+            before `to_key` in the order of `memberships`.
+        """
+        keys = list(memberships.keys())
+        if len(keys) < 2:
+            return []
+        user_ids = {}
+        rows = []
+        cols = []
+        for row, key in enumerate(keys):
+            for user in set(memberships[key]):
+                rows.append(row)
+                cols.append(user_ids.setdefault(user, len(user_ids)))
+
+        incidence = csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                               shape=(len(keys), len(user_ids)))
+        weights = (incidence @ incidence.T).tocoo()
+
+        # the product is symmetric and its diagonal is each set's own size
+        keep = (weights.row < weights.col) & (weights.data >= self.__min_weight)
+        order = np.lexsort((weights.col[keep], weights.row[keep]))
+        return [(keys[i], keys[j], int(w))
+                for i, j, w in zip(weights.row[keep][order], weights.col[keep][order], weights.data[keep][order])]
+
+    def sketch_overlaps(self, sketches: dict[str, MinHash_Sketch]) -> list[tuple[str, str, int]]:
+        """
+        Estimates every pair of keys sharing at least `min_weight` users from their sketches.
+
+        The intersection of two sets with Jaccard similarity `J` is `J / (1 + J) * (|A| + |B|)`.
+
+        Args:
+            sketches (dict[str, MinHash_Sketch]): The sketch of each subreddit's users.
+
+        Returns:
+            list[tuple[str, str, int]]: `(from_key, to_key, weight)` like `overlaps`.
+        """
+        keys = list(sketches.keys())
+        if len(keys) < 2:
+            return []
+        signatures = np.stack([sketches[key].signature for key in keys])
+        counts = np.array([sketches[key].count for key in keys], dtype=np.float64)
+        edges = []
+        for i in range(len(keys) - 1):
+            jaccard = (signatures[i + 1:] == signatures[i]).mean(axis=1)
+            weights = np.rint(jaccard / (1 + jaccard) * (counts[i] + counts[i + 1:]))
+            for j in np.nonzero(weights >= self.__min_weight)[0]:
+                edges.append((keys[i], keys[i + 1 + j], int(weights[j])))
+        return edges
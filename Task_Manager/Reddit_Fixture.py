@@ -0,0 +1,186 @@
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from typing import Iterator, Optional
+
+import praw
+from praw.models import MoreComments
+
+# the posts returned by each request for a listing
+PAGE_SIZE = 100
+
+# the fixture shipped for the tests and benchmarks
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'reddit.json.gz')
+
+
+class Reddit_Fixture():
+    """
+    Recorded Reddit responses for offline runs and benchmarks of the collector.
+
+    A fixture holds everything `Subreddit_Data_Collector` reads through PRAW for a set of
+    subreddits: their ids, moderators, `top` listings per time filter, and the comment forest
+    of each listed post, without any `MoreComments`. It is stored as gzip compressed JSON.
+
+    Args:
+        subreddits (dict): The recorded data of each subreddit, by display name.
+    """
+
+    def __init__(self, subreddits: dict = None) -> None:
+        self.subreddits = subreddits if subreddits is not None else {}
+
+    @classmethod
+    def load(cls, path: str) -> 'Reddit_Fixture':
+        with gzip.open(path, 'rt', encoding='UTF-8') as f:
+            return cls(json.load(f)['subreddits'])
+
+    def save(self, path: str) -> None:
+        with gzip.open(path, 'wt', encoding='UTF-8') as f:
+            json.dump({'subreddits': self.subreddits}, f)
+
+    def record(self, praw_object: praw.Reddit, display_name: str, scope: str, posts_n: int, per_post_n: int) -> None:
+        """
+        Records a subreddit from the live API, adding the listing of `scope` to any recorded before.
+
+        Args:
+            praw_object (praw.Reddit): The client used for the live API.
+            display_name (str): The subreddit to record.
+            scope (str): The time filter of the `top` listing.
+            posts_n (int): The number of posts recorded from the listing.
+            per_post_n (int): The `comment_limit` used when fetching each post.
+        """
+        subreddit = praw_object.subreddit(display_name)
+        recorded = self.subreddits.setdefault(display_name, {'top': {}})
+        recorded['id'] = subreddit.id
+        recorded['moderators'] = [mod.name for mod in subreddit.moderator()]
+
+        posts = []
+        for post in subreddit.top(time_filter=scope, limit=posts_n):
+            post.comment_limit = per_post_n
+            posts.append({'id': post.id,
+                          'num_comments': post.num_comments,
+                          'comments': self.__record_forest(post.comments)})
+        recorded['top'][scope] = posts
+
+    def __record_forest(self, forest) -> list[dict]:
+        return [{'id': comment.id,
+                 'body': comment.body,
+                 'author': None if comment.author is None else comment.author.name,
+                 'permalink': comment.permalink,
+                 'edited': comment.edited,
+                 'replies': self.__record_forest(comment.replies)}
+                for comment in forest if not isinstance(comment, MoreComments)]
+
+
+class Replay_Reddit():
+    """
+    Stands in for `praw.Reddit` in `Subreddit_Data_Collector`, serving a `Reddit_Fixture`.
+
+    Every call that costs a request on the live API sleeps for `latency` seconds plus a
+    uniform jitter of up to `jitter` seconds, drawn from a seeded generator so that runs are
+    repeatable: reading a subreddit's id, each page of a listing, each post's comments and
+    each moderator list.
+
+    Args:
+        fixture (Reddit_Fixture): The recorded responses.
+        latency (float): The seconds each request takes.
+        jitter (float): The most seconds added at random to each request.
+        seed (int): Seeds the jitter.
+
+    Attributes:
+        requests (int): The number of requests served.
+    """
+
+    def __init__(self, fixture: Reddit_Fixture, latency: float = 0.0, jitter: float = 0.0, seed: int = 0) -> None:
+        self.fixture = fixture
+        self.requests = 0
+        self.__latency = latency
+        self.__jitter = jitter
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+
+    def subreddit(self, display_name: str) -> 'Replay_Subreddit':
+        return Replay_Subreddit(self, display_name)
+
+    def request(self) -> None:
+        """Accounts for one request to the live API."""
+        with self.__lock:
+            self.requests += 1
+            delay = self.__latency + self.__random.uniform(0, self.__jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Replay_Subreddit():
+    def __init__(self, reddit: Replay_Reddit, display_name: str) -> None:
+        self.__reddit = reddit
+        self.display_name = display_name
+
+    @property
+    def id(self) -> str:
+        self.__reddit.request()
+        return self.__recorded()['id']
+
+    def moderator(self) -> list['Replay_Redditor']:
+        self.__reddit.request()
+        return [Replay_Redditor(name) for name in self.__recorded()['moderators']]
+
+    def top(self, time_filter: str = 'all', limit: Optional[int] = 100) -> Iterator['Replay_Post']:
+        # a listing is only requested once its first post is read, like a `ListingGenerator`
+        posts = self.__recorded()['top'].get(time_filter, [])
+        if limit is not None:
+            posts = posts[:limit]
+        for i, post in enumerate(posts):
+            if i % PAGE_SIZE == 0:
+                self.__reddit.request()
+            yield Replay_Post(self.__reddit, post)
+
+    def __recorded(self) -> dict:
+        if self.display_name not in self.__reddit.fixture.subreddits:
+            raise LookupError(f"r/{self.display_name} is not in the fixture")
+        return self.__reddit.fixture.subreddits[self.display_name]
+
+
+class Replay_Post():
+    def __init__(self, reddit: Replay_Reddit, recorded: dict) -> None:
+        self.__reddit = reddit
+        self.__recorded = recorded
+        self.__comments = None
+        self.id = recorded['id']
+        self.num_comments = recorded['num_comments']
+        self.comment_limit = None
+
+    @property
+    def comments(self) -> list['Replay_Comment']:
+        # fetched once on first access, keeping at most `comment_limit` comments in tree order
+        if self.__comments is None:
+            self.__reddit.request()
+            remaining = [self.comment_limit if self.comment_limit is not None else float('inf')]
+            self.__comments = self.__build(self.__recorded['comments'], remaining)
+        return self.__comments
+
+    def __build(self, forest: list[dict], remaining: list) -> list['Replay_Comment']:
+        comments = []
+        for recorded in forest:
+            if remaining[0] <= 0:
+                break
+            remaining[0] -= 1
+            comments.append(Replay_Comment(recorded, self.__build(recorded['replies'], remaining)))
+        return comments
+
+
+class Replay_Comment():
+    def __init__(self, recorded: dict, replies: list['Replay_Comment']) -> None:
+        self.id = recorded['id']
+        self.body = recorded['body']
+        self.author = None if recorded['author'] is None else Replay_Redditor(recorded['author'])
+        self.permalink = recorded['permalink']
+        self.edited = recorded['edited']
+        self.replies = replies
+
+
+class Replay_Redditor():
+    def __init__(self, name: str) -> None:
+        self.name = name
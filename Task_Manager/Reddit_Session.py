@@ -0,0 +1,49 @@
+import logging
+
+import praw
+
+from mysite.secret_provider import Secret_Provider, get_provider
+
+# the secret holding each argument of `praw.Reddit`
+CREDENTIALS = {
+    'client_id': 'praw_client_id',
+    'client_secret': 'praw_client_secret',
+    'password': 'praw_client_password',
+    'user_agent': 'praw_user_agent',
+    'username': 'praw_user_name',
+}
+
+
+class Reddit_Session():
+    """
+    Long-lived `praw.Reddit` client that is only rebuilt when its credentials change.
+
+    Building a client costs five secret reads and a fresh OAuth token, so one client is
+    kept across tasks. Each `get` compares the credentials from the provider's cache with
+    the ones the client was built with, which picks up rotated credentials within the
+    cache's TTL without a network round trip. `invalidate` drops the client and its cached
+    credentials, so that a rejected login is retried with freshly read secrets.
+
+    Args:
+        secrets (Secret_Provider): The provider of the credentials, defaults to the process wide provider.
+    """
+
+    def __init__(self, secrets: Secret_Provider = None) -> None:
+        self.__secrets = secrets or get_provider()
+        self.__reddit = None
+        self.__credentials = None
+
+    def get(self) -> praw.Reddit:
+        credentials = {arg: self.__secrets.get(secret_id) for arg, secret_id in CREDENTIALS.items()}
+        if self.__reddit is None or credentials != self.__credentials:
+            if self.__reddit is not None:
+                logging.info("Reddit credentials changed, rebuilding the PRAW client")
+            self.__reddit = praw.Reddit(**credentials)
+            self.__reddit.read_only = False
+            self.__credentials = credentials
+        return self.__reddit
+
+    def invalidate(self) -> None:
+        self.__reddit = None
+        self.__credentials = None
+        self.__secrets.invalidate(*CREDENTIALS.values())
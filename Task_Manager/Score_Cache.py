@@ -0,0 +1,96 @@
+import hashlib
+import sqlite3
+import threading
+
+
+class Score_Cache():
+    """
+    Persistent, size bounded cache of MHS scores in a local SQLite file.
+
+    Scores are keyed by a hash of the model version and the sanitized comment body, so the
+    same comment harvested by consecutive tasks is only scored once per model. Every lookup
+    refreshes the entry, and the least recently used entries are evicted once the cache holds
+    more than `max_entries` scores. The connection is shared by every inference thread, and the
+    file may be shared by several workers.
+
+    Args:
+        path (str): The SQLite file to store the scores in, ':memory:' for a throwaway cache.
+        model_version (str): Identifies the model that produced the scores.
+        max_entries (int): The maximum number of scores kept.
+
+    Attributes:
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that were not in the cache.
+    """
+
+    def __init__(self, path: str, model_version: str, max_entries: int = 1000000) -> None:
+        self.__model_version = model_version.encode('UTF-8')
+        self.__max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("CREATE TABLE IF NOT EXISTS score ("
+                          "key BLOB PRIMARY KEY, score REAL NOT NULL, last_used INTEGER NOT NULL)")
+        self.__db.execute("CREATE INDEX IF NOT EXISTS score_last_used ON score (last_used)")
+        self.__clock = self.__db.execute("SELECT COALESCE(MAX(last_used), 0) FROM score").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, comment_bodies: list[str]) -> list[float]:
+        """
+        Looks up the scores of the comments.
+
+        Returns:
+            list[float]: The score of each comment, None where it is not cached.
+        """
+        keys = [self.__key(body) for body in comment_bodies]
+        found = {}
+        with self.__lock:
+            # stay well under SQLite's limit on bound parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                found.update(self.__db.execute(
+                    f"SELECT key, score FROM score WHERE key IN ({','.join('?' * len(batch))})", batch))
+            if len(found) > 0:
+                self.__clock += 1
+                self.__db.executemany("UPDATE score SET last_used = ? WHERE key = ?",
+                                      [(self.__clock, key) for key in found])
+                self.__db.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, scores: dict[str, float]) -> None:
+        """
+        Stores the scores keyed by comment body, evicting the least recently used scores if full.
+        """
+        rows = [(self.__key(body), score) for body, score in scores.items()]
+        if len(rows) == 0:
+            return
+        with self.__lock:
+            # the write lock on the file is taken before the size is read, so that every process sharing
+            # the file evicts against the same count, and the clock continues from the newest entry
+            self.__db.execute("BEGIN IMMEDIATE")
+            try:
+                size, clock = self.__db.execute(
+                    "SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM score").fetchone()
+                self.__clock = max(self.__clock, clock) + 1
+                before = self.__db.total_changes
+                self.__db.executemany("INSERT OR IGNORE INTO score (key, score, last_used) VALUES (?, ?, ?)",
+                                      [(key, score, self.__clock) for key, score in rows])
+                size += self.__db.total_changes - before
+                if size > self.__max_entries:
+                    self.__db.execute("DELETE FROM score WHERE key IN "
+                                      "(SELECT key FROM score ORDER BY last_used LIMIT ?)",
+                                      (size - self.__max_entries,))
+                self.__db.commit()
+            except Exception:
+                self.__db.rollback()
+                raise
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__db.close()
+
+    def __key(self, comment_body: str) -> bytes:
+        return hashlib.sha256(self.__model_version + b'\x00' + comment_body.encode('UTF-8')).digest()
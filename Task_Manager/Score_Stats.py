@@ -0,0 +1,156 @@
+import math
+
+import numpy as np
+
+# the histogram bins, fixed so that the histograms of different subreddits and tasks can be added,
+# scores outside of them are counted in the first or last bin
+EDGES = np.linspace(-8.0, 8.0, 33)
+
+# the percentiles stored with each result
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+class Score_Stats():
+    """
+    One pass, mergeable summary of a subreddit's scores, updated as each scored chunk arrives.
+
+    The count, mean and variance are kept with Welford's method, combining whole chunks at once,
+    together with the exact minimum and maximum and a histogram over `edges`. Percentiles are
+    estimated from a merging t-digest, which keeps at most about `compression` weighted centroids
+    that are smallest near the tails, so the extreme percentiles stay accurate. Two summaries
+    are combined with `merge` as if every score had been added to one.
+
+    Args:
+        compression (int): Bounds the number of centroids of the t-digest.
+        edges (np.ndarray): The edges of the histogram bins.
+
+    Attributes:
+        count (int): The number of scores added.
+        mean (float): The mean of the scores.
+        min (float): The lowest score, None before any is added.
+        max (float): The highest score, None before any is added.
+        counts (np.ndarray): The number of scores in each histogram bin.
+    """
+
+    def __init__(self, compression: int = 100, edges: np.ndarray = EDGES) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.min = None
+        self.max = None
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.__m2 = 0.0
+        self.__compression = compression
+        self.__means = np.empty(0)
+        self.__weights = np.empty(0)
+        self.__buffer = []
+        self.__buffered = 0
+
+    @property
+    def variance(self) -> float:
+        """The population variance of the scores."""
+        return self.__m2 / self.count if self.count > 0 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def update(self, scores: np.ndarray) -> None:
+        """Adds a chunk of scores, which must not hold NaN."""
+        scores = np.asarray(scores, dtype=np.float64)
+        if len(scores) == 0:
+            return
+        mean = float(scores.mean())
+        self.__combine(len(scores), mean, float(((scores - mean) ** 2).sum()),
+                       float(scores.min()), float(scores.max()))
+        inner = np.clip(scores, self.edges[0], self.edges[-1])
+        self.counts += np.histogram(inner, bins=self.edges)[0]
+        self.__add(scores, np.ones(len(scores)))
+
+    def merge(self, other: 'Score_Stats') -> None:
+        """Adds every score of another summary with the same histogram edges."""
+        if other.count == 0:
+            return
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Only summaries with the same histogram edges can be merged")
+        self.__combine(other.count, other.mean, other.__m2, other.min, other.max)
+        self.counts += other.counts
+        other.__compress()
+        self.__add(other.__means, other.__weights)
+
+    def quantile(self, q: float) -> float:
+        """Estimates the score below which a share `q` of the scores fall, None before any is added."""
+        if self.count == 0:
+            return None
+        self.__compress()
+        # each centroid's mean sits at the middle of its weight, and the extremes at either end
+        centers = np.cumsum(self.__weights) - self.__weights / 2
+        return float(np.interp(q * self.count,
+                               np.concatenate(([0.0], centers, [self.count])),
+                               np.concatenate(([self.min], self.__means, [self.max]))))
+
+    def percentiles(self, percentiles: tuple[int] = PERCENTILES) -> dict[str, float]:
+        """Returns the estimate of each percentile, keyed by the percentile as a string."""
+        if self.count == 0:
+            return {}
+        return {str(p): self.quantile(p / 100) for p in percentiles}
+
+    def histogram(self) -> dict[str, list]:
+        """Returns the histogram as its bin edges and the count of each bin."""
+        return {'edges': self.edges.tolist(), 'counts': self.counts.tolist()}
+
+    def __combine(self, count: int, mean: float, m2: float, low: float, high: float) -> None:
+        # Chan et al.'s parallel form of Welford's update, exact for chunks of any size
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.__m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def __add(self, means: np.ndarray, weights: np.ndarray) -> None:
+        self.__buffer.append((means, weights))
+        self.__buffered += len(means)
+        if self.__buffered > 5 * self.__compression:
+            self.__compress()
+
+    def __compress(self) -> None:
+        if self.__buffered == 0:
+            return
+        means = np.concatenate([self.__means] + [m for m, w in self.__buffer])
+        weights = np.concatenate([self.__weights] + [w for m, w in self.__buffer])
+        self.__buffer = []
+        self.__buffered = 0
+        order = np.argsort(means, kind='stable')
+        means = means[order]
+        weights = weights[order]
+
+        total = weights.sum()
+        merged_means = []
+        merged_weights = []
+        mean, weight = means[0], weights[0]
+        done = 0.0
+        limit = self.__q_limit(0.0)
+        for m, w in zip(means[1:], weights[1:]):
+            if (done + weight + w) / total <= limit:
+                weight += w
+                mean += (m - mean) * w / weight
+            else:
+                merged_means.append(mean)
+                merged_weights.append(weight)
+                done += weight
+                limit = self.__q_limit(done / total)
+                mean, weight = m, w
+        merged_means.append(mean)
+        merged_weights.append(weight)
+        self.__means = np.array(merged_means)
+        self.__weights = np.array(merged_weights)
+
+    def __q_limit(self, q: float) -> float:
+        # the largest quantile a centroid starting at `q` may reach, one unit further along
+        # the arcsine scale function k(q) = compression / 2pi * asin(2q - 1)
+        k = self.__compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        if k >= self.__compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.__compression) + 1) / 2
@@ -1,7 +1,18 @@
+import logging
+import threading
 from dataclasses import dataclass
+from collections import deque
+from typing import Iterable, Iterator
 from tqdm import tqdm
 import praw
-from praw.models import Submission
+from praw.models import Comment, MoreComments, Submission
+
+from .Harvest_Planner import Harvest_Planner
+from .Reddit_Session import CREDENTIALS
+from .Task_Metrics import Task_Metrics
+
+# the posts in each page of a reddit listing, a `ListingGenerator` sends one request per page
+LISTING_PAGE = 100
 
 
 @dataclass
@@ -11,60 +22,131 @@ class commentData:
     permalink: str
     mhs_score: float
     edited: bool
+    reddit_id: str = None
 
 
 class Subreddit_Data_Collector:
-    def __init__(self, praw_object: praw.Reddit):
+    def __init__(self, praw_object: praw.Reddit, rate_limiter=None, metrics: Task_Metrics = None):
         self.__praw = praw_object
+        self.__owner = threading.get_ident()
+        self.__local = threading.local()
+        # shared between every thread using this collector, see `Collection_Pool`
+        self.__rate_limiter = rate_limiter
+        self.__metrics = metrics if metrics is not None else Task_Metrics()
 
-    def get_Comment_Data(self, display_name, scope, min_words, forest_width, per_post_n, comments_n) -> list[commentData]:
-        subreddit = self.__praw.subreddit(display_name)
+    def get_Comment_Data(self, display_name, scope, min_words, forest_width, per_post_n, comments_n, max_depth=None) -> list[commentData]:
+        return list(self.iter_Comment_Data(display_name=display_name,
+                                           scope=scope,
+                                           min_words=min_words,
+                                           forest_width=forest_width,
+                                           per_post_n=per_post_n,
+                                           comments_n=comments_n,
+                                           max_depth=max_depth))
+
+    def iter_Comment_Data(self, display_name, scope, min_words, forest_width, per_post_n, comments_n, max_depth=None) -> Iterator[commentData]:
+        """Yields the comment data for the given subreddit as soon as each comment is harvested"""
+        subreddit = self.__client().subreddit(display_name)
         posts = subreddit.top(time_filter=scope, limit=None)
         return self.__fetch_content(name=display_name,
-                                    posts=posts,
+                                    posts=self.__paged(posts),
                                     comments_n=comments_n,
                                     min_words=min_words,
                                     forest_width=forest_width,
-                                    per_post_n=per_post_n)
+                                    per_post_n=per_post_n,
+                                    max_depth=max_depth)
 
     def get_mod_set(self, display_name, includeAutoMod=False) -> set[str]:
         """Returns the moderators for the given subreddit"""
-        subreddit = self.__praw.subreddit(display_name)
+        self.__throttle()
+        subreddit = self.__client().subreddit(display_name)
         mods = {mod.name for mod in subreddit.moderator()
                 if mod.name != 'AutoModerator' or includeAutoMod}
         return mods
 
-    def get_author_set_from_comment_data(self, comments: dict[commentData]) -> set[str]:
-        """Returns the unique authors from a collection of comments"""
-        auth = set()
-        auth.update([x.username for x in comments])
-        return auth
+    def get_author_set_from_comment_data(self, comments) -> set[str]:
+        """Returns the unique authors from a `Comment_Batch` or a collection of comments"""
+        if hasattr(comments, 'username'):
+            return set(comments.username)
+        return {x.username for x in comments}
 
     def get_custom_id(self, display_name) -> str:
-        return self.__praw.subreddit(display_name).id
+        self.__throttle()
+        return self.__client().subreddit(display_name).id
 
-    # constructor function to build comments list
-    def __fetch_content(self, name: str, posts: list[Submission], comments_n: int, min_words: int, forest_width: int, per_post_n: int):
+    # generator function to stream the comments list, the planner picks the posts worth fetching
+    def __fetch_content(self, name: str, posts: list[Submission], comments_n: int, min_words: int, forest_width: int, per_post_n: int, max_depth: int = None) -> Iterator[commentData]:
+        planner = Harvest_Planner(comments_n, per_post_n)
         with tqdm(total=comments_n, desc=f"Collection: {name}") as t:
-            result = []
-            for post in posts:
-                post.comment_limit = per_post_n
-                post.comments.replace_more(limit=0)
-                comments = post.comments.list()
-                for comment in comments:
+            for post, limit in planner.plan(posts):
+                self.__throttle()
+                post.comment_limit = limit
+                retained = 0
+                for comment in self.__walk(post.comments, forest_width, max_depth):
                     if comment.author is not None and self.__count_words(comment.body) > min_words:
                         t.update(1)
                         data = commentData(comment_body=self.__sanitize(comment.body),
                                            username=comment.author.name,
                                            permalink=comment.permalink,
                                            mhs_score=None,
-                                           edited=comment.edited)
-                        result.append(data)
-                        if len(result) == comments_n:
+                                           edited=comment.edited,
+                                           reddit_id=comment.id)
+                        retained += 1
+                        yield data
+                        if retained == planner.remaining:
                             break
-                if len(result) == comments_n:
+                planner.record(post, retained)
+        logging.debug(f"Collection: {name} harvested {planner.harvested} comments from {planner.fetched} posts")
+
+    # lazily walks the comment forest breadth first, visiting at most `width` comments of each
+    # level under a parent and no replies deeper than `max_depth`, the unloaded `MoreComments`
+    # are skipped so that the walk never makes another api call
+    def __walk(self, forest: Iterable[Comment], width: int, max_depth: int = None) -> Iterator[Comment]:
+        queue = deque([(forest, 0)])
+        while queue:
+            replies, depth = queue.popleft()
+            taken = 0
+            for comment in replies:
+                if isinstance(comment, MoreComments):
+                    continue
+                yield comment
+                if max_depth is None or depth < max_depth:
+                    queue.append((comment.replies, depth + 1))
+                taken += 1
+                if taken == width:
                     break
-        return result
+
+    # praw is not thread safe, so every thread other than the one that built the collector gets its
+    # own client logged in with the same credentials, and only the rate limiter is shared between them
+    def __client(self) -> praw.Reddit:
+        if threading.get_ident() == self.__owner or not isinstance(self.__praw, praw.Reddit):
+            return self.__praw
+        client = getattr(self.__local, 'client', None)
+        if client is None:
+            client = praw.Reddit(**{arg: getattr(self.__praw.config, arg) for arg in CREDENTIALS})
+            client.read_only = self.__praw.read_only
+            self.__local.client = client
+        return client
+
+    # the listing is fetched lazily a page at a time, so the budget is taken before reading the
+    # first post of each page, which is when the next page is requested
+    def __paged(self, posts: Iterable[Submission]) -> Iterator[Submission]:
+        posts = iter(posts)
+        read = 0
+        while True:
+            if read % LISTING_PAGE == 0:
+                self.__throttle()
+            try:
+                post = next(posts)
+            except StopIteration:
+                return
+            read += 1
+            yield post
+
+    # waits for the shared rate limit budget before each reddit api call, and counts the call
+    def __throttle(self) -> None:
+        if self.__rate_limiter is not None:
+            self.__rate_limiter.acquire()
+        self.__metrics.add(api_calls=1)
 
     # defines a funtion to clean text in the strings from weird chars
     def __sanitize(self, item: str) -> str:
@@ -0,0 +1,94 @@
+import logging
+import select
+import time
+
+from django.db import connections
+
+# the channel notified by the trigger on `toxit_inference_task`, see gather migration 0005
+CHANNEL = 'inference_task'
+
+
+class Task_Listener():
+    """
+    Wakes an idle worker as soon as a task is scheduled.
+
+    On PostgreSQL the listener holds its own connection subscribed with `LISTEN` to the
+    notifications that a trigger sends whenever an `Inference_task` is saved as scheduled,
+    so `wait` returns the moment a task arrives instead of at the next poll. The wait is
+    still bounded by `max_wait` so that a missed notification, or a dropped connection,
+    only delays a task until the next poll. Other databases fall back to polling every
+    `poll_interval` seconds.
+
+    Args:
+        using (str): The database alias to listen on.
+        max_wait (float): The longest wait in seconds while listening.
+        poll_interval (float): The longest wait in seconds when notifications are unavailable.
+        min_wait (float): The shortest wait in seconds, so that a caller waiting on a time that has
+            already passed never spins.
+    """
+
+    def __init__(self, using: str = 'default', max_wait: float = 300.0, poll_interval: float = 10.0,
+                 min_wait: float = 1.0) -> None:
+        self.__using = using
+        self.__max_wait = max_wait
+        self.__poll_interval = poll_interval
+        self.__min_wait = min_wait
+        self.__connection = None
+
+    @property
+    def supported(self) -> bool:
+        return connections[self.__using].vendor == 'postgresql'
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Blocks until a task is scheduled or the timeout passes.
+
+        Args:
+            timeout (float): The most seconds to wait, capped by `max_wait` or `poll_interval`, and at
+                least `min_wait`.
+
+        Returns:
+            bool: True if woken by a notification.
+        """
+        if not self.supported:
+            time.sleep(self.__bounded(timeout, self.__poll_interval))
+            return False
+
+        timeout = self.__bounded(timeout, self.__max_wait)
+        try:
+            conn = self.__listen()
+            if not self.__drain(conn):
+                select.select([conn], [], [], timeout)
+                return self.__drain(conn)
+            return True
+        except Exception:
+            logging.exception("Lost the task notification connection, polling until it reconnects")
+            self.close()
+            time.sleep(self.__bounded(timeout, self.__poll_interval))
+            return False
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            try:
+                self.__connection.close()
+            finally:
+                self.__connection = None
+
+    def __bounded(self, timeout: float, limit: float) -> float:
+        return limit if timeout is None else max(self.__min_wait, min(timeout, limit))
+
+    def __listen(self):
+        if self.__connection is None or self.__connection.closed:
+            wrapper = connections[self.__using]
+            conn = wrapper.get_new_connection(wrapper.get_connection_params())
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            self.__connection = conn
+        return self.__connection
+
+    def __drain(self, conn) -> bool:
+        conn.poll()
+        notified = len(conn.notifies) > 0
+        conn.notifies.clear()
+        return notified
@@ -1,27 +1,32 @@
 import datetime
+import hashlib
 import json
 import logging
+import time
+import traceback
 
 import numpy as np
-from tqdm import tqdm, trange
-
-from gather.models import (Author_edge, Comment_result, Inference_task,
-                           Mod_edge, Subreddit, Subreddit_mod,
-                           Subreddit_result)
-
-from . import Subreddit_Data_Collector, commentData
-from .inferencer import Inferencer
-from google.cloud import secretmanager
-
-
-def fetch_secret(secret_id):
-    '''
-    This utility function returns a secret payload at runtime using the secure google secrets API 
-    '''
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/mhs-reddit/secrets/{secret_id}/versions/latest"
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode('UTF-8')
+from django.db import transaction
+from django.db.models.functions import MD5
+from tqdm import tqdm
+
+from gather.models import (Author, Author_edge, Comment, Comment_result,
+                           Inference_task, Mod_edge, Subreddit, Subreddit_mod,
+                           Subreddit_result, Subreddit_status)
+
+from . import Comment_Batch, Subreddit_Data_Collector
+from .Collection_Pool import Collection_Pool, Rate_Limiter
+from .Comment_Partitions import Comment_Partitions
+from .Copy_Writer import Copy_Writer
+from .inferencer import Batch_Budget, Inferencer
+from .MinHash_Sketch import MinHash_Sketch
+from .Overlap_Engine import Overlap_Engine
+from .Score_Cache import Score_Cache
+from .Score_Stats import Score_Stats
+from .Task_Pipeline import Task_Pipeline
+from .Task_Metrics import Task_Metrics
+from .Task_Spool import COLLECTED, INFERRED, Task_Spool
+from .Trend_Rollup import Trend_Rollup
 
 
 class Task_Manager():
@@ -37,172 +42,439 @@ class Task_Manager():
     - `api_url`: The URL for the MHS API.
     - `api_key`: An API key for accessing the MHS API.
     - `praw_object`: An object for accessing the Reddit API using the `praw` library.
-    - `chunk_size` (optional, default=100): The size of the chunks used to process information from the Reddit API.
+    - `chunk_size` (optional, default=100): The number of comments harvested before they are sent for inference,
+      requests are further split by the adaptive character budget of the `Inferencer`.
+    - `max_workers` (optional, default=4): The number of subreddits collected at the same time.
+    - `calls_per_minute` (optional, default=60): The Reddit API budget shared by all of the collection workers.
+    - `max_in_flight` (optional, default=4): The number of concurrent requests to the MHS API.
+    - `target_latency` (optional, default=2.0): The duration in seconds that each MHS API request is sized towards.
+    - `cache_path` (optional, default='score_cache.sqlite3'): The SQLite file caching MHS scores across tasks, None to disable.
+    - `model_version` (optional, default=`api_url`): Identifies the MHS model in the score cache.
+    - `min_edge_weight` (optional, default=1): The fewest users two subreddits must share to be joined by an edge.
+    - `spool_dir` (optional, default='spool'): The directory of per-subreddit checkpoints that let an interrupted
+      task resume without collecting and scoring its finished subreddits again. The scored comments of a finished
+      subreddit are read back from it when the results are published, so None, which disables it, keeps the comments
+      of every subreddit in memory until then.
+    - `subreddit_retries` (optional, default=2): The number of times a failed subreddit is retried on its own. The task
+      completes with the subreddits that succeeded, and the outcome of each is recorded as a `Subreddit_status`.
+    - `retry_delay` (optional, default=5.0): The seconds before the first retry, growing linearly with each attempt.
+    - `worker` (optional): The id of the worker holding the task's lease. The results are only published while it
+      still holds the lease, otherwise the task fails without writing them, as another worker has taken it over.
+
+    The wall time, throughput, API calls, retries, database round trips and memory growth of every stage, and the
+    peak memory of the task, are recorded by a `Task_Metrics`, saved as the task's `metrics` and logged as structured
+    fields when the results are committed or the task fails.
     '''
 
     # this will be set the first time that it is created
     _instance = None
 
+    # the most rows sent in one INSERT by any of the bulk writes
+    batch_size = 1000
+
+    # stream `Comment_result` rows with COPY when the database is PostgreSQL
+    use_copy = True
+
+    # the task ids per partition of `Comment_result`, when it is partitioned
+    tasks_per_partition = 100
+
+    # the seconds after which the spool of a task that is no longer written to is removed
+    spool_max_age = 7 * 24 * 3600
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Task_Manager, cls).__new__(cls)
             # any intialization goes below here
         return cls._instance
 
-    def do_Task(self, task_object: Inference_task, api_url, api_key, praw_object, chunk_size=100) -> None:
+    def do_Task(self, task_object: Inference_task, api_url, api_key, praw_object, chunk_size=100,
+                max_workers=4, calls_per_minute=60, max_in_flight=4, target_latency=2.0,
+                cache_path='score_cache.sqlite3', model_version=None, min_edge_weight=1,
+                spool_dir='spool', subreddit_retries=2, retry_delay=5.0, worker=None) -> None:
         task_object.status = 1
-        task_object.save()
-
-        sdc = Subreddit_Data_Collector(praw_object)
-
-        # get the comment data for all of the subs
-        all_Comment_Data = {sub:  sdc.get_Comment_Data(
-            display_name=sub,
-            scope=task_object.time_scale,
-            min_words=task_object.min_words,
-            forest_width=task_object.forest_width,
-            per_post_n=task_object.per_post_n,
-            comments_n=task_object.comments_n)
-
-            for sub in task_object.subreddit_set}
-
-        # Do inference for those subs
-        inf = Inferencer(api_key, api_url)
-        for sub in all_Comment_Data:
-            all_Comment_Data[sub] = inf.infer(
-                all_Comment_Data[sub], chunk_size)
-
-        all_Mods = {
-            sub: sdc.get_mod_set(sub)
-            for sub in task_object.subreddit_set
-        }
-
-        all_Authors = {
-            sub: sdc.get_author_set_from_comment_data(all_Comment_Data[sub])
-            for sub in all_Comment_Data
-        }
-
-        # push any new subreddits to the database, and get references to them
-        db_Subreddit = self.__push_Subreddits(
-            sdc, list(all_Comment_Data.keys()))
-
-        db_Subbredit_results = self.__push_Subreddit_result(allComments=all_Comment_Data,
-                                                            subreddits=db_Subreddit,
-                                                            inference_task=task_object
-                                                            )
-
-        self.__push_Edges(task_object, db_Subbredit_results,
-                          all_Mods, all_Authors)
-
-        self.__push_Subreddit_mod(
-            mod_list=all_Mods, subreddit=db_Subreddit, result=db_Subbredit_results)
-        self.__push_Comment_result(
-            comments=all_Comment_Data, subreddit=db_Subreddit, result=db_Subbredit_results)
+        task_object.save(update_fields=['status'])
+
+        # results are committed all at once, so any result means an earlier run
+        # finished the task and only failed to record its status
+        if Subreddit_result.objects.filter(inference_task=task_object).exists():
+            logging.info(f"Results of {task_object} are already committed")
+            return
+
+        metrics = Task_Metrics()
+        sdc = Subreddit_Data_Collector(
+            praw_object, rate_limiter=Rate_Limiter(calls_per_minute), metrics=metrics)
+        cache = None
+        if cache_path is not None:
+            cache = Score_Cache(cache_path, model_version or api_url)
+        inf = Inferencer(api_key, api_url, max_in_flight=max_in_flight,
+                         budget=Batch_Budget(target_latency=target_latency),
+                         cache=cache, metrics=metrics)
+        pipeline = Task_Pipeline(Collection_Pool(sdc, max_workers, metrics), inf, chunk_size, metrics=metrics,
+                                 sketch_authors=task_object.approximate_authors)
+        spool = None
+        if spool_dir is not None:
+            Task_Spool.expire(spool_dir, self.spool_max_age)
+            spool = Task_Spool(spool_dir, task_object.id)
+        # created outside of the task's transaction, which would hold the lock on the parent table
+        Comment_Partitions(self.tasks_per_partition).ensure(task_object.id)
+
+        statuses = {sub: Subreddit_status(inference_task=task_object, display_name=sub, status=2, attempts=0)
+                    for sub in task_object.subreddit_set}
+
+        try:
+            # everything that needs the network is gathered before any transaction is opened, so that no
+            # lock is held while the task waits on reddit or the inference api
+            prepared = self.__prepare(task_object, sdc, pipeline, inf, spool, chunk_size, metrics, statuses,
+                                      subreddit_retries, retry_delay)
+            inf.close()
+            if cache is not None:
+                logging.info(f"Score cache: {cache.hits} hits, {cache.misses} misses")
+                cache.close()
+
+            all_Mods = {}
+            all_Authors = {}
+            db_Subbredit_results = {}
+
+            # every result of the task is published together or not at all, in one short transaction
+            with transaction.atomic():
+                if worker is not None:
+                    # the task's row stays locked until the results are committed, so a worker that has taken
+                    # over the lease can neither publish them too nor reclaim the task in the meantime
+                    if not Inference_task.objects.select_for_update().filter(
+                            pk=task_object.pk, worker=worker, status=1).exists():
+                        raise RuntimeError(f"Lost the lease on {task_object}, its results are not published")
+                    if Subreddit_result.objects.filter(inference_task=task_object).exists():
+                        raise RuntimeError(f"Results of {task_object} were published by another worker")
+                # statuses left by an earlier run that failed outright are replaced
+                Subreddit_status.objects.filter(inference_task=task_object).delete()
+
+                for sub in task_object.subreddit_set:
+                    if sub not in prepared:
+                        continue
+                    comments, stats, sketch, mods, custom_id = prepared.pop(sub)
+                    if comments is None:
+                        comments = spool.load(sub)[1]
+                    try:
+                        # a sub that fails to store rolls back to this savepoint without aborting the task
+                        with transaction.atomic():
+                            db_Result = self.__push_Subreddit(task_object, sub, comments, stats, mods, custom_id,
+                                                              metrics)
+                    except Exception:
+                        logging.error(f"UNABLE TO STORE {sub}")
+                        statuses[sub].error = traceback.format_exc()
+                        logging.error(statuses[sub].error)
+                        continue
+
+                    # only the author and mod sets are kept for the edge discovery at the end
+                    all_Mods[sub] = mods
+                    # a fixed size sketch, built chunk by chunk, stands in for the whole author set
+                    all_Authors[sub] = sketch if sketch is not None \
+                        else sdc.get_author_set_from_comment_data(comments)
+                    db_Subbredit_results.update(db_Result)
+
+                    unscored = len(comments) - len(comments.scored())
+                    statuses[sub].status = 0 if unscored == 0 else 1
+                    statuses[sub].unscored = unscored
+                    statuses[sub].subreddit_result = db_Result[sub]
+                    statuses[sub].error = None
+
+                with metrics.stage('push_Subreddit_status') as stage:
+                    Subreddit_status.objects.bulk_create(statuses.values(), batch_size=self.batch_size)
+                    stage.items = len(statuses)
+                if len(db_Subbredit_results) > 0:
+                    with metrics.stage('edge_discovery') as stage:
+                        self.__push_Edges(task_object, db_Subbredit_results,
+                                          all_Mods, all_Authors, min_edge_weight)
+                        stage.items = len(db_Subbredit_results)
+                    # committed with the results, so each one is added to the trends exactly once
+                    with metrics.stage('trend_rollup') as stage:
+                        Trend_Rollup(batch_size=self.batch_size).add(list(db_Subbredit_results.values()),
+                                                                     task_object.time_scale)
+                        stage.items = len(db_Subbredit_results)
+        except Exception:
+            # a failed task is not claimed again, so its checkpoints would never be read, unless the lease was
+            # lost to a worker that may still resume from them
+            if worker is None or Inference_task.objects.filter(pk=task_object.pk, worker=worker).exists():
+                if spool is not None:
+                    spool.clear()
+                try:
+                    self.__save_Metrics(task_object, metrics)
+                except Exception:
+                    logging.exception(f"Unable to save the metrics of {task_object}")
+            raise
+
+        # the checkpoints are not needed once the outcome of every sub is committed
+        if spool is not None:
+            spool.clear()
+        pending = [sub for sub in task_object.subreddit_set if sub not in db_Subbredit_results]
+
+        # kept for the failed task too
+        self.__save_Metrics(task_object, metrics)
+
+        # the statuses of the failed subs are committed before the task is failed
+        if len(db_Subbredit_results) == 0:
+            raise RuntimeError(f"Every subreddit failed: {pending}")
+        if len(pending) > 0:
+            logging.warning(f"Completed {task_object} without {pending}")
+
+        if task_object.approximate_authors:
+            task_object.author_edge_error = MinHash_Sketch.error_bound(estimated_count=True)
+            task_object.save(update_fields=['author_edge_error'])
+
+    def __save_Metrics(self, task_object, metrics):
+        '''Saves the metrics of the run as the task's `metrics`, and logs them.'''
+        task_object.metrics = metrics.log(task_object)
+        task_object.save(update_fields=['metrics'])
+
+    def __prepare(self, task_object, sdc, pipeline, inf, spool, chunk_size, metrics, statuses,
+                  subreddit_retries, retry_delay):
+        '''
+        Collects, scores and fetches the moderators and id of every subreddit, retrying a failed subreddit on its
+        own. Returns the comments, score statistics, author sketch, moderators and id of each subreddit that
+        succeeded, where the comments are None if they can be read back from the spool.
+        '''
+        prepared = {}
+        pending = list(task_object.subreddit_set)
+        for attempt in range(subreddit_retries + 1):
+            if len(pending) == 0:
+                break
+            if attempt > 0:
+                logging.warning(f"Retrying {pending}, attempt {attempt + 1} of {subreddit_retries + 1}")
+                time.sleep(retry_delay * attempt)
+            for sub in pending:
+                statuses[sub].attempts += 1
+            pipeline.failures = {}
+            errors = {}
+
+            for sub, comments in self.__stream_results(task_object, pending, pipeline, inf, spool, chunk_size,
+                                                       metrics):
+                # accumulated by the pipeline as the chunks were scored, unless resumed from the spool
+                stats = pipeline.stats.pop(sub, None)
+                sketch = pipeline.sketches.pop(sub, None)
+                if task_object.approximate_authors and sketch is None:
+                    sketch = MinHash_Sketch()
+                    sketch.add(comments.username)
+                try:
+                    with metrics.stage('mod_fetch', sub) as stage:
+                        mods = sdc.get_mod_set(sub)
+                        stage.items = len(mods)
+                    with metrics.stage('subreddit_fetch', sub):
+                        custom_id = sdc.get_custom_id(sub)
+                except Exception:
+                    logging.error(f"UNABLE TO FETCH {sub}")
+                    errors[sub] = traceback.format_exc()
+                    logging.error(errors[sub])
+                    continue
+                prepared[sub] = (comments if spool is None else None, stats, sketch, mods, custom_id)
+
+            errors.update(pipeline.failures)
+            for sub, error in errors.items():
+                statuses[sub].error = error
+            pending = [sub for sub in pending if sub not in prepared]
+        return prepared
+
+    def __push_Subreddit(self, task_object, sub, comments, stats, mods, custom_id, metrics):
+        '''Writes the results of one subreddit with a fixed number of bulk statements, and returns its result.'''
+        # push the subreddit to the database if it is new, and get a reference to it
+        with metrics.stage('push_Subreddits', sub) as stage:
+            db_Subreddit = self.__push_Subreddits({sub: custom_id})
+            stage.items = 1
+
+        with metrics.stage('push_Subreddit_result', sub) as stage:
+            db_Result = self.__push_Subreddit_result(allComments={sub: comments},
+                                                     subreddits=db_Subreddit,
+                                                     inference_task=task_object,
+                                                     stats={sub: stats}
+                                                     )
+            stage.items = 1
+        with metrics.stage('push_Authors', sub) as stage:
+            authors = self.__push_Authors(set(comments.username) | mods)
+            stage.items = len(authors)
+        with metrics.stage('push_Subreddit_mod', sub) as stage:
+            self.__push_Subreddit_mod(
+                mod_list={sub: mods}, subreddit=db_Subreddit, result=db_Result, authors=authors)
+            stage.items = len(mods)
+        with metrics.stage('push_Comment_result', sub) as stage:
+            self.__push_Comment_result(
+                comments={sub: comments}, subreddit=db_Subreddit, result=db_Result, authors=authors)
+            stage.items = len(comments)
+        return db_Result
+
+    def __stream_results(self, task_object, subreddits, pipeline, inf, spool, chunk_size, metrics):
+        '''
+        Yields the scored comments of each subreddit, resuming from the spool where an interrupted
+        run of the task left a checkpoint, and checkpointing every subreddit the pipeline finishes
+        '''
+        stages = spool.stages() if spool is not None else {}
+        resumed = [sub for sub in subreddits if sub in stages]
+        if len(resumed) > 0:
+            logging.info(f"Resuming {task_object} from checkpoints of {resumed}")
+
+        for sub in resumed:
+            stage, comments = spool.load(sub)
+            if stage != INFERRED:
+                # only the comments still missing a score are sent again
+                with metrics.stage('inference', sub) as inference:
+                    inference.items = len(comments) - len(comments.scored())
+                    inf.infer_batch(comments, chunk_size)
+                spool.save(sub, comments, self.__stage(comments))
+            yield sub, comments
+
+        remaining = [sub for sub in subreddits if sub not in stages]
+        if len(remaining) == 0:
+            return
+        for sub, comments in pipeline.run(remaining,
+                                          scope=task_object.time_scale,
+                                          min_words=task_object.min_words,
+                                          forest_width=task_object.forest_width,
+                                          max_depth=task_object.max_depth,
+                                          per_post_n=task_object.per_post_n,
+                                          comments_n=task_object.comments_n):
+            if spool is not None:
+                spool.save(sub, comments, self.__stage(comments))
+            yield sub, comments
+
+    def __stage(self, comments):
+        return INFERRED if len(comments.scored()) == len(comments) else COLLECTED
 
     def __push_Edges(self,
                      task: Inference_task,
                      subs: dict[str, Subreddit_result],
                      mods: dict[str, set[str]],
-                     authors: dict[str, set[str]]):
-        '''Pushes edges to the database.'''
+                     authors: dict[str, set[str] | MinHash_Sketch],
+                     min_weight: int = 1):
+        '''Pushes edges to the database, pairs sharing fewer than `min_weight` users are skipped.
+        Author edges are estimated when the authors are given as `MinHash_Sketch` objects.'''
+        engine = Overlap_Engine(min_weight)
 
         # Mods
-        keys = list(mods.keys())
-        num_subreddits = len(keys)
-        edges = []
-        for i in trange(num_subreddits, desc=f"Mod Edge Discovery:"):
-            for j in range(i+1, num_subreddits):
-                A = mods[keys[i]]
-                B = mods[keys[j]]
-                weight = len(A.intersection(B))
-                if weight > 0:
-                    edges.append(
-                        Mod_edge(from_sub=subs[keys[i]], to_sub=subs[keys[j]], inference_task=task, weight=weight))
-
-        Mod_edge.objects.bulk_create(edges)
+        edges = [Mod_edge(from_sub=subs[a], to_sub=subs[b], inference_task=task, weight=weight)
+                 for a, b, weight in tqdm(engine.overlaps(mods), desc=f"Mod Edge Discovery:")]
+        Mod_edge.objects.bulk_create(edges, batch_size=self.batch_size)
+
         # Authors
-        keys = list(authors.keys())
-        num_subreddits = len(keys)
-        edges = []
-        for i in trange(num_subreddits, desc=f"Author Edge Discovery:"):
-            for j in range(i+1, num_subreddits):
-                A = authors[keys[i]]
-                B = authors[keys[j]]
-                weight = len(A.intersection(B))
-                if weight > 0:
-                    edges.append(
-                        Mod_edge(from_sub=subs[keys[i]], to_sub=subs[keys[j]], inference_task=task, weight=weight))
-        Author_edge.objects.bulk_create(edges)
-
-    def __push_Subreddits(self, sdc: Subreddit_Data_Collector, subs: list[str]) -> None:
-        subreddits = [
-            Subreddit.objects.get_or_create(
-                custom_id=sdc.get_custom_id(sub), display_name=sub)
-            for sub in tqdm(subs, desc="Pushing Subreddits")
-        ]
-
-        return {sub[0].display_name: sub[0] for sub in subreddits}
+        if len(authors) > 0 and all(isinstance(a, MinHash_Sketch) for a in authors.values()):
+            overlaps = engine.sketch_overlaps(authors)
+        else:
+            overlaps = engine.overlaps(authors)
+        edges = [Author_edge(from_sub=subs[a], to_sub=subs[b], inference_task=task, weight=weight)
+                 for a, b, weight in tqdm(overlaps, desc=f"Author Edge Discovery:")]
+        Author_edge.objects.bulk_create(edges, batch_size=self.batch_size)
+
+    def __push_Subreddits(self, custom_ids: dict[str, str]) -> dict[str, Subreddit]:
+        '''Upserts the subreddits, given by display name with their `custom_id`, in one statement,
+        a renamed subreddit keeps its `custom_id`.'''
+        subreddits = {sub: Subreddit(custom_id=custom_id, display_name=sub)
+                      for sub, custom_id in tqdm(custom_ids.items(), desc="Pushing Subreddits")}
+        Subreddit.objects.bulk_create(subreddits.values(),
+                                      batch_size=self.batch_size,
+                                      update_conflicts=True,
+                                      unique_fields=['custom_id'],
+                                      update_fields=['display_name'])
+        return subreddits
 
     def __push_Subreddit_result(self,
-                                allComments: dict[str, list[commentData]],
+                                allComments: dict[str, Comment_Batch],
                                 subreddits: dict[str, Subreddit],
-                                inference_task: Inference_task
+                                inference_task: Inference_task,
+                                stats: dict[str, Score_Stats] = None
                                 ) -> dict[str, Subreddit_result]:
-        '''Saves the results for a Subreddit as a `Subreddit_result` model.'''
+        '''Saves the results for a Subreddit as a `Subreddit_result` model, from the `Score_Stats` of its scores
+        where they are given, and otherwise from one pass over the batch's score column.'''
+        stats = stats or {}
         result = {}
         for sub in tqdm(allComments.keys(), desc="Pushing Subreddit Results"):
-            # isolate the mhs results
-            arr = [c.mhs_score for c in allComments[sub] if c.mhs_score != None]
-
-            if len(arr) > 0:
-                arr = np.array(arr)
-                result.update({
-                    sub:
-                    Subreddit_result.objects.create(subreddit=subreddits[sub],
-                                                    inference_task=inference_task,
-                                                    min_result=arr.min(),
-                                                    max_result=arr.max(),
-                                                    mean_result=arr.mean(),
-                                                    std_result=arr.std(),
-                                                    timestamp=datetime.datetime.now(),
-                                                    edges=json.dumps([]))
-                })
-
-            else:
+            sub_stats = stats.get(sub)
+            if sub_stats is None:
+                sub_stats = Score_Stats()
+                sub_stats.update(allComments[sub].scored())
+
+            if sub_stats.count == 0:
+                # without a score the statistics are left empty rather than zero
                 logging.warning(
                     f"Pushing data for {sub} with no Inference results")
-                result.update({
-                    sub:
-                    Subreddit_result.objects.create(subreddit=subreddits[sub],
-                                                    inference_task=inference_task,
-                                                    min_result=0.0,
-                                                    max_result=0.0,
-                                                    mean_result=0.0,
-                                                    std_result=0.0,
-                                                    timestamp=datetime.datetime.now(),
-                                                    edges=json.dumps([]))
-                })
-
+            result[sub] = Subreddit_result(subreddit=subreddits[sub],
+                                           inference_task=inference_task,
+                                           min_result=sub_stats.min,
+                                           max_result=sub_stats.max,
+                                           mean_result=sub_stats.mean if sub_stats.count > 0 else None,
+                                           std_result=sub_stats.std if sub_stats.count > 0 else None,
+                                           percentiles=sub_stats.percentiles(),
+                                           histogram=sub_stats.histogram(),
+                                           timestamp=datetime.datetime.now(),
+                                           edges=json.dumps([]))
+
+        # the primary keys are set on the objects for the rows that reference them
+        Subreddit_result.objects.bulk_create(result.values(), batch_size=self.batch_size)
         return result
 
-    def __push_Subreddit_mod(self, mod_list: dict[str, set[str]], subreddit: Subreddit, result: Subreddit_result):
+    def __push_Authors(self, names: set[str]) -> dict[str, int]:
+        '''Inserts the authors that are not stored yet, and returns the id of every author by name.'''
+        names = sorted(names)
+        ids = {}
+        for i in range(0, len(names), self.batch_size):
+            ids.update(Author.objects.filter(name__in=names[i:i + self.batch_size]).values_list('name', 'id'))
+        new = [Author(name=name) for name in names if name not in ids]
+        if len(new) > 0:
+            # another worker may store the same author first
+            Author.objects.bulk_create(new, batch_size=self.batch_size, ignore_conflicts=True)
+            new_names = [author.name for author in new]
+            for i in range(0, len(new_names), self.batch_size):
+                ids.update(Author.objects.filter(name__in=new_names[i:i + self.batch_size]).values_list('name', 'id'))
+        return ids
+
+    def __push_Comments(self, batch: Comment_Batch, authors: dict[str, int]) -> list[str]:
+        '''Upserts the comments of a batch, skipping those stored unchanged by an earlier task, and returns
+        the reddit id of each comment in batch order.'''
+        ids = [reddit_id if reddit_id is not None else Comment.id_from_permalink(permalink)
+               for reddit_id, permalink in zip(batch.reddit_id, batch.permalink)]
+        comments = {reddit_id: Comment(reddit_id=reddit_id, author_id=authors[username], permalink=permalink,
+                                       body=body, edited=bool(edited))
+                    for reddit_id, username, permalink, body, edited
+                    in zip(ids, batch.username, batch.permalink, batch.comment_body, batch.edited)}
+
+        # written in key order, so that workers sharing comments lock their rows in the same order
+        keys = sorted(comments.keys())
+        comments = {key: comments[key] for key in keys}
+        # the stored bodies are compared by their digest, computed by the database, so that they are never read back
+        stored = {}
+        for i in range(0, len(keys), self.batch_size):
+            for reddit_id, *values in Comment.objects.filter(reddit_id__in=keys[i:i + self.batch_size]).annotate(
+                    body_md5=MD5('body')).values_list('reddit_id', 'author_id', 'permalink', 'body_md5', 'edited'):
+                stored[reddit_id] = tuple(values)
+        new = [c for c in comments.values() if c.reddit_id not in stored]
+        changed = [c for c in comments.values() if c.reddit_id in stored
+                   and stored[c.reddit_id] != (c.author_id, c.permalink, hashlib.md5(c.body.encode()).hexdigest(),
+                                               c.edited)]
+
+        Comment.objects.bulk_create(new, batch_size=self.batch_size, ignore_conflicts=True)
+        Comment.objects.bulk_update(changed, ['author', 'permalink', 'body', 'edited'], batch_size=self.batch_size)
+        logging.debug(f"Comments: {len(new)} new, {len(changed)} changed, "
+                      f"{len(comments) - len(new) - len(changed)} unchanged")
+        return ids
+
+    def __push_Subreddit_mod(self, mod_list: dict[str, set[str]], subreddit: Subreddit, result: Subreddit_result,
+                             authors: dict[str, int]):
         '''Saves the moderators for a Subreddit as `Subreddit_mod` models.'''
 
         for sub in tqdm(mod_list.keys(), desc="Pushing Mods"):
-            mods = [Subreddit_mod(subreddit=subreddit[sub], username=mod, subreddit_result=result[sub])
+            mods = [Subreddit_mod(subreddit=subreddit[sub], author_id=authors[mod], subreddit_result=result[sub])
                     for mod in mod_list[sub]]
-            Subreddit_mod.objects.bulk_create(mods)
+            Subreddit_mod.objects.bulk_create(mods, batch_size=self.batch_size)
 
-    def __push_Comment_result(self, comments: dict[str, list[commentData]], subreddit: Subreddit, result: Subreddit_result):
-        '''Saves the comments for a Subreddit as `Comment_result` models.'''
+    def __push_Comment_result(self, comments: dict[str, Comment_Batch], subreddit: Subreddit, result: Subreddit_result,
+                              authors: dict[str, int]):
+        '''Saves the comments for a Subreddit as `Comment_result` models, each referencing its stored `Comment`.'''
 
+        writer = Copy_Writer(Comment_result,
+                             ['subreddit_result', 'inference_task', 'subreddit', 'comment', 'mhs_score'],
+                             batch_size=self.batch_size,
+                             enabled=self.use_copy)
         for sub in tqdm(comments.keys(), desc="Pushing Comments"):
-            db_comments = [Comment_result(subreddit_result=result[sub],
-                                          subreddit=subreddit[sub],
-                                          permalink=comment.permalink,
-                                          mhs_score=(
-                                              comment.mhs_score if comment.mhs_score != None else 0.0),
-                                          comment_body=comment.comment_body,
-                                          username=comment.username)
-                           for comment in comments[sub]]
-            Comment_result.objects.bulk_create(db_comments)
+            batch = comments[sub]
+            ids = self.__push_Comments(batch, authors)
+            # a comment that could not be scored is stored without a score
+            scores = [None if np.isnan(score) else score for score in batch.mhs_score.tolist()]
+            rows = ((result[sub].pk, result[sub].inference_task_id, subreddit[sub].pk, reddit_id, score)
+                    for reddit_id, score in zip(ids, scores))
+            writer.write(rows)
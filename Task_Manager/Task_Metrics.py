@@ -0,0 +1,176 @@
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.db import connection
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, where the peak memory is left out
+    resource = None
+
+COUNTERS = ('wall_time', 'items', 'api_calls', 'retries', 'db_round_trips')
+
+
+class Stage():
+    """
+    The counters of one run of a stage, as yielded by `Task_Metrics.stage`.
+
+    Attributes:
+        items (int): The number of comments or rows handled, set by the stage.
+        api_calls (int): The requests made to the Reddit and inference APIs.
+        retries (int): The requests that were sent again after failing.
+        db_round_trips (int): The statements sent to the database from the stage's thread.
+        wall_time (float): The seconds the stage took, set when it ends.
+        rss_delta_mb (float): The MiB the resident memory of the process grew by during the stage,
+            set when it ends, None where it is not known.
+    """
+
+    __slots__ = ('parent', 'wall_time', 'items', 'api_calls', 'retries', 'db_round_trips', 'rss_delta_mb')
+
+    def __init__(self, parent: 'Stage' = None) -> None:
+        self.parent = parent
+        self.wall_time = 0.0
+        self.items = 0
+        self.api_calls = 0
+        self.retries = 0
+        self.db_round_trips = 0
+        self.rss_delta_mb = None
+
+
+class Task_Metrics():
+    """
+    Records the wall time, throughput, API calls, retries, database round trips and memory growth
+    of every stage of a task, in total and per subreddit, and the peak memory of the task.
+
+    A stage is timed by running it within `stage`. Code deeper in the call stack, such as the
+    collector and the inferencer, adds its API calls and retries to the innermost stage with
+    `add`, which also counts them towards every enclosing stage. The current stage is held in a
+    context variable, so threads started with a copy of the caller's context count towards it.
+    Stages may run on any thread at once.
+
+    The memory growth of a stage is the change in the resident memory of the whole process from
+    its start to its end, so it also counts the allocations of stages running alongside it. The
+    largest growth of any run is kept. The peak memory covers the life of the process, and is
+    only reported for the task.
+
+    `summary` returns the totals as JSON, which are kept on the task and written to the logs as
+    structured fields by `log`.
+    """
+
+    def __init__(self) -> None:
+        self.__current = contextvars.ContextVar('stage', default=None)
+        self.__lock = threading.Lock()
+        self.__start = time.monotonic()
+        self.__stages = {}
+        self.__subreddits = {}
+
+    @contextmanager
+    def stage(self, name: str, sub: str = None) -> Iterator[Stage]:
+        """
+        Times a stage of the task, of one subreddit if `sub` is given. A stage that runs more
+        than once, such as the inference of each chunk, adds up to one entry.
+
+        Yields:
+            Stage: The counters of this run, whose `items` the caller sets.
+        """
+        stage = Stage(self.__current.get())
+        token = self.__current.set(stage)
+        start = time.perf_counter()
+        rss = current_rss_mb()
+        try:
+            with connection.execute_wrapper(self.__count_query(stage)):
+                yield stage
+        finally:
+            stage.wall_time = time.perf_counter() - start
+            if rss is not None:
+                stage.rss_delta_mb = round(current_rss_mb() - rss, 1)
+            self.__current.reset(token)
+            self.__record(name, sub, stage)
+
+    def add(self, api_calls: int = 0, retries: int = 0) -> None:
+        """Counts API calls and retries towards the current stage and the stages enclosing it."""
+        stage = self.__current.get()
+        with self.__lock:
+            while stage is not None:
+                stage.api_calls += api_calls
+                stage.retries += retries
+                stage = stage.parent
+
+    def summary(self) -> dict:
+        """
+        Returns the metrics as JSON, with the totals of each stage under `stages` and those of
+        each subreddit's stages under `subreddits`. The wall time of a stage is the sum of its
+        runs, which may overlap when the stage runs on several threads.
+        """
+        with self.__lock:
+            return {'wall_time': round(time.monotonic() - self.__start, 3),
+                    'peak_rss_mb': peak_rss_mb(),
+                    'stages': {name: self.__format(totals) for name, totals in self.__stages.items()},
+                    'subreddits': {sub: {name: self.__format(totals) for name, totals in stages.items()}
+                                   for sub, stages in self.__subreddits.items()}}
+
+    def log(self, task) -> dict:
+        """Writes the summary of the task and of each subreddit as structured log entries, and returns it."""
+        summary = self.summary()
+        for sub, stages in summary['subreddits'].items():
+            logging.info(f"Metrics of {sub} in {task}",
+                         extra={'json_fields': {'task': task.id, 'subreddit': sub, 'stages': stages}})
+        logging.info(f"Metrics of {task}: {summary['wall_time']}s",
+                     extra={'json_fields': {'task': task.id, 'wall_time': summary['wall_time'],
+                                            'peak_rss_mb': summary['peak_rss_mb'], 'stages': summary['stages']}})
+        return summary
+
+    def __count_query(self, stage: Stage):
+        # counts every statement sent on this thread's connection while the stage runs
+        def wrapper(execute, sql, params, many, context):
+            stage.db_round_trips += 1
+            return execute(sql, params, many, context)
+        return wrapper
+
+    def __record(self, name: str, sub: str, stage: Stage) -> None:
+        with self.__lock:
+            targets = [self.__stages.setdefault(name, self.__empty())]
+            if sub is not None:
+                targets.append(self.__subreddits.setdefault(sub, {}).setdefault(name, self.__empty()))
+            for totals in targets:
+                totals['runs'] += 1
+                for counter in COUNTERS:
+                    totals[counter] += getattr(stage, counter)
+                if stage.rss_delta_mb is not None:
+                    totals['rss_delta_mb'] = max(totals['rss_delta_mb'] or 0.0, stage.rss_delta_mb)
+
+    def __empty(self) -> dict:
+        return dict({'runs': 0, 'rss_delta_mb': None}, **{counter: 0 for counter in COUNTERS})
+
+    def __format(self, totals: dict) -> dict:
+        formatted = dict(totals, wall_time=round(totals['wall_time'], 3))
+        formatted['items_per_sec'] = round(totals['items'] / totals['wall_time'], 3) \
+            if totals['items'] > 0 and totals['wall_time'] > 0 else None
+        return formatted
+
+
+def current_rss_mb() -> float:
+    """The memory the process holds now, in MiB, None where it is not known."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        # only Linux has /proc
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def peak_rss_mb() -> float:
+    """The most memory the process has held so far, in MiB, None where it is not known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
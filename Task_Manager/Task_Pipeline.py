@@ -0,0 +1,162 @@
+import logging
+import queue
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator
+
+from .Collection_Pool import Collection_Pool, put_until_stopped
+from .Comment_Batch import Comment_Batch
+from .inferencer import Inferencer
+from .MinHash_Sketch import MinHash_Sketch
+from .Score_Stats import Score_Stats
+from .Task_Metrics import Task_Metrics
+
+
+class Task_Pipeline():
+    """
+    Streams a task through the collect, infer and persist stages.
+
+    Collection workers feed chunks of `chunk_size` comments into a bounded queue, the inference
+    stage dispatches each chunk as soon as it arrives, with up to `Inferencer.max_in_flight`
+    chunks outstanding, and forwards them in order to a second bounded queue, and the caller's
+    thread receives every subreddit as soon as its last chunk has been scored. The pipeline only
+    holds the subreddits still in flight, and the bounded queues stop collection from running
+    arbitrarily far ahead of inference, but each yielded subreddit stays in memory for as long
+    as the caller keeps it.
+
+    Persistence is left to the caller so that every database write happens on the thread
+    that owns the Django connection.
+
+    Args:
+        pool (Collection_Pool): The pool used for the collection stage.
+        inferencer (Inferencer): The inferencer used for the inference stage.
+        chunk_size (int): The number of comments sent per inference request.
+        queue_size (int): The maximum number of chunks waiting between two stages.
+        metrics (Task_Metrics): Times the inference of each chunk.
+        sketch_authors (bool): Whether to sketch each subreddit's authors as its chunks arrive.
+
+    Attributes:
+        failures (dict[str, str]): The traceback of every subreddit that failed, by subreddit.
+        stats (dict[str, Score_Stats]): The statistics of each yielded subreddit's scores, updated with
+            every chunk as it arrives from the inference stage.
+        sketches (dict[str, MinHash_Sketch]): The `MinHash_Sketch` of each yielded subreddit's authors, updated
+            with every chunk like `stats`, if `sketch_authors` is set.
+    """
+
+    def __init__(self, pool: Collection_Pool, inferencer: Inferencer, chunk_size: int = 100, queue_size: int = 8,
+                 metrics: Task_Metrics = None, sketch_authors: bool = False) -> None:
+        self.__pool = pool
+        self.__inferencer = inferencer
+        self.__chunk_size = chunk_size
+        self.__queue_size = queue_size
+        self.__metrics = metrics if metrics is not None else Task_Metrics()
+        self.__sketch_authors = sketch_authors
+        self.failures = {}
+        self.stats = {}
+        self.sketches = {}
+
+    def run(self, subreddits: list[str], **params) -> Iterator[tuple[str, Comment_Batch]]:
+        """
+        Runs the pipeline over the subreddits.
+
+        Args:
+            subreddits (list[str]): The display names of the subreddits to process.
+            **params: Passed through to `Subreddit_Data_Collector.iter_Comment_Data`.
+
+        Yields:
+            tuple[str, Comment_Batch]: Each subreddit with its scored comments, in the order
+            that the subreddits finish.
+        """
+        self.failures = {}
+        self.stats = {}
+        self.sketches = {}
+        collected = queue.Queue(maxsize=self.__queue_size)
+        inferred = queue.Queue(maxsize=self.__queue_size)
+        stop = threading.Event()
+
+        stages = [threading.Thread(target=self.__collect, args=(subreddits, collected, stop, params),
+                                   name="collect", daemon=True),
+                  threading.Thread(target=self.__infer, args=(collected, inferred, stop),
+                                   name="infer", daemon=True)]
+        for stage in stages:
+            stage.start()
+
+        pending = {}
+        try:
+            while True:
+                item = inferred.get()
+                if item is None:
+                    break
+                kind, sub, payload = item
+                if kind == 'chunk':
+                    pending.setdefault(sub, []).append(payload)
+                    self.stats.setdefault(sub, Score_Stats()).update(payload.scored())
+                    if self.__sketch_authors:
+                        self.sketches.setdefault(sub, MinHash_Sketch()).add(payload.username)
+                elif kind == 'done':
+                    yield sub, Comment_Batch.concat(pending.pop(sub, []))
+                elif kind == 'failed':
+                    pending.pop(sub, None)
+                    self.stats.pop(sub, None)
+                    self.sketches.pop(sub, None)
+                    self.failures[sub] = payload
+        finally:
+            # unblock the producers if the caller stopped early or raised
+            stop.set()
+            for stage in stages:
+                stage.join()
+
+    def __collect(self, subreddits: list[str], sink: queue.Queue, stop: threading.Event, params: dict) -> None:
+        try:
+            self.__pool.stream(subreddits, sink, self.__chunk_size, stop=stop, **params)
+        finally:
+            put_until_stopped(sink, None, stop)
+
+    def __infer(self, source: queue.Queue, sink: queue.Queue, stop: threading.Event) -> None:
+        # chunks are dispatched as they arrive but forwarded in arrival order, so a
+        # subreddit's 'done' marker never overtakes one of its chunks
+        window = deque()
+        failed = set()
+        max_in_flight = self.__inferencer.max_in_flight
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            while not stop.is_set():
+                try:
+                    # poll quickly while requests are outstanding so finished ones move on
+                    item = source.get(timeout=0.05 if len(window) > 0 else 0.5)
+                except queue.Empty:
+                    item = False
+                if item is None:
+                    break
+                if item:
+                    kind, sub, payload = item
+                    if kind == 'chunk':
+                        payload = pool.submit(self.__infer_chunk, sub, payload)
+                    window.append((kind, sub, payload))
+                # forward whatever is finished, and wait on the oldest chunk once the window is full
+                while len(window) > 0 and (len(window) > max_in_flight
+                                           or not isinstance(window[0][2], Future)
+                                           or window[0][2].done()):
+                    self.__forward(window.popleft(), sink, stop, failed)
+            while len(window) > 0 and not stop.is_set():
+                self.__forward(window.popleft(), sink, stop, failed)
+        put_until_stopped(sink, None, stop)
+
+    def __infer_chunk(self, sub: str, batch: Comment_Batch) -> Comment_Batch:
+        with self.__metrics.stage('inference', sub) as stage:
+            stage.items = len(batch)
+            return self.__inferencer.infer_batch(batch, self.__chunk_size)
+
+    def __forward(self, entry: tuple, sink: queue.Queue, stop: threading.Event, failed: set[str]) -> None:
+        kind, sub, payload = entry
+        if sub in failed:
+            return
+        if isinstance(payload, Future):
+            try:
+                payload = payload.result()
+            except Exception:
+                failed.add(sub)
+                kind, payload = 'failed', traceback.format_exc()
+                logging.error(f"UNABLE TO PERFORM INFERENCE: {sub}\n{payload}")
+        put_until_stopped(sink, (kind, sub, payload), stop)
@@ -0,0 +1,133 @@
+import datetime
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from django.db import connection, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from gather.models import Inference_task
+
+
+class Task_Queue():
+    """
+    Lets any number of workers drain the `Inference_task` queue concurrently.
+
+    A worker claims a task by locking the next due row with `SELECT ... FOR UPDATE SKIP LOCKED`,
+    so concurrent claims skip each other's rows instead of waiting on them, and marks it in
+    progress with a lease in the same transaction. The lease is renewed by heartbeats while the
+    task runs. A task whose lease has lapsed, because its worker died, is claimed again by the
+    next worker and resumes from its checkpoints.
+
+    Databases without row locks, such as SQLite in tests, ignore the lock clause.
+
+    Args:
+        worker_id (str): Identifies this worker on the tasks it claims, defaults to the host and process id.
+        lease (float): The seconds a claim lasts without a heartbeat.
+    """
+
+    def __init__(self, worker_id: str = None, lease: float = 300.0) -> None:
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.__lease = datetime.timedelta(seconds=lease)
+
+    def claim(self, now: datetime.datetime = None) -> Optional[Inference_task]:
+        """
+        Claims the earliest scheduled task that is due, or whose lease has lapsed.
+
+        Returns:
+            Optional[Inference_task]: The claimed task, or None if no task is available.
+        """
+        now = now or timezone.now()
+        with transaction.atomic():
+            task = (Inference_task.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(Q(status=0, start_sched__lte=now)
+                            | Q(status=1, lease_expires__lt=now)
+                            | Q(status=1, lease_expires=None))
+                    .order_by('start_sched', 'id')
+                    .first())
+            if task is None:
+                return None
+            if task.status == 1:
+                logging.warning(f"Reclaiming {task} from {task.worker}")
+            task.status = 1
+            task.worker = self.worker_id
+            task.lease_expires = now + self.__lease
+            task.save(update_fields=['status', 'worker', 'lease_expires'])
+        return task
+
+    def next_due(self, now: datetime.datetime = None) -> Optional[datetime.datetime]:
+        """
+        Returns when the next task becomes claimable after `now`, either because it is scheduled
+        then or because its lease lapses, or None if there is no such task. A task that is already
+        due is left out, as `claim` only skips one while another worker holds its row, and waiting
+        on it would not wait at all.
+        """
+        now = now or timezone.now()
+        due = Inference_task.objects.aggregate(
+            scheduled=Min('start_sched', filter=Q(status=0, start_sched__gt=now)),
+            lapsed=Min('lease_expires', filter=Q(status=1, lease_expires__gt=now)))
+        times = [time for time in due.values() if time is not None]
+        return min(times) if len(times) > 0 else None
+
+    def heartbeat(self, task: Inference_task) -> bool:
+        """
+        Renews the lease on a claimed task.
+
+        Returns:
+            bool: False if the task has been reclaimed by another worker.
+        """
+        lease_expires = timezone.now() + self.__lease
+        renewed = Inference_task.objects.filter(pk=task.pk, worker=self.worker_id, status=1) \
+            .update(lease_expires=lease_expires)
+        if renewed:
+            task.lease_expires = lease_expires
+        return renewed == 1
+
+    def release(self, task: Inference_task, status: int) -> bool:
+        """
+        Records the final status of a claimed task and gives up the lease.
+
+        Returns:
+            bool: False if the task had been reclaimed by another worker, which now owns its status.
+        """
+        released = Inference_task.objects.filter(pk=task.pk, worker=self.worker_id) \
+            .update(status=status, worker=None, lease_expires=None)
+        if released:
+            task.status, task.worker, task.lease_expires = status, None, None
+        return released == 1
+
+    @contextmanager
+    def keep_alive(self, task: Inference_task, interval: float = None) -> Iterator[threading.Event]:
+        """
+        Sends heartbeats for a task from a background thread until the block exits.
+
+        Yields:
+            threading.Event: Set if the lease was lost to another worker.
+        """
+        interval = interval or self.__lease.total_seconds() / 3
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat():
+            try:
+                while not stop.wait(interval):
+                    if not self.heartbeat(task):
+                        logging.error(f"Lost the lease on {task}")
+                        lost.set()
+                        return
+            finally:
+                # the thread has its own database connection
+                connection.close()
+
+        thread = threading.Thread(target=beat, name="heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stop.set()
+            thread.join()
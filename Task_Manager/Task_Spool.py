@@ -0,0 +1,94 @@
+import gzip
+import os
+import pickle
+import shutil
+import time
+from urllib.parse import quote, unquote
+
+from .Comment_Batch import Comment_Batch
+
+# the stages a subreddit can be checkpointed at, in the order they are reached
+COLLECTED = 'collected'
+INFERRED = 'inferred'
+STAGES = (COLLECTED, INFERRED)
+
+
+class Task_Spool():
+    """
+    Local spool of per-subreddit checkpoints for one `Inference_task`.
+
+    A subreddit is checkpointed once all of its comments have been harvested, as `COLLECTED`
+    if some of them are still missing a score and as `INFERRED` once every comment is scored.
+    A worker that restarts an interrupted task loads these instead of crawling and scoring
+    the subreddits again. The persisted stage needs no checkpoint since a task's results are
+    committed in one transaction, the spool is cleared once that transaction commits, or once
+    the task fails, as a failed task is not claimed again.
+
+    Each checkpoint is written to a temporary file and renamed into place, so a crash part way
+    through a write never leaves a corrupt checkpoint behind. The stage is part of the file's
+    name, so the stages are listed without reading any checkpoint.
+
+    Args:
+        root (str): The directory holding the spools of every task.
+        task_id (int): The primary key of the task.
+    """
+
+    def __init__(self, root: str, task_id: int) -> None:
+        self.__path = os.path.join(root, str(task_id))
+
+    @classmethod
+    def expire(cls, root: str, max_age: float) -> list[int]:
+        """
+        Removes the spools of every task not written to for `max_age` seconds, such as those left
+        by a worker that died on a task another worker then finished.
+
+        Returns:
+            list[int]: The ids of the tasks whose spools were removed.
+        """
+        if not os.path.isdir(root):
+            return []
+        expired = []
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name.isdigit() and os.path.isdir(path) and time.time() - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+                expired.append(int(name))
+        return expired
+
+    def save(self, sub: str, batch: Comment_Batch, stage: str) -> None:
+        os.makedirs(self.__path, exist_ok=True)
+        path = self.__file(sub, stage)
+        with gzip.open(path + '.tmp', 'wb') as f:
+            pickle.dump((stage, batch), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        # the checkpoint of an earlier stage is only removed once the new one is in place
+        for other in STAGES:
+            if other != stage and os.path.exists(self.__file(sub, other)):
+                os.remove(self.__file(sub, other))
+
+    def load(self, sub: str) -> tuple[str, Comment_Batch]:
+        """Returns the stage and the comments of a subreddit's latest checkpoint."""
+        for stage in reversed(STAGES):
+            if os.path.exists(self.__file(sub, stage)):
+                with gzip.open(self.__file(sub, stage), 'rb') as f:
+                    return pickle.load(f)
+        raise FileNotFoundError(f"No checkpoint of {sub}")
+
+    def stages(self) -> dict[str, str]:
+        """Returns the latest stage of every checkpointed subreddit."""
+        if not os.path.isdir(self.__path):
+            return {}
+        stages = {}
+        for name in os.listdir(self.__path):
+            if name.endswith('.spool'):
+                sub, stage = name[:-len('.spool')].rsplit('.', 1)
+                sub = unquote(sub)
+                if stage in STAGES and STAGES.index(stage) >= STAGES.index(stages.get(sub, stage)):
+                    stages[sub] = stage
+        return stages
+
+    def clear(self) -> None:
+        shutil.rmtree(self.__path, ignore_errors=True)
+
+    def __file(self, sub: str, stage: str) -> str:
+        return os.path.join(self.__path, f"{quote(sub, safe='')}.{stage}.spool")
@@ -0,0 +1,151 @@
+import logging
+import math
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from gather.models import Comment_result, Subreddit_result, Subreddit_status, Subreddit_trend
+
+
+class Trend_Rollup():
+    """
+    Maintains `Subreddit_trend`, the statistics of each subreddit's results per bucket of time.
+
+    Each result is added to the bucket of every period holding its timestamp, in the current time
+    zone, for the time scale of its task. The count, mean and standard deviation of the bucket are
+    combined exactly from those of the results, weighted by their number of scored comments, and
+    their histograms are added. `add` is called once for the results of each task, within the
+    transaction that writes them, so that every result is counted exactly once. A subreddit's
+    trend is then read from one range of the table's unique index, however many tasks have run.
+
+    Args:
+        periods (tuple[str]): The periods of the buckets, of `Subreddit_trend.PERIODS`.
+        batch_size (int): The most rows sent in one statement.
+    """
+
+    def __init__(self, periods: tuple[str] = ('day', 'week', 'month'), batch_size: int = 1000) -> None:
+        self.__periods = periods
+        self.__batch_size = batch_size
+
+    def bucket(self, timestamp: datetime, period: str) -> datetime:
+        """Returns the start of the bucket of `period` holding `timestamp`."""
+        start = timezone.localtime(timestamp).replace(hour=0, minute=0, second=0, microsecond=0)
+        if period == 'week':
+            start -= timedelta(days=start.weekday())
+        elif period == 'month':
+            start = start.replace(day=1)
+        # the offset of the start itself, which differs from the timestamp's across daylight saving time
+        return timezone.make_aware(start.replace(tzinfo=None))
+
+    def add(self, results: list[Subreddit_result], time_scale: str) -> None:
+        """
+        Adds the results of a task to their buckets, creating the missing ones. The buckets are
+        locked until the end of the transaction so that concurrent tasks add to them in turn.
+
+        Args:
+            results (list[Subreddit_result]): The saved results to add.
+            time_scale (str): The time scale of the results' task.
+        """
+        keys = {}
+        for result in results:
+            keys[result.pk] = [(result.subreddit_id, period, self.bucket(result.timestamp, period))
+                               for period in self.__periods]
+        unique = {key for result_keys in keys.values() for key in result_keys}
+        if len(unique) == 0:
+            return
+
+        with transaction.atomic():
+            Subreddit_trend.objects.bulk_create([Subreddit_trend(subreddit_id=subreddit_id, time_scale=time_scale,
+                                                                 period=period, start=start)
+                                                 for subreddit_id, period, start in unique],
+                                                batch_size=self.__batch_size, ignore_conflicts=True)
+            trends = {}
+            subreddits = list({subreddit_id for subreddit_id, period, start in unique})
+            starts = list({start for subreddit_id, period, start in unique})
+            for i in range(0, len(subreddits), self.__batch_size):
+                for trend in Subreddit_trend.objects.select_for_update().order_by('pk').filter(
+                        subreddit_id__in=subreddits[i:i + self.__batch_size], time_scale=time_scale,
+                        period__in=self.__periods, start__in=starts):
+                    trends[(trend.subreddit_id, trend.period, trend.start)] = trend
+
+            for result in results:
+                scored = self.__scored(result)
+                for key in keys[result.pk]:
+                    self.__merge(trends[key], result, scored)
+            Subreddit_trend.objects.bulk_update([trends[key] for key in unique],
+                                                ['results', 'scored', 'min_result', 'max_result',
+                                                 'mean_result', 'std_result', 'histogram'],
+                                                batch_size=self.__batch_size)
+
+    def rebuild(self, subreddits: list[str] = None) -> int:
+        """
+        Recomputes the trends of the subreddits from every stored result, or of every subreddit.
+
+        Returns:
+            int: The number of results rolled up.
+        """
+        results = Subreddit_result.objects.select_related('inference_task').order_by('pk')
+        trends = Subreddit_trend.objects.all()
+        if subreddits is not None:
+            results = results.filter(subreddit__display_name__in=subreddits)
+            trends = trends.filter(subreddit__display_name__in=subreddits)
+
+        count = 0
+        with transaction.atomic():
+            trends.delete()
+            chunk = []
+            for result in results.iterator(chunk_size=self.__batch_size):
+                chunk.append(result)
+                if len(chunk) == self.__batch_size:
+                    count += self.__add_by_time_scale(chunk)
+                    chunk = []
+            count += self.__add_by_time_scale(chunk)
+        logging.info(f"Rolled up {count} results")
+        return count
+
+    def __add_by_time_scale(self, results: list[Subreddit_result]) -> int:
+        by_time_scale = {}
+        for result in results:
+            by_time_scale.setdefault(result.inference_task.time_scale, []).append(result)
+        for time_scale, scale_results in by_time_scale.items():
+            self.add(scale_results, time_scale)
+        return len(results)
+
+    def __scored(self, result: Subreddit_result) -> int:
+        if result.histogram is not None:
+            return sum(result.histogram['counts'])
+        if result.mean_result is None:
+            return 0
+        # results stored before their histogram, whose unscored comments were stored as 0.0, so they are
+        # taken from the status of the result where it was recorded, and otherwise every 0.0 is left out
+        comments = Comment_result.objects.filter(subreddit_result=result, mhs_score__isnull=False)
+        status = Subreddit_status.objects.filter(subreddit_result=result).first()
+        if status is not None:
+            return max(0, comments.count() - status.unscored)
+        return comments.exclude(mhs_score=0.0).count()
+
+    def __merge(self, trend: Subreddit_trend, result: Subreddit_result, scored: int) -> None:
+        trend.results += 1
+        if scored == 0:
+            return
+        # Chan et al.'s combination of the two means and sums of squared deviations
+        total = trend.scored + scored
+        mean = trend.mean_result if trend.scored > 0 else 0.0
+        m2 = trend.std_result ** 2 * trend.scored if trend.scored > 0 else 0.0
+        delta = result.mean_result - mean
+        m2 += result.std_result ** 2 * scored + delta ** 2 * trend.scored * scored / total
+        trend.mean_result = mean + delta * scored / total
+        trend.std_result = math.sqrt(m2 / total)
+        trend.min_result = result.min_result if trend.min_result is None else min(trend.min_result, result.min_result)
+        trend.max_result = result.max_result if trend.max_result is None else max(trend.max_result, result.max_result)
+
+        if result.histogram is not None:
+            if trend.histogram is None:
+                trend.histogram = {'edges': result.histogram['edges'], 'counts': list(result.histogram['counts'])}
+            elif trend.histogram['edges'] == result.histogram['edges']:
+                trend.histogram['counts'] = [a + b for a, b in zip(trend.histogram['counts'],
+                                                                   result.histogram['counts'])]
+            else:
+                logging.warning(f"Histogram of {result} has other edges than its trend, it is left out")
+        trend.scored = total
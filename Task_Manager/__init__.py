@@ -1,2 +1,6 @@
 from .Subreddit_Data_Collector import Subreddit_Data_Collector, commentData
+from .Comment_Batch import Comment_Batch
 from .Task_Manager import Task_Manager
+from .Task_Queue import Task_Queue
+from .Task_Listener import Task_Listener
+from .Reddit_Session import Reddit_Session
@@ -1,7 +1,114 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 import requests
 import logging
-from . import commentData
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+import numpy as np
+from . import Comment_Batch, commentData
+from .Score_Cache import Score_Cache
+from .Task_Metrics import Task_Metrics
+
+# responses that mean the server is overloaded or briefly unavailable
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+MAX_BACKOFF = 60.0
+
+
+class Batch_Budget():
+    """
+    Character budget for a single inference request, adapted to the observed latency.
+
+    Comment lengths vary by orders of magnitude, so batches are sized by characters rather
+    than by count. After each request that used at least half of the budget the budget is
+    moved towards the number of characters that the last request suggests can be scored in
+    `target_latency` seconds, and it is halved whenever the server rejects a payload as too large.
+
+    Args:
+        max_chars (int): The initial number of characters per request.
+        target_latency (float): The desired duration of one request in seconds.
+        min_chars (int): The smallest budget that adaptation may reach.
+        max_chars_limit (int): The largest budget that adaptation may reach.
+        smoothing (float): The weight given to each new observation, between 0 and 1.
+    """
+
+    def __init__(self, max_chars: int = 20000, target_latency: float = 2.0, min_chars: int = 1000,
+                 max_chars_limit: int = 200000, smoothing: float = 0.3) -> None:
+        self.__max_chars = float(max_chars)
+        self.__target_latency = target_latency
+        self.__min_chars = min_chars
+        self.__max_chars_limit = max_chars_limit
+        self.__smoothing = smoothing
+        self.__lock = threading.Lock()
+
+    @property
+    def max_chars(self) -> int:
+        return int(self.__max_chars)
+
+    def observe(self, chars: int, latency: float) -> None:
+        """Updates the budget from a successful request of `chars` characters that took `latency` seconds."""
+        # small batches are dominated by fixed overhead and would drag the budget down
+        if latency <= 0 or chars < self.__max_chars / 2:
+            return
+        estimate = chars * self.__target_latency / latency
+        with self.__lock:
+            budget = (1 - self.__smoothing) * self.__max_chars + self.__smoothing * estimate
+            self.__max_chars = min(self.__max_chars_limit, max(self.__min_chars, budget))
+
+    def shrink(self) -> None:
+        """Halves the budget after the server rejected a payload as too large."""
+        with self.__lock:
+            self.__max_chars = max(self.__min_chars, self.__max_chars / 2)
+
+
+class Circuit_Breaker():
+    """
+    Pauses dispatch to the inference API while the model server is overloaded.
+
+    The breaker opens after `failure_threshold` consecutive failed requests, or for as long as
+    the server asks in a `Retry-After` header. While it is open every thread about to send a
+    request waits until it closes again. A single success resets the failure count, while a
+    failure right after the pause reopens it immediately.
+
+    Args:
+        failure_threshold (int): The number of consecutive failures that opens the breaker.
+        cooldown (float): The number of seconds that the breaker stays open.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0) -> None:
+        self.__failure_threshold = failure_threshold
+        self.__cooldown = cooldown
+        self.__failures = 0
+        self.__open_until = 0.0
+        self.__lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Blocks while the breaker is open."""
+        while True:
+            with self.__lock:
+                delay = self.__open_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def record_success(self) -> None:
+        with self.__lock:
+            self.__failures = 0
+
+    def record_failure(self, retry_after: float = None) -> None:
+        with self.__lock:
+            self.__failures += 1
+            now = time.monotonic()
+            if retry_after is not None:
+                # never paused longer than any backoff, whatever the server asks
+                self.__open_until = max(self.__open_until, now + min(retry_after, MAX_BACKOFF))
+            elif self.__failures >= self.__failure_threshold and self.__open_until <= now:
+                logging.warning(f"Inference API failed {self.__failures} times in a row, "
+                                f"pausing for {self.__cooldown} seconds")
+                self.__open_until = now + self.__cooldown
 
 
 class Inferencer():
@@ -13,26 +120,70 @@ class Inferencer():
     combined with the original comments to produce a list of comment objects, each
     with a `mhs_score` attribute representing the sentiment score of the comment.
 
+    Requests are sent over a pooled keep-alive session, and up to `max_in_flight` of them
+    may be outstanding at once across every thread sharing the Inferencer. Each request holds
+    at most `chunk_size` comments and at most `Batch_Budget.max_chars` characters. Comments
+    already scored in the `Score_Cache` are not sent.
+
+    Failed requests are retried with jittered exponential backoff, honouring `Retry-After`,
+    and the `Circuit_Breaker` pauses every thread while the server is overloaded. A chunk that
+    still fails leaves `mhs_score` as None for exactly its own comments.
+
     Args:
         apikey (str): API Key to be used for sending requests to the inference API.
         url (str): URL of the inference API.
+        max_in_flight (int): The maximum number of concurrent requests to the inference API.
+        budget (Batch_Budget): The adaptive character budget per request, a default budget if None.
+        cache (Score_Cache): The cache of previously computed scores, no caching if None.
+        breaker (Circuit_Breaker): Shared pause on overload, a default breaker if None.
+        max_retries (int): The number of times a failed request is retried.
+        backoff (float): The base delay in seconds of the exponential backoff.
+        metrics (Task_Metrics): Counts the requests and retries towards the caller's stage.
 
     Methods:
         infer: Runs inference on the list of comments.
+        infer_batch: Runs inference on a `Comment_Batch`.
+        close: Releases the pooled connections.
 
     """
 
-    def __init__(self, apikey: str, url: str) -> None:
+    def __init__(self, apikey: str, url: str, max_in_flight: int = 1, budget: Batch_Budget = None,
+                 cache: Score_Cache = None, breaker: Circuit_Breaker = None,
+                 max_retries: int = 5, backoff: float = 1.0, metrics: Task_Metrics = None) -> None:
         """
         Initializes the Inferencer class with the API Key and URL.
 
         Args:
             apikey (str): API Key for accessing the inference service.
             url (str): URL for the inference service.
+            max_in_flight (int): The maximum number of concurrent requests.
+            budget (Batch_Budget): The adaptive character budget per request.
+            cache (Score_Cache): The cache of previously computed scores.
+            breaker (Circuit_Breaker): Shared pause on overload.
+            max_retries (int): The number of times a failed request is retried.
+            backoff (float): The base delay in seconds of the exponential backoff.
+            metrics (Task_Metrics): Counts the requests and retries.
 
         """
         self.__apikey = apikey
         self.__url = url
+        self.__max_in_flight = max(1, max_in_flight)
+        self.__budget = budget if budget is not None else Batch_Budget()
+        self.__cache = cache
+        self.__breaker = breaker if breaker is not None else Circuit_Breaker()
+        self.__max_retries = max_retries
+        self.__backoff = backoff
+        self.__metrics = metrics if metrics is not None else Task_Metrics()
+        self.__in_flight = threading.BoundedSemaphore(self.__max_in_flight)
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=self.__max_in_flight)
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+
+    @property
+    def max_in_flight(self) -> int:
+        return self.__max_in_flight
 
     def infer(self, comments: list[commentData], chunk_size: int) -> list[commentData]:
         """
@@ -40,43 +191,172 @@ class Inferencer():
 
         Args:
             comments (list[commentData]): List of comment data objects.
-            chunk_size (int): The size of chunks to make the inference.
+            chunk_size (int): The maximum number of comments per request.
 
         Returns:
             list[commentData]: List of comment data objects with the `mhs_score` field filled.
 
         """
+        scores = self.__score([x.comment_body for x in comments], chunk_size)
+        return self.__combineResults(comments, scores)
+
+    def infer_batch(self, batch: Comment_Batch, chunk_size: int) -> Comment_Batch:
+        """
+        Performs sentiment analysis on the comments of a columnar batch that have no score yet.
+
+        Args:
+            batch (Comment_Batch): The comments to score.
+            chunk_size (int): The maximum number of comments per request.
+
+        Returns:
+            Comment_Batch: The same batch with `mhs_score` filled, NaN where inference failed.
+
+        """
+        missing = np.flatnonzero(np.isnan(batch.mhs_score))
+        scores = self.__score([batch.comment_body[i] for i in missing], chunk_size)
+        batch.mhs_score[missing] = [np.nan if score == None else score for score in scores]
+        return batch
+
+    def __score(self, comment_text: list[str], chunk_size: int) -> list[float]:
+        """
+        Returns the score of each comment in order, None where inference failed.
+        """
+        scores = [None] * len(comment_text)
+        if self.__cache is not None:
+            scores = self.__cache.get_many(comment_text)
+
+        # only the cache misses are sent for inference
+        missing = [i for i, score in enumerate(scores) if score == None]
+        chunks = self.__chunker([comment_text[i] for i in missing], chunk_size)
         response = []
-        comment_text = [x.comment_body for x in comments]
-        for chunk in tqdm(self.__chunker(comment_text, chunk_size), desc=f"Inference:"):
-            data = self.__request_inference(chunk)
+        for chunk, data in zip(chunks, self.__dispatch(chunks)):
             if (data == None):
-                logging.error("UNABLE TO PERFORM INFERENCE")
-                continue
+                logging.error(f"UNABLE TO PERFORM INFERENCE on {len(chunk)} comments")
+                # keep the place of the failed comments so later scores stay aligned
+                data = {"predictions": [[None]] * len(chunk)}
             response.extend(data['predictions'])
 
         response = self.__flatten(response)
-        return self.__combineResults(comments, response)
+        for i, score in zip(missing, response):
+            scores[i] = score
+
+        if self.__cache is not None:
+            self.__cache.put_many({comment_text[i]: scores[i] for i in missing if scores[i] != None})
+        return scores
+
+    def close(self) -> None:
+        """
+        Closes the pooled connections to the inference API.
+        """
+        self.__session.close()
+
+    def __dispatch(self, chunks: list[list[str]]) -> list:
+        """
+        Requests inference for every chunk, returning the responses in the order of the chunks.
+        """
+        if self.__max_in_flight == 1 or len(chunks) < 2:
+            return [self.__request_inference(chunk) for chunk in tqdm(chunks, desc=f"Inference:")]
+        with ThreadPoolExecutor(max_workers=min(self.__max_in_flight, len(chunks))) as pool:
+            # each request runs in a copy of the caller's context, so it counts towards the caller's stage
+            futures = [pool.submit(contextvars.copy_context().run, self.__request_inference, chunk)
+                       for chunk in chunks]
+            return [future.result() for future in tqdm(futures, desc=f"Inference:")]
 
     def __chunker(self, data: list[str], chunk_size: int) -> list[str]:
         """
-        Chunks the data into the specified chunk size.
+        Chunks the data into chunks of at most `chunk_size` items and the current character budget.
+        A single item larger than the budget is sent on its own.
         """
-        return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        max_chars = self.__budget.max_chars
+        chunks = []
+        chunk = []
+        chars = 0
+        for item in data:
+            if len(chunk) > 0 and (len(chunk) == chunk_size or chars + len(item) > max_chars):
+                chunks.append(chunk)
+                chunk = []
+                chars = 0
+            chunk.append(item)
+            chars += len(item)
+        if len(chunk) > 0:
+            chunks.append(chunk)
+        return chunks
 
     def __request_inference(self, data):
         payload = {"instances": data}
         headers = {"apikey": self.__apikey}
-        for attempts in range(5):
+        for attempts in range(self.__max_retries + 1):
+            retry_after = None
+            self.__breaker.wait()
+            self.__metrics.add(api_calls=1, retries=1 if attempts > 0 else 0)
             try:
-                response = requests.post(
-                    self.__url, json=payload, headers=headers)
-                return response.json()
-            except requests.exceptions.HTTPError as e:
-                logging.warning(f"{e}\nTrying {5-attempts} more times")
-                continue
+                with self.__in_flight:
+                    start = time.monotonic()
+                    response = self.__session.post(
+                        self.__url, json=payload, headers=headers)
+                    latency = time.monotonic() - start
+                if response.status_code == 413 and len(data) > 1:
+                    self.__breaker.record_success()
+                    self.__budget.shrink()
+                    return self.__split_inference(data)
+                if response.status_code in RETRYABLE_STATUS:
+                    retry_after = self.__retry_after(response)
+                    raise requests.exceptions.HTTPError(
+                        f"{response.status_code} from inference API", response=response)
+                if not response.ok:
+                    # the request itself is wrong, sending it again will not help
+                    logging.error(f"Inference API rejected request: {response.status_code}")
+                    return None
+                result = response.json()
+                if len(result['predictions']) != len(data):
+                    raise ValueError(
+                        f"Expected {len(data)} predictions, got {len(result['predictions'])}")
+                self.__breaker.record_success()
+                self.__budget.observe(sum(len(x) for x in data), latency)
+                return result
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                self.__breaker.record_failure(retry_after)
+                if attempts == self.__max_retries:
+                    break
+                # full jitter, unless the server told us how long to wait
+                delay = retry_after if retry_after is not None else random.uniform(
+                    0, min(MAX_BACKOFF, self.__backoff * 2 ** attempts))
+                logging.warning(f"{e}\nTrying {self.__max_retries - attempts} more times in {delay:.1f}s")
+                time.sleep(delay)
         return None
 
+    def __retry_after(self, response) -> float:
+        """
+        Returns the delay in seconds requested by a `Retry-After` header, None if there is none.
+        The delay is capped at `MAX_BACKOFF`, so a server cannot stall the workers indefinitely.
+        """
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return min(MAX_BACKOFF, max(0.0, float(value)))
+        except ValueError:
+            pass
+        try:
+            return min(MAX_BACKOFF, max(0.0, parsedate_to_datetime(value).timestamp() - time.time()))
+        except (TypeError, ValueError):
+            return None
+
+    def __split_inference(self, data):
+        """
+        Requests inference for the two halves of a payload that was too large.
+        A half that fails keeps its place with None scores.
+        """
+        logging.warning(f"Payload of {len(data)} comments too large, splitting it")
+        middle = len(data) // 2
+        halves = [data[:middle], data[middle:]]
+        results = [self.__request_inference(half) for half in halves]
+        if results[0] == None and results[1] == None:
+            return None
+        return {"predictions": [prediction
+                                for half, result in zip(halves, results)
+                                for prediction in (result["predictions"] if result != None else [[None]] * len(half))]}
+
     def __flatten(self, data):
         return [item for sublist in data for item in sublist]
 
@@ -0,0 +1,67 @@
+import queue
+import threading
+from functools import partialmethod
+from unittest.mock import Mock, patch
+
+from django.test import TestCase
+from tqdm import tqdm
+
+from . import commentData
+from .Collection_Pool import Collection_Pool, Rate_Limiter
+
+
+class Rate_Limiter_Test(TestCase):
+    def test_burst_does_not_wait(self):
+        limiter = Rate_Limiter(calls_per_minute=60, burst=3)
+        with patch('time.sleep') as sleep:
+            for _ in range(3):
+                self.assertEqual(limiter.acquire(), 0.0)
+            sleep.assert_not_called()
+
+    def test_waits_when_empty(self):
+        clock = [0.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with patch('time.monotonic', side_effect=lambda: clock[0]), patch('time.sleep', side_effect=sleep):
+            limiter = Rate_Limiter(calls_per_minute=60, burst=1)
+            self.assertEqual(limiter.acquire(), 0.0)
+            self.assertAlmostEqual(limiter.acquire(), 1.0)
+
+
+class Collection_Pool_Test(TestCase):
+    def setUp(self) -> None:
+        tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
+
+    def test_stream_reports_failures(self):
+        def iter_Comment_Data(display_name, **params):
+            if display_name == 'private_sub':
+                raise Exception('403 Forbidden')
+            return iter([commentData(f"comment {i} in {display_name}", "user", "link", None, False) for i in range(3)])
+
+        collector = Mock(iter_Comment_Data=Mock(side_effect=iter_Comment_Data))
+        sink = queue.Queue()
+        Collection_Pool(collector, max_workers=2).stream(['python', 'private_sub', 'django'], sink, 2, scope='week')
+
+        items = [sink.get_nowait() for _ in range(sink.qsize())]
+        chunks = {}
+        for kind, sub, payload in items:
+            if kind == 'chunk':
+                chunks.setdefault(sub, []).append(len(payload))
+        self.assertEqual(chunks, {'python': [2, 1], 'django': [2, 1]})
+        self.assertEqual({sub for kind, sub, payload in items if kind == 'done'}, {'python', 'django'})
+        failures = {sub: payload for kind, sub, payload in items if kind == 'failed'}
+        self.assertEqual(list(failures.keys()), ['private_sub'])
+        self.assertIn('403 Forbidden', failures['private_sub'])
+        self.assertEqual(collector.iter_Comment_Data.call_count, 3)
+
+    def test_stream_stops(self):
+        collector = Mock(iter_Comment_Data=Mock(
+            side_effect=lambda display_name, **params: iter([commentData("comment", "user", "link", None, False)] * 10)))
+        stop = threading.Event()
+        stop.set()
+        sink = queue.Queue(maxsize=1)
+        # a set stop abandons the collection instead of blocking on the full sink
+        Collection_Pool(collector, max_workers=1).stream(['python'], sink, 1, stop=stop, scope='week')
+        self.assertLessEqual(sink.qsize(), 1)
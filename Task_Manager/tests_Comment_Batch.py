@@ -0,0 +1,33 @@
+import numpy as np
+from django.test import TestCase
+
+from . import Comment_Batch, commentData
+
+
+class Comment_Batch_Test(TestCase):
+    def setUp(self) -> None:
+        self.comments = [commentData(f"comment {i}", "".join(["user", str(i % 2)]), f"permalink{i}",
+                                     None if i == 1 else i / 10, i == 2)
+                         for i in range(4)]
+
+    def test_from_comments(self):
+        batch = Comment_Batch.from_comments(self.comments)
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(batch.mhs_score.dtype, np.float32)
+        self.assertTrue(np.isnan(batch.mhs_score[1]))
+        self.assertEqual(batch.edited.tolist(), [False, False, True, False])
+        # repeat authors share one string
+        self.assertIs(batch.username[0], batch.username[2])
+
+    def test_scored(self):
+        batch = Comment_Batch.from_comments(self.comments)
+        np.testing.assert_allclose(batch.scored(), [0.0, 0.2, 0.3])
+
+    def test_concat_and_iter(self):
+        batch = Comment_Batch.concat([Comment_Batch.from_comments(self.comments[:3]),
+                                      Comment_Batch.from_comments(self.comments[3:])])
+        self.assertEqual(batch.permalink, [f"permalink{i}" for i in range(4)])
+        rows = list(batch)
+        self.assertEqual(rows[1].mhs_score, None)
+        self.assertAlmostEqual(rows[3].mhs_score, 0.3, places=6)
+        self.assertEqual(len(Comment_Batch.concat([])), 0)
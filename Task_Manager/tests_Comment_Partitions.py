@@ -0,0 +1,27 @@
+from django.test import TestCase
+
+from .Comment_Partitions import BOUND, Comment_Partitions
+
+
+class Comment_Partitions_Test(TestCase):
+    def setUp(self) -> None:
+        self.partitions = Comment_Partitions(tasks_per_partition=100)
+
+    def test_range(self):
+        self.assertEqual(self.partitions.range(250, []), (200, 300))
+        self.assertEqual(self.partitions.range(250, [(200, 300)]), (None, None))
+        # a new partition is clipped to the ranges around it
+        self.assertEqual(self.partitions.range(250, [(0, 220), (280, 400)]), (220, 280))
+        self.assertEqual(self.partitions.range(99, [(0, 50)]), (50, 100))
+
+    def test_bound(self):
+        self.assertEqual(BOUND.search("FOR VALUES FROM ('100') TO ('200')").groups(), ("100", "200"))
+        self.assertEqual(BOUND.search("FOR VALUES FROM (100) TO (200)").groups(), ("100", "200"))
+        self.assertIsNone(BOUND.search("DEFAULT"))
+
+    def test_unpartitioned_database(self):
+        # SQLite has no partitions, so every operation does nothing
+        self.assertFalse(self.partitions.partitioned)
+        self.partitions.ensure(1)
+        self.partitions.convert()
+        self.assertEqual(self.partitions.detach(1000), [])
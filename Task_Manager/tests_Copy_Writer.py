@@ -0,0 +1,36 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from gather.models import Author, Comment, Comment_result, Inference_task, Subreddit, Subreddit_result
+
+from .Copy_Writer import Copy_Writer, Row_Stream, csv_line
+
+
+class Copy_Writer_Test(TestCase):
+    def test_csv_line(self):
+        self.assertEqual(csv_line((1, 'say "hi",\nbye', None, '', 0.5, True)),
+                         '1,"say ""hi"",\nbye",,"",0.5,t\n')
+
+    def test_row_stream(self):
+        stream = Row_Stream(iter(["abc\n", "defgh\n", "i\n"]))
+        self.assertEqual(stream.read(5), "abc\nd")
+        self.assertEqual(stream.read(), "efgh\ni\n")
+        self.assertEqual(stream.read(5), "")
+
+    def test_write(self):
+        # takes the COPY path on PostgreSQL and the bulk_create fallback everywhere else
+        subreddit = Subreddit.objects.create(custom_id='abc', display_name='test_subreddit')
+        task = Inference_task.objects.create(start_sched=timezone.now(), time_scale='week',
+                                             subreddit_set=['test_subreddit'], status=0)
+        result = Subreddit_result.objects.create(subreddit=subreddit, inference_task=task, edges={})
+        author = Author.objects.create(name='user')
+        writer = Copy_Writer(Comment, ['reddit_id', 'author', 'permalink', 'body', 'edited'])
+        writer.write((f"c{i}", author.pk, f"link{i}", f'comment "{i}"', i == 1) for i in range(3))
+        writer = Copy_Writer(Comment_result, ['subreddit_result', 'inference_task', 'subreddit', 'comment', 'mhs_score'])
+        writer.write((result.pk, task.pk, subreddit.pk, f"c{i}", i / 10) for i in range(3))
+
+        saved = Comment_result.objects.order_by('comment')
+        self.assertEqual([c.comment.body for c in saved], ['comment "0"', 'comment "1"', 'comment "2"'])
+        self.assertEqual([c.comment.edited for c in saved], [False, True, False])
+        self.assertEqual([c.mhs_score for c in saved], [0.0, 0.1, 0.2])
+        self.assertEqual(saved[0].subreddit_result, result)
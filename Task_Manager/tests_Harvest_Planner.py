@@ -0,0 +1,57 @@
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from .Harvest_Planner import Harvest_Planner
+
+
+class Harvest_Planner_Test(TestCase):
+    def listing(self, counts):
+        # counts how many posts have been read from the listing
+        self.listed = 0
+        for i, num_comments in enumerate(counts):
+            self.listed += 1
+            yield Mock(id=i, num_comments=num_comments)
+
+    def harvest(self, planner, posts, eligible):
+        fetched = []
+        for post, limit in planner.plan(posts):
+            fetched.append((post.id, limit))
+            planner.record(post, min(planner.remaining, int(min(post.num_comments, limit) * eligible)))
+        return fetched
+
+    def test_stops_listing_once_budget_is_covered(self):
+        planner = Harvest_Planner(comments_n=50, per_post_n=100, prior_rate=1.0)
+        fetched = self.harvest(planner, self.listing([60] * 1000), eligible=1.0)
+        self.assertEqual(fetched, [(0, 50)])
+        self.assertEqual(self.listed, 1)
+        self.assertEqual(planner.harvested, 50)
+
+    def test_skips_posts_without_comments(self):
+        planner = Harvest_Planner(comments_n=10, per_post_n=100, prior_rate=1.0)
+        fetched = self.harvest(planner, self.listing([0, 0, 4, 0, 20]), eligible=1.0)
+        # the posts are fetched in rank order, the larger one making up what the smaller one lacks
+        self.assertEqual(fetched, [(2, 4), (4, 6)])
+        self.assertEqual(planner.harvested, 10)
+
+    def test_learns_the_eligible_rate(self):
+        planner = Harvest_Planner(comments_n=100, per_post_n=50, prior_rate=1.0, prior_weight=1)
+        fetched = self.harvest(planner, self.listing([50] * 20), eligible=0.2)
+        self.assertEqual(planner.harvested, 100)
+        self.assertEqual(len(fetched), 11)
+        self.assertLess(planner.rate, 0.3)
+        # every post asks for at most per_post_n comments
+        self.assertTrue(all(0 < limit <= 50 for post, limit in fetched))
+
+    def test_fair_share_in_rank_order(self):
+        planner = Harvest_Planner(comments_n=60, per_post_n=100)
+        fetched = self.harvest(planner, self.listing([10, 100, 5, 100, 100]), eligible=0.5)
+        # the small posts give all of their comments and the large ones an even share of the rest
+        self.assertEqual(fetched, [(0, 10), (1, 53), (2, 5), (3, 56)])
+        self.assertEqual(planner.harvested, 60)
+
+    def test_listing_runs_out(self):
+        planner = Harvest_Planner(comments_n=100, per_post_n=10)
+        self.harvest(planner, self.listing([5, 5]), eligible=1.0)
+        self.assertEqual(planner.harvested, 10)
+        self.assertEqual(planner.remaining, 90)
@@ -0,0 +1,60 @@
+import threading
+from functools import partialmethod
+from unittest.mock import patch
+
+import requests
+from django.test import TestCase
+from tqdm import tqdm
+
+from . import commentData
+from .inferencer import Circuit_Breaker, Inferencer
+from .MHS_Stub_Server import MHS_Stub_Server
+
+
+class MHS_Stub_Server_Test(TestCase):
+    def setUp(self) -> None:
+        tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
+
+    def comments(self, n):
+        return [commentData(f"comment {i}", f"username{i}", f"permalink{i}", None, False) for i in range(n)]
+
+    def test_protocol(self):
+        with MHS_Stub_Server(seed=1, api_key="key") as server:
+            response = requests.post(server.url, json={"instances": ["a", "b"]}, headers={"apikey": "key"})
+            self.assertEqual(response.json(), {"predictions": [[server.score("a")], [server.score("b")]]})
+            self.assertEqual(requests.post(server.url, json={"instances": ["a"]}).status_code, 401)
+            self.assertEqual(requests.post(server.url, data="not json", headers={"apikey": "key"}).status_code, 400)
+        # scores only depend on the seed and the comment
+        self.assertEqual(server.score("a"), MHS_Stub_Server(seed=1).score("a"))
+        self.assertNotEqual(server.score("a"), MHS_Stub_Server(seed=2).score("a"))
+        self.assertTrue(-4.0 <= server.score("a") < 4.0)
+
+    def test_inferencer_end_to_end(self):
+        with MHS_Stub_Server(max_instances=4, max_chars=1000) as server:
+            inf = Inferencer("key", server.url, max_in_flight=4)
+            result = inf.infer(self.comments(20), 8)
+            inf.close()
+        # the payloads over max_instances were refused and split
+        self.assertEqual([c.mhs_score for c in result], [server.score(f"comment {i}") for i in range(20)])
+
+    @patch('Task_Manager.inferencer.time.sleep')
+    def test_injected_errors(self, sleep):
+        with MHS_Stub_Server(error_rate=1.0, error_status=503) as server:
+            inf = Inferencer("key", server.url, breaker=Circuit_Breaker(failure_threshold=100), max_retries=2)
+            result = inf.infer(self.comments(2), 10)
+            inf.close()
+        self.assertEqual([c.mhs_score for c in result], [None, None])
+        self.assertEqual(server.requests, 3)
+
+    def test_max_concurrency(self):
+        release = threading.Event()
+        with MHS_Stub_Server(max_concurrency=1, latency=0.2) as server:
+            first = threading.Thread(target=requests.post, args=(server.url,), kwargs={"json": {"instances": ["a"]}})
+            first.start()
+            while server.peak_concurrency == 0:
+                release.wait(0.01)
+            response = requests.post(server.url, json={"instances": ["b"]})
+            first.join()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertEqual(server.peak_concurrency, 1)
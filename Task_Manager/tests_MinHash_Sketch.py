@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from .MinHash_Sketch import MinHash_Sketch
+from .Overlap_Engine import Overlap_Engine
+
+
+class MinHash_Sketch_Test(TestCase):
+    def sketch(self, usernames):
+        sketch = MinHash_Sketch(num_perm=256)
+        sketch.update(usernames)
+        return sketch
+
+    def test_jaccard(self):
+        a = self.sketch(f"user{i}" for i in range(0, 1000))
+        b = self.sketch(f"user{i}" for i in range(500, 1500))
+        # true Jaccard is 500 / 1500, allow three standard errors
+        self.assertAlmostEqual(a.jaccard(b), 1 / 3, delta=3 * MinHash_Sketch.error_bound(256))
+        self.assertEqual(a.jaccard(self.sketch(f"user{i}" for i in range(0, 1000))), 1.0)
+        self.assertEqual(a.count, 1000)
+
+    def test_update_in_parts(self):
+        whole = self.sketch(f"user{i}" for i in range(100))
+        parts = self.sketch(f"user{i}" for i in range(50))
+        parts.update(f"user{i}" for i in range(50, 100))
+        self.assertEqual(whole.signature.tolist(), parts.signature.tolist())
+
+    def test_add_in_chunks(self):
+        sketch = MinHash_Sketch(num_perm=256)
+        # overlapping chunks, as an author may comment in several of them
+        for start in range(0, 2000, 100):
+            sketch.add(f"user{i}" for i in range(start, start + 200))
+        self.assertEqual(sketch.signature.tolist(), self.sketch(f"user{i}" for i in range(2100)).signature.tolist())
+        self.assertAlmostEqual(sketch.count, 2100, delta=3 * 2100 / (256 - 2) ** 0.5)
+        self.assertEqual(MinHash_Sketch().count, 0)
+
+    def test_sketch_overlaps(self):
+        sketches = {'python': self.sketch(f"user{i}" for i in range(0, 1000)),
+                    'django': self.sketch(f"user{i}" for i in range(500, 1500)),
+                    'rust': self.sketch(f"rustacean{i}" for i in range(1000))}
+        edges = Overlap_Engine(min_weight=100).sketch_overlaps(sketches)
+        self.assertEqual([(a, b) for a, b, _ in edges], [('python', 'django')])
+        self.assertAlmostEqual(edges[0][2], 500, delta=3 * MinHash_Sketch.error_bound(256) * 2000)
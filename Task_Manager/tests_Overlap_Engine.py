@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from .Overlap_Engine import Overlap_Engine
+
+
+class Overlap_Engine_Test(TestCase):
+    memberships = {'python': {'a', 'b', 'c'},
+                   'django': {'b', 'c', 'd'},
+                   'rust': {'e'},
+                   'golang': ['a', 'a', 'e']}
+
+    def test_overlaps(self):
+        self.assertEqual(Overlap_Engine().overlaps(self.memberships),
+                         [('python', 'django', 2), ('python', 'golang', 1), ('rust', 'golang', 1)])
+
+    def test_min_weight(self):
+        self.assertEqual(Overlap_Engine(min_weight=2).overlaps(self.memberships),
+                         [('python', 'django', 2)])
+
+    def test_matches_set_intersection(self):
+        keys = list(self.memberships.keys())
+        expected = [(a, b, len(set(self.memberships[a]) & set(self.memberships[b])))
+                    for i, a in enumerate(keys) for b in keys[i + 1:]]
+        self.assertEqual(Overlap_Engine().overlaps(self.memberships),
+                         [edge for edge in expected if edge[2] > 0])
+
+    def test_single_subreddit(self):
+        self.assertEqual(Overlap_Engine().overlaps({'python': {'a'}}), [])
@@ -0,0 +1,77 @@
+import os
+import tempfile
+from functools import partialmethod
+from unittest.mock import Mock, patch
+
+from django.test import TestCase
+from praw.models import MoreComments
+from tqdm import tqdm
+
+from .Reddit_Fixture import Reddit_Fixture, Replay_Reddit
+from .Subreddit_Data_Collector import Subreddit_Data_Collector
+
+
+class Reddit_Fixture_Test(TestCase):
+    def setUp(self) -> None:
+        tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
+
+    def live_comment(self, id, author, replies=()):
+        comment = Mock(id=id, body=f"{id} " * 10, permalink=f"/{id}", edited=False, replies=list(replies))
+        comment.author = None if author is None else Mock()
+        if author is not None:
+            comment.author.name = author
+        return comment
+
+    def live_reddit(self):
+        forest = [self.live_comment("a", "user1", [self.live_comment("a1", "user2")]),
+                  Mock(spec=MoreComments),
+                  self.live_comment("b", None)]
+        mod = Mock()
+        mod.name = "mod1"
+        subreddit = Mock(id="t5_1", **{"moderator.return_value": [mod],
+                                       "top.return_value": [Mock(id="p1", num_comments=3, comments=forest)]})
+        return Mock(**{"subreddit.return_value": subreddit})
+
+    def test_record_and_replay(self):
+        fixture = Reddit_Fixture()
+        fixture.record(self.live_reddit(), "sub", "week", posts_n=10, per_post_n=100)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'reddit.json.gz')
+            fixture.save(path)
+            fixture = Reddit_Fixture.load(path)
+
+        replay = Replay_Reddit(fixture)
+        sdc = Subreddit_Data_Collector(replay)
+        self.assertEqual(sdc.get_custom_id("sub"), "t5_1")
+        self.assertEqual(sdc.get_mod_set("sub"), {"mod1"})
+        comments = sdc.get_Comment_Data("sub", "week", min_words=5, forest_width=10, per_post_n=100, comments_n=10)
+        # the deleted comment is skipped by the collector and the MoreComments were never recorded
+        self.assertEqual([c.username for c in comments], ["user1", "user2"])
+        self.assertEqual(replay.requests, 4)
+        with self.assertRaises(LookupError):
+            sdc.get_mod_set("missing")
+
+    def test_comment_limit(self):
+        fixture = Reddit_Fixture({"sub": {"id": "t5_1", "moderators": [], "top": {"week": [
+            {"id": "p1", "num_comments": 3, "comments": [
+                {"id": "a", "body": "a", "author": "user1", "permalink": "/a", "edited": False, "replies": [
+                    {"id": "a1", "body": "a1", "author": "user2", "permalink": "/a1", "edited": False, "replies": []}]},
+                {"id": "b", "body": "b", "author": "user3", "permalink": "/b", "edited": False, "replies": []}]}]}}})
+        post = next(Replay_Reddit(fixture).subreddit("sub").top(time_filter="week"))
+        post.comment_limit = 2
+        self.assertEqual([c.id for c in post.comments], ["a"])
+        self.assertEqual([c.id for c in post.comments[0].replies], ["a1"])
+
+    @patch('Task_Manager.Reddit_Fixture.time.sleep')
+    def test_synthetic_latency(self, sleep):
+        fixture = Reddit_Fixture({"sub": {"id": "t5_1", "moderators": [], "top": {}}})
+        delays = []
+        for _ in range(2):
+            sleep.reset_mock()
+            replay = Replay_Reddit(fixture, latency=0.1, jitter=0.05, seed=7)
+            replay.subreddit("sub").id
+            replay.subreddit("sub").moderator()
+            delays.append([call.args[0] for call in sleep.call_args_list])
+        # the jitter is the same on every run with the same seed
+        self.assertEqual(delays[0], delays[1])
+        self.assertTrue(all(0.1 <= delay <= 0.15 for delay in delays[0]))
@@ -0,0 +1,34 @@
+from unittest.mock import Mock, patch
+
+from django.test import TestCase
+
+from .Reddit_Session import CREDENTIALS, Reddit_Session
+
+
+class Reddit_Session_Test(TestCase):
+    def setUp(self) -> None:
+        self.secrets = {secret_id: secret_id for secret_id in CREDENTIALS.values()}
+        self.provider = Mock(get=Mock(side_effect=lambda secret_id: self.secrets[secret_id]))
+        self.session = Reddit_Session(self.provider)
+
+    @patch('Task_Manager.Reddit_Session.praw.Reddit')
+    def test_reused_until_credentials_change(self, reddit):
+        first = self.session.get()
+        self.assertIs(self.session.get(), first)
+        reddit.assert_called_once_with(client_id='praw_client_id', client_secret='praw_client_secret',
+                                       password='praw_client_password', user_agent='praw_user_agent',
+                                       username='praw_user_name')
+        self.assertFalse(first.read_only)
+
+        self.secrets['praw_client_secret'] = 'rotated'
+        self.session.get()
+        self.assertEqual(reddit.call_count, 2)
+        self.assertEqual(reddit.call_args.kwargs['client_secret'], 'rotated')
+
+    @patch('Task_Manager.Reddit_Session.praw.Reddit')
+    def test_invalidate(self, reddit):
+        self.session.get()
+        self.session.invalidate()
+        self.provider.invalidate.assert_called_once_with(*CREDENTIALS.values())
+        self.session.get()
+        self.assertEqual(reddit.call_count, 2)
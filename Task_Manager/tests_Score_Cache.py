@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+from django.test import TestCase
+
+from .Score_Cache import Score_Cache
+
+
+class Score_Cache_Test(TestCase):
+    def setUp(self) -> None:
+        self.cache = Score_Cache(':memory:', 'model-1', max_entries=3)
+
+    def tearDown(self) -> None:
+        self.cache.close()
+
+    def test_hit_and_miss(self):
+        self.cache.put_many({"comment 1": 0.1, "comment 2": 0.2})
+        self.assertEqual(self.cache.get_many(["comment 1", "comment 3", "comment 2"]), [0.1, None, 0.2])
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_keyed_by_model_version(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'score_cache.sqlite3')
+            old = Score_Cache(path, 'model-1')
+            old.put_many({"comment 1": 0.1})
+            old.close()
+
+            # the same file read with another model version must not return the old scores
+            new = Score_Cache(path, 'model-2')
+            self.assertEqual(new.get_many(["comment 1"]), [None])
+            new.close()
+            reopened = Score_Cache(path, 'model-1')
+            self.assertEqual(reopened.get_many(["comment 1"]), [0.1])
+            reopened.close()
+
+    def test_lru_eviction(self):
+        self.cache.put_many({"comment 1": 0.1, "comment 2": 0.2, "comment 3": 0.3})
+        # touch comment 1 so that comment 2 becomes the least recently used
+        self.cache.get_many(["comment 1"])
+        self.cache.put_many({"comment 4": 0.4})
+        self.assertEqual(self.cache.get_many(["comment 1", "comment 2", "comment 3", "comment 4"]),
+                         [0.1, None, 0.3, 0.4])
+
+    def test_eviction_shared_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'score_cache.sqlite3')
+            first = Score_Cache(path, 'model-1', max_entries=3)
+            second = Score_Cache(path, 'model-1', max_entries=3)
+            first.put_many({"comment 1": 0.1, "comment 2": 0.2})
+            second.put_many({"comment 3": 0.3, "comment 4": 0.4})
+            first.put_many({"comment 5": 0.5})
+            # each worker evicts against the size of the file, not the scores it has written itself
+            self.assertEqual(first.get_many([f"comment {i}" for i in range(1, 6)]), [None, None, 0.3, 0.4, 0.5])
+            first.close()
+            second.close()
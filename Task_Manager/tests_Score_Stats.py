@@ -0,0 +1,60 @@
+import numpy as np
+from django.test import TestCase
+
+from .Score_Stats import Score_Stats
+
+
+class Score_Stats_Test(TestCase):
+    def setUp(self) -> None:
+        self.scores = np.random.default_rng(7).normal(-1.0, 2.0, 20000)
+
+    def stats(self, chunks):
+        stats = Score_Stats()
+        for chunk in chunks:
+            stats.update(chunk)
+        return stats
+
+    def test_moments(self):
+        stats = self.stats(np.array_split(self.scores, 200))
+        self.assertEqual(stats.count, 20000)
+        self.assertAlmostEqual(stats.mean, self.scores.mean(), places=9)
+        self.assertAlmostEqual(stats.std, self.scores.std(), places=9)
+        self.assertEqual((stats.min, stats.max), (self.scores.min(), self.scores.max()))
+
+    def test_merge(self):
+        merged = self.stats(np.array_split(self.scores[:5000], 50))
+        merged.merge(self.stats(np.array_split(self.scores[5000:], 150)))
+        whole = self.stats([self.scores])
+        self.assertAlmostEqual(merged.mean, whole.mean, places=9)
+        self.assertAlmostEqual(merged.variance, whole.variance, places=9)
+        self.assertEqual(merged.counts.tolist(), whole.counts.tolist())
+        self.assertAlmostEqual(merged.quantile(0.5), whole.quantile(0.5), delta=0.05)
+
+    def test_percentiles(self):
+        stats = self.stats(np.array_split(self.scores, 200))
+        percentiles = stats.percentiles()
+        self.assertEqual(list(percentiles.keys()), ['1', '5', '25', '50', '75', '95', '99'])
+        for p, estimate in percentiles.items():
+            # the error is small in rank, and smallest at the tails
+            self.assertAlmostEqual(np.mean(self.scores < estimate), int(p) / 100, delta=0.002)
+        self.assertEqual((stats.quantile(0), stats.quantile(1)), (stats.min, stats.max))
+
+    def test_histogram(self):
+        stats = self.stats([np.array([-20.0, -0.25, 0.0, 0.1, 20.0])])
+        histogram = stats.histogram()
+        self.assertEqual(len(histogram['edges']), len(histogram['counts']) + 1)
+        # scores past the edges are counted in the outer bins
+        self.assertEqual(histogram['counts'][0], 1)
+        self.assertEqual(histogram['counts'][-1], 1)
+        self.assertEqual(sum(histogram['counts']), 5)
+
+    def test_empty(self):
+        stats = Score_Stats()
+        stats.update(np.empty(0))
+        self.assertEqual(stats.count, 0)
+        self.assertIsNone(stats.quantile(0.5))
+        self.assertEqual(stats.percentiles(), {})
+        other = Score_Stats(edges=[0.0, 1.0])
+        other.update(np.ones(3))
+        with self.assertRaises(ValueError):
+            stats.merge(other)
@@ -1,23 +1,17 @@
+import threading
 from functools import partialmethod
 from unittest.mock import Mock, patch
 
+import praw
 import requests
 from django.test import TestCase
 from tqdm import tqdm
-import praw
-
-from .Subreddit_Data_Collector import Subreddit_Data_Collector
-from google.cloud import secretmanager
 
+from praw.models import Comment, MoreComments
+from praw.models.helpers import SubredditHelper
 
-def fetch_secret(secret_id):
-    '''
-    This utility function returns a secret payload at runtime using the secure google secrets API 
-    '''
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/mhs-reddit/secrets/{secret_id}/versions/latest"
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode('UTF-8')
+from .Reddit_Fixture import FIXTURE, Reddit_Fixture, Replay_Reddit
+from .Subreddit_Data_Collector import Subreddit_Data_Collector
 
 
 class Inferencer_Test(TestCase):
@@ -25,23 +19,92 @@ class Inferencer_Test(TestCase):
         # Silence tqdm while doing tests. Stolen from https://stackoverflow.com/questions/37091673/silence-tqdms-output-while-running-tests-or-running-the-code-via-cron
         tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
 
-        self.praw_obj = praw.Reddit(
-            client_id=fetch_secret('praw_client_id'),
-            client_secret=fetch_secret('praw_client_secret'),
-            password=fetch_secret('praw_client_password'),
-            user_agent=fetch_secret('praw_user_agent'),
-            username=fetch_secret('praw_user_name')
-        )
+        # recorded responses, so that the tests neither need credentials nor reach the live API
+        self.praw_obj = Replay_Reddit(Reddit_Fixture.load(FIXTURE))
 
         self.sdc = Subreddit_Data_Collector(self.praw_obj)
 
-    def Test_AutoMod_Filter(self):
-        # get a subreddit that uses automod, might need to be changed if it starts to fail
+    def test_automod_filter(self):
         display_name = 'discordapp'
 
-        subMods = self.praw_obj.subreddit(display_name).moderators()
+        subMods = self.praw_obj.subreddit(display_name).moderator()
 
         self.assertEqual(len(subMods) - 1,
                          len(self.sdc.get_mod_set(display_name, False)))
         self.assertEqual(len(subMods),
                          len(self.sdc.get_mod_set(display_name, True)))
+
+    def test_replay_harvest(self):
+        comments = self.sdc.get_Comment_Data('programming', 'week', min_words=5, forest_width=10,
+                                             per_post_n=20, comments_n=50)
+        self.assertEqual(len(comments), 50)
+        self.assertTrue(all(len(c.comment_body.split()) >= 5 for c in comments))
+        self.assertEqual(len({c.reddit_id for c in comments}), 50)
+
+    def test_harvest_stops_early(self):
+        def post(i, num_comments, words):
+            comments = [self.comment("word " * words, f"/{i}/{j}") for j in range(num_comments)]
+            return Mock(num_comments=num_comments, comments=comments)
+
+        posts = [post(0, 0, 30), post(1, 10, 30), post(2, 10, 2)] + [post(i, 10, 30) for i in range(3, 100)]
+        reddit = Mock(**{"subreddit.return_value.top.return_value": iter(posts)})
+        comments = Subreddit_Data_Collector(reddit).get_Comment_Data('sub', 'week', min_words=5, forest_width=10,
+                                                                    per_post_n=10, comments_n=25)
+        self.assertEqual(len(comments), 25)
+        # the post without comments is never fetched, nor any post past the budget
+        fetched = [i for i, p in enumerate(posts) if isinstance(p.comment_limit, int)]
+        self.assertEqual(fetched, [1, 2, 3, 4])
+
+    def comment(self, body, permalink, replies=()):
+        comment = Mock(spec=Comment, id=permalink, body=body, permalink=permalink, edited=False, replies=list(replies))
+        comment.author = Mock()
+        comment.author.name = permalink
+        return comment
+
+    def test_forest_walk(self):
+        body = "word " * 10
+        forest = [self.comment(body, "a", [self.comment(body, "a1", [self.comment(body, "a1i")]),
+                                           self.comment(body, "a2"),
+                                           self.comment(body, "a3")]),
+                  Mock(spec=MoreComments),
+                  self.comment(body, "b", [self.comment(body, "b1")]),
+                  self.comment(body, "c")]
+        reddit = Mock(**{"subreddit.return_value.top.side_effect": lambda **kwargs: iter(
+            [Mock(num_comments=10, comments=forest)])})
+        sdc = Subreddit_Data_Collector(reddit)
+
+        def walk(forest_width, max_depth):
+            return [c.permalink for c in sdc.get_Comment_Data('sub', 'week', min_words=5, forest_width=forest_width,
+                                                              per_post_n=100, comments_n=100, max_depth=max_depth)]
+
+        # breadth first, skipping the unloaded MoreComments
+        self.assertEqual(walk(0, None), ["a", "b", "c", "a1", "a2", "a3", "b1", "a1i"])
+        self.assertEqual(walk(2, None), ["a", "b", "a1", "a2", "b1", "a1i"])
+        self.assertEqual(walk(0, 0), ["a", "b", "c"])
+        self.assertEqual(walk(2, 1), ["a", "b", "a1", "a2", "b1"])
+
+    def test_listing_pages_are_throttled(self):
+        posts = [Mock(num_comments=0) for _ in range(250)]
+        reddit = Mock(**{"subreddit.return_value.top.return_value": iter(posts)})
+        limiter = Mock()
+        Subreddit_Data_Collector(reddit, rate_limiter=limiter).get_Comment_Data(
+            'sub', 'week', min_words=5, forest_width=10, per_post_n=10, comments_n=25)
+        # the 250 posts without comments are read from three pages of the listing
+        self.assertEqual(limiter.acquire.call_count, 3)
+
+    def test_client_per_thread(self):
+        reddit = praw.Reddit(client_id='id', client_secret='secret', username='user', password='password',
+                             user_agent='agent')
+        sdc = Subreddit_Data_Collector(reddit)
+        with patch.object(SubredditHelper, '__call__', autospec=True) as subreddit:
+            sdc.get_custom_id('sub')
+            threads = [threading.Thread(target=sdc.get_custom_id, args=('sub',)) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            clients = [c.args[0]._reddit for c in subreddit.call_args_list]
+        # the building thread keeps its client, every other thread logs in with the same credentials
+        self.assertIs(clients[0], reddit)
+        self.assertEqual(len({id(client) for client in clients}), 3)
+        self.assertTrue(all(client.config.username == 'user' for client in clients))
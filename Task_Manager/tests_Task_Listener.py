@@ -0,0 +1,58 @@
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from django.test import TestCase
+
+from .Task_Listener import CHANNEL, Task_Listener
+
+
+class Task_Listener_Test(TestCase):
+    def setUp(self) -> None:
+        self.listener = Task_Listener(max_wait=60, poll_interval=10)
+
+    @patch('Task_Manager.Task_Listener.time.sleep')
+    def test_poll_without_postgres(self, sleep):
+        self.assertFalse(self.listener.supported)
+        self.assertFalse(self.listener.wait(3))
+        sleep.assert_called_with(3)
+        # the poll interval bounds a long or open ended wait
+        self.listener.wait(None)
+        sleep.assert_called_with(10)
+        # a time that has already passed still waits, so the idle loop never spins
+        self.listener.wait(-5)
+        sleep.assert_called_with(1.0)
+
+    def mock_connection(self, notifies):
+        conn = MagicMock(closed=False, notifies=notifies)
+        wrapper = MagicMock()
+        wrapper.get_new_connection.return_value = conn
+        return conn, {'default': wrapper}
+
+    def test_notified(self):
+        conn, connections = self.mock_connection([])
+
+        def arrive(*args):
+            conn.notifies.append(MagicMock(payload='1'))
+            return ([conn], [], [])
+
+        with patch.object(Task_Listener, 'supported', new_callable=PropertyMock, return_value=True), \
+                patch('Task_Manager.Task_Listener.connections', connections), \
+                patch('Task_Manager.Task_Listener.select.select', side_effect=arrive) as select:
+            self.assertTrue(self.listener.wait(120))
+        select.assert_called_once_with([conn], [], [], 60)
+        conn.cursor.return_value.__enter__.return_value.execute.assert_called_once_with(f"LISTEN {CHANNEL}")
+        self.assertEqual(conn.notifies, [])
+
+    def test_timeout_and_reconnect(self):
+        conn, connections = self.mock_connection([])
+        with patch.object(Task_Listener, 'supported', new_callable=PropertyMock, return_value=True), \
+                patch('Task_Manager.Task_Listener.connections', connections), \
+                patch('Task_Manager.Task_Listener.select.select', return_value=([], [], [])), \
+                patch('Task_Manager.Task_Listener.time.sleep') as sleep:
+            self.assertFalse(self.listener.wait(5))
+            # the same connection is reused until it fails
+            conn.poll.side_effect = OSError("connection lost")
+            self.assertFalse(self.listener.wait(5))
+            sleep.assert_called_once_with(5)
+            conn.poll.side_effect = None
+            self.listener.wait(5)
+        self.assertEqual(connections['default'].get_new_connection.call_count, 2)
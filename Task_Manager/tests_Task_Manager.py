@@ -1,30 +1,24 @@
 import datetime
 import json
 import random
+import tempfile
 from functools import partialmethod
 from unittest.mock import MagicMock, patch
 
-import praw
 import pytz
 from django.test import TestCase
 from tqdm import tqdm
 
-from gather.models import (Author_edge, Comment_result, Inference_task,
-                           Mod_edge, Subreddit, Subreddit_mod,
-                           Subreddit_result)
-from Task_Manager import Task_Manager
+from gather.models import (Author, Author_edge, Comment, Comment_result,
+                           Inference_task, Mod_edge, Subreddit, Subreddit_mod,
+                           Subreddit_result, Subreddit_status, Subreddit_trend)
+from Task_Manager import Subreddit_Data_Collector, Task_Manager
+from Task_Manager.Task_Pipeline import Task_Pipeline
+from Task_Manager.Task_Spool import Task_Spool
 from Task_Manager.Subreddit_Data_Collector import commentData
-from google.cloud import secretmanager
-
-
-def fetch_secret(secret_id):
-    '''
-    This utility function returns a secret payload at runtime using the secure google secrets API 
-    '''
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/mhs-reddit/secrets/{secret_id}/versions/latest"
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode('UTF-8')
+from Task_Manager.Comment_Batch import Comment_Batch
+from Task_Manager.MHS_Stub_Server import MHS_Stub_Server
+from Task_Manager.Reddit_Fixture import FIXTURE, Reddit_Fixture, Replay_Reddit
 
 
 class TestTaskManager(TestCase):
@@ -34,13 +28,8 @@ class TestTaskManager(TestCase):
         self.task_manager = Task_Manager()
         self.now = datetime.datetime.now
 
-        self.praw_obj = praw.Reddit(
-            client_id=fetch_secret('praw_client_id'),
-            client_secret=fetch_secret('praw_client_secret'),
-            password=fetch_secret('praw_client_password'),
-            user_agent=fetch_secret('praw_user_agent'),
-            username=fetch_secret('praw_user_name')
-        )
+        # recorded responses, so that the tests neither need credentials nor reach the live API
+        self.praw_obj = Replay_Reddit(Reddit_Fixture.load(FIXTURE))
 
     @patch.object(Task_Manager, '_instance', None)
     def test_singleton(self):
@@ -87,6 +76,15 @@ class TestTaskManager(TestCase):
         self.assertEqual(Mod_edge.objects.count(), 1)
         self.assertEqual(Author_edge.objects.count(), 1)
 
+    def test_push_Subreddits_upsert(self):
+        Subreddit.objects.create(custom_id='abc', display_name='oldname')
+
+        subs = self.task_manager._Task_Manager__push_Subreddits({'NewName': 'abc', 'other': 'def'})
+
+        self.assertEqual(set(subs.keys()), {'NewName', 'other'})
+        self.assertEqual(Subreddit.objects.count(), 2)
+        self.assertEqual(Subreddit.objects.get(custom_id='abc').display_name, 'NewName')
+
     def test_push_subreddit_result_with_inference(self):
         subDict = {"subreddit10": Subreddit.objects.create(custom_id='abc', display_name='test_subreddit10'),
                    "subreddit20":  Subreddit.objects.create(custom_id="def", display_name='test_subreddit20'), }
@@ -115,7 +113,8 @@ class TestTaskManager(TestCase):
 
         # Split the list into two
         allcomments = {
-            "subreddit10": comments[:10], "subreddit20": comments[10:]}
+            "subreddit10": Comment_Batch.from_comments(comments[:10]),
+            "subreddit20": Comment_Batch.from_comments(comments[10:])}
         # run the service
         self.task_manager._Task_Manager__push_Subreddit_result(
             allcomments, subDict, task)
@@ -128,19 +127,177 @@ class TestTaskManager(TestCase):
         self.assertGreater(saved_results[0].mean_result, 0)
         self.assertEqual(saved_results[1].inference_task, task)
 
-    # def test_fullRun(self) -> None:
-    #     sublist = ['programming', 'rpcs3', 'subnautica', 'formula1']
-
-    #     task_out = Inference_task.objects.create(start_sched=self.now(),
-    #                                              time_scale='week',
-    #                                              min_words=1,
-    #                                              forest_width=1,
-    #                                              per_post_n=100,
-    #                                              comments_n=10,
-    #                                              subreddit_set=sublist,
-    #                                              status='0',
-    #                                              )
-    #     tm = Task_Manager()
-
-    #     tm.do_Task(task_out, fetch_secret('mhs_api_url'),
-    #                fetch_secret('mhs_api_key'), self.praw_obj)
+    def test_partial_failure(self):
+        task = Inference_task.objects.create(start_sched=self.now(), time_scale='week', min_words=1,
+                                             per_post_n=5, comments_n=10, status=0,
+                                             subreddit_set=["good", "flaky", "banned"])
+
+        def run(pipeline, subreddits, **params):
+            pipeline.failures = {}
+            for sub in subreddits:
+                if sub == "banned":
+                    pipeline.failures[sub] = "403"
+                    continue
+                yield sub, Comment_Batch.from_comments(
+                    [commentData(f"{sub} comment", f"{sub} user", f"{sub} link", 0.5, False),
+                     commentData(f"{sub} comment 2", "shared user", f"{sub} link 2", None, False)])
+
+        mod_calls = []
+
+        def get_mod_set(sdc, sub):
+            # the first attempt at flaky fails after its subreddit row is written
+            mod_calls.append(sub)
+            if sub == "flaky" and mod_calls.count(sub) == 1:
+                raise RuntimeError("flaky")
+            return {"mod"}
+
+        with patch.object(Task_Pipeline, 'run', run), \
+                patch.object(Subreddit_Data_Collector, 'get_mod_set', get_mod_set), \
+                patch.object(Subreddit_Data_Collector, 'get_custom_id', lambda sdc, sub: sub):
+            self.task_manager.do_Task(task, "www.sample.com/", "test_apikey", MagicMock(), cache_path=None,
+                                      spool_dir=None, retry_delay=0)
+
+        statuses = {status.display_name: status for status in Subreddit_status.objects.filter(inference_task=task)}
+        self.assertEqual(statuses["good"].status, 1)
+        self.assertEqual(statuses["good"].attempts, 1)
+        self.assertEqual(statuses["good"].unscored, 1)
+        self.assertEqual(statuses["flaky"].status, 1)
+        self.assertEqual(statuses["flaky"].attempts, 2)
+        self.assertIsNone(statuses["flaky"].error)
+        self.assertEqual(statuses["banned"].status, 2)
+        self.assertEqual(statuses["banned"].attempts, 3)
+        self.assertEqual(statuses["banned"].error, "403")
+        self.assertIsNone(statuses["banned"].subreddit_result)
+        # the failed first attempt at flaky left nothing behind
+        self.assertEqual(Subreddit_result.objects.filter(inference_task=task).count(), 2)
+        self.assertEqual(Comment_result.objects.count(), 4)
+        self.assertEqual(Subreddit_mod.objects.count(), 2)
+        # the unscored comments are stored without a score, and left out of the statistics
+        self.assertEqual(Comment_result.objects.filter(mhs_score__isnull=True).count(), 2)
+        result = statuses["good"].subreddit_result
+        self.assertEqual((result.mean_result, result.std_result), (0.5, 0.0))
+        self.assertEqual(result.percentiles["50"], 0.5)
+        self.assertEqual(sum(result.histogram["counts"]), 1)
+        self.assertEqual(Author_edge.objects.get().weight, 1)
+        # the metrics of every stage are kept on the task
+        task.refresh_from_db()
+        self.assertEqual(task.metrics['subreddits']['good']['push_Comment_result']['items'], 2)
+        self.assertEqual(task.metrics['subreddits']['flaky']['mod_fetch']['runs'], 2)
+        self.assertIn('edge_discovery', task.metrics['stages'])
+
+    def test_comments_shared_across_tasks(self):
+        harvests = [[commentData("first, naïve", "user1", "/r/sub/comments/p/t/c1/", 0.1, False, "c1"),
+                     commentData("second", "user2", "/r/sub/comments/p/t/c2/", 0.2, False, "c2")],
+                    [commentData("first, naïve", "user1", "/r/sub/comments/p/t/c1/", 0.1, False, "c1"),
+                     commentData("second, edited", "user2", "/r/sub/comments/p/t/c2/", 0.3, True, "c2"),
+                     commentData("third", "user1", "/r/sub/comments/p/t/c3/", 0.4, False, "c3")]]
+
+        def run(pipeline, subreddits, **params):
+            pipeline.failures = {}
+            yield "sub", Comment_Batch.from_comments(harvests.pop(0))
+
+        with patch.object(Task_Pipeline, 'run', run), \
+                patch.object(Subreddit_Data_Collector, 'get_mod_set', lambda sdc, sub: {"user1", "mod"}), \
+                patch.object(Subreddit_Data_Collector, 'get_custom_id', lambda sdc, sub: sub), \
+                self.assertLogs(level='DEBUG') as logs:
+            for _ in range(2):
+                task = Inference_task.objects.create(start_sched=self.now(), time_scale='week', min_words=1,
+                                                     per_post_n=5, comments_n=10, status=0, subreddit_set=["sub"])
+                self.task_manager.do_Task(task, "www.sample.com/", "test_apikey", MagicMock(), cache_path=None,
+                                          spool_dir=None)
+
+        # the stored bodies are compared by digest, so only the edited comment is rewritten
+        self.assertIn("Comments: 1 new, 1 changed, 1 unchanged", "\n".join(logs.output))
+        # each task references the comments it harvested, which are stored once
+        self.assertEqual(Comment_result.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertEqual(Subreddit_mod.objects.count(), 4)
+        edited = Comment.objects.get(reddit_id="c2")
+        self.assertEqual(edited.body, "second, edited")
+        self.assertTrue(edited.edited)
+        self.assertAlmostEqual(Comment_result.objects.get(inference_task=task, comment=edited).mhs_score, 0.3, places=6)
+        # both tasks were added to the subreddit's trend as they were committed
+        self.assertEqual(Subreddit_trend.objects.get(period='day').results, 2)
+        self.assertEqual(Subreddit_trend.objects.get(period='day').scored, 5)
+
+    def test_every_subreddit_failed(self):
+        task = Inference_task.objects.create(start_sched=self.now(), time_scale='week', min_words=1,
+                                             per_post_n=5, comments_n=10, status=0, subreddit_set=["banned"])
+
+        def run(pipeline, subreddits, **params):
+            pipeline.failures = {sub: "403" for sub in subreddits}
+            yield from ()
+
+        with patch.object(Task_Pipeline, 'run', run):
+            with self.assertRaises(RuntimeError):
+                self.task_manager.do_Task(task, "www.sample.com/", "test_apikey", MagicMock(), cache_path=None,
+                                          spool_dir=None, subreddit_retries=0)
+        # the outcome is still recorded for the failed task
+        self.assertEqual(Subreddit_status.objects.get(inference_task=task).status, 2)
+
+    def test_failed_task_clears_spool(self):
+        task = Inference_task.objects.create(start_sched=self.now(), time_scale='week', min_words=1,
+                                             per_post_n=5, comments_n=10, status=0, subreddit_set=["sub"])
+
+        def run(pipeline, subreddits, **params):
+            pipeline.failures = {}
+            yield "sub", Comment_Batch.from_comments([commentData("comment", "user", "link", 0.5, False)])
+
+        def get_mod_set(sdc, sub):
+            raise RuntimeError("403")
+
+        with tempfile.TemporaryDirectory() as spool_dir, patch.object(Task_Pipeline, 'run', run), \
+                patch.object(Subreddit_Data_Collector, 'get_mod_set', get_mod_set):
+            with self.assertRaises(RuntimeError):
+                self.task_manager.do_Task(task, "www.sample.com/", "test_apikey", MagicMock(), cache_path=None,
+                                          spool_dir=spool_dir, subreddit_retries=0)
+            # the checkpoint of the failed task would never be resumed from
+            self.assertEqual(Task_Spool(spool_dir, task.id).stages(), {})
+        # the metrics of the failed task are kept too
+        task.refresh_from_db()
+        self.assertEqual(task.metrics['subreddits']['sub']['mod_fetch']['runs'], 1)
+
+    def test_lost_lease(self):
+        task = Inference_task.objects.create(start_sched=self.now(), time_scale='week', min_words=1,
+                                             per_post_n=5, comments_n=10, status=0, subreddit_set=["sub"])
+
+        def run(pipeline, subreddits, **params):
+            # another worker takes the task over while this one is collecting it
+            Inference_task.objects.filter(pk=task.pk).update(status=1, worker="other")
+            pipeline.failures = {}
+            yield "sub", Comment_Batch.from_comments([commentData("comment", "user", "link", 0.5, False)])
+
+        with patch.object(Task_Pipeline, 'run', run), \
+                patch.object(Subreddit_Data_Collector, 'get_mod_set', lambda sdc, sub: {"mod"}), \
+                patch.object(Subreddit_Data_Collector, 'get_custom_id', lambda sdc, sub: sub):
+            with self.assertRaises(RuntimeError):
+                self.task_manager.do_Task(task, "www.sample.com/", "test_apikey", MagicMock(), cache_path=None,
+                                          spool_dir=None, worker="this")
+        # nothing is published by the worker that lost the lease
+        self.assertFalse(Subreddit_result.objects.exists())
+        self.assertFalse(Subreddit_status.objects.exists())
+
+    def test_fullRun(self) -> None:
+        sublist = ['programming', 'discordapp', 'formula1']
+
+        task_out = Inference_task.objects.create(start_sched=self.now(),
+                                                 time_scale='week',
+                                                 min_words=1,
+                                                 forest_width=1,
+                                                 per_post_n=100,
+                                                 comments_n=10,
+                                                 subreddit_set=sublist,
+                                                 status='0',
+                                                 )
+        tm = Task_Manager()
+
+        with MHS_Stub_Server() as server:
+            tm.do_Task(task_out, server.url, "test_apikey", self.praw_obj, cache_path=None, spool_dir=None,
+                       calls_per_minute=6000)
+
+        statuses = Subreddit_status.objects.filter(inference_task=task_out)
+        self.assertEqual({status.display_name: status.status for status in statuses}, {sub: 0 for sub in sublist})
+        self.assertEqual(Comment_result.objects.filter(inference_task=task_out).count(), 30)
+        self.assertEqual(Subreddit_mod.objects.count(), 9)
+        self.assertEqual(Mod_edge.objects.count(), 0)
@@ -0,0 +1,89 @@
+from functools import partialmethod
+from unittest.mock import Mock, patch
+
+import requests
+from django.test import TestCase
+from tqdm import tqdm
+
+from gather.models import Subreddit
+
+from . import commentData
+from .inferencer import Inferencer
+from .Task_Metrics import Task_Metrics
+
+
+class Task_Metrics_Test(TestCase):
+    def setUp(self) -> None:
+        tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
+        self.metrics = Task_Metrics()
+
+    def test_stage(self):
+        for i in range(2):
+            with self.metrics.stage('push', 'python') as stage:
+                Subreddit.objects.create(custom_id=f"id{i}", display_name=f"sub{i}")
+                self.assertEqual(Subreddit.objects.count(), i + 1)
+                stage.items = 10
+        with self.metrics.stage('push', 'django') as stage:
+            stage.items = 5
+
+        summary = self.metrics.summary()
+        python = summary['subreddits']['python']['push']
+        self.assertEqual((python['runs'], python['items'], python['db_round_trips']), (2, 20, 4))
+        self.assertGreater(python['wall_time'], 0)
+        self.assertEqual(summary['stages']['push']['runs'], 3)
+        self.assertEqual(summary['stages']['push']['items'], 25)
+
+    @patch('Task_Manager.Task_Metrics.current_rss_mb', side_effect=[100.0, 150.0, 150.0, 160.0])
+    def test_rss_delta(self, current_rss_mb):
+        for i in range(2):
+            with self.metrics.stage('collection', 'python'):
+                pass
+        summary = self.metrics.summary()
+        # the largest growth of any run, and the peak only for the whole task
+        self.assertEqual(summary['stages']['collection']['rss_delta_mb'], 50.0)
+        self.assertNotIn('peak_rss_mb', summary['stages']['collection'])
+        self.assertIn('peak_rss_mb', summary)
+
+    def test_nested_add(self):
+        with self.metrics.stage('outer'):
+            self.metrics.add(api_calls=1)
+            with self.metrics.stage('inner'):
+                self.metrics.add(api_calls=2, retries=1)
+        # outside of any stage nothing is counted
+        self.metrics.add(api_calls=5)
+
+        stages = self.metrics.summary()['stages']
+        self.assertEqual((stages['inner']['api_calls'], stages['inner']['retries']), (2, 1))
+        self.assertEqual((stages['outer']['api_calls'], stages['outer']['retries']), (3, 1))
+        self.assertIsNone(stages['inner']['items_per_sec'])
+
+    def test_inferencer_threads(self):
+        # the concurrent requests and their retries count towards the stage that sent them
+        inferencer = Inferencer("test_apikey", "www.sample.com/", max_in_flight=2, backoff=0.0,
+                                metrics=self.metrics)
+        failed = []
+
+        def post(url, json, headers):
+            if json["instances"] == ["comment 2"] and len(failed) == 0:
+                failed.append(True)
+                return Mock(status_code=503, ok=False, headers={})
+            return Mock(status_code=200, json=Mock(return_value={"predictions": [[0.1]]}))
+
+        comments = [commentData(f"comment {i}", f"username{i}", f"permalink{i}", None, False) for i in range(1, 4)]
+        with patch.object(requests.Session, 'post', side_effect=post), patch('time.sleep'):
+            with self.metrics.stage('inference', 'python') as stage:
+                stage.items = len(comments)
+                inferencer.infer(comments, 1)
+
+        inference = self.metrics.summary()['subreddits']['python']['inference']
+        self.assertEqual((inference['api_calls'], inference['retries']), (4, 1))
+
+    def test_log(self):
+        with self.metrics.stage('collection', 'python') as stage:
+            stage.items = 3
+        with self.assertLogs(level='INFO') as logs:
+            summary = self.metrics.log(Mock(id=7))
+        self.assertEqual(summary['subreddits']['python']['collection']['items'], 3)
+        self.assertEqual(logs.records[0].json_fields['subreddit'], 'python')
+        self.assertEqual(logs.records[-1].json_fields['task'], 7)
+        self.assertIn('collection', logs.records[-1].json_fields['stages'])
@@ -0,0 +1,69 @@
+from functools import partialmethod
+from unittest.mock import Mock
+
+from django.test import TestCase
+from tqdm import tqdm
+
+from . import commentData
+from .Collection_Pool import Collection_Pool
+from .MinHash_Sketch import MinHash_Sketch
+from .Task_Pipeline import Task_Pipeline
+
+
+class Task_Pipeline_Test(TestCase):
+    def setUp(self) -> None:
+        tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
+
+        def iter_Comment_Data(display_name, **params):
+            if display_name == 'banned_sub':
+                raise Exception('404 Not Found')
+            return iter([commentData(f"{display_name} comment {i}", f"user{i}", f"link{i}", None, False)
+                         for i in range(5)])
+
+        def infer_batch(batch, chunk_size):
+            batch.mhs_score[:] = 0.5
+            return batch
+
+        self.collector = Mock(iter_Comment_Data=Mock(side_effect=iter_Comment_Data))
+        self.inferencer = Mock(infer_batch=Mock(side_effect=infer_batch), max_in_flight=2)
+
+    def test_run(self):
+        pipeline = Task_Pipeline(Collection_Pool(self.collector, 2), self.inferencer, chunk_size=2, queue_size=1)
+        results = dict(pipeline.run(['python', 'banned_sub', 'django'], scope='week'))
+
+        self.assertEqual(set(results.keys()), {'python', 'django'})
+        self.assertEqual(results['python'].comment_body,
+                         [f"python comment {i}" for i in range(5)])
+        self.assertTrue(all(score == 0.5 for score in results['django'].mhs_score))
+        self.assertEqual(list(pipeline.failures.keys()), ['banned_sub'])
+        # the statistics were gathered from the chunks as they were scored
+        self.assertEqual(set(pipeline.stats.keys()), {'python', 'django'})
+        self.assertEqual((pipeline.stats['python'].count, pipeline.stats['python'].mean), (5, 0.5))
+        # 5 comments in chunks of 2 is 3 requests per subreddit
+        self.assertEqual(self.inferencer.infer_batch.call_count, 6)
+
+    def test_sketch_authors(self):
+        pipeline = Task_Pipeline(Collection_Pool(self.collector, 2), self.inferencer, chunk_size=2,
+                                 sketch_authors=True)
+        dict(pipeline.run(['python', 'banned_sub'], scope='week'))
+
+        # sketched chunk by chunk, without the subreddit's author set
+        whole = MinHash_Sketch()
+        whole.update(f"user{i}" for i in range(5))
+        self.assertEqual(list(pipeline.sketches.keys()), ['python'])
+        self.assertEqual(pipeline.sketches['python'].signature.tolist(), whole.signature.tolist())
+
+    def test_inference_failure(self):
+        self.inferencer.infer_batch.side_effect = Exception('503 Service Unavailable')
+        pipeline = Task_Pipeline(Collection_Pool(self.collector, 2), self.inferencer, chunk_size=2)
+        results = dict(pipeline.run(['python'], scope='week'))
+
+        self.assertEqual(results, {})
+        self.assertIn('503 Service Unavailable', pipeline.failures['python'])
+
+    def test_stop_early(self):
+        pipeline = Task_Pipeline(Collection_Pool(self.collector, 1), self.inferencer, chunk_size=1, queue_size=1)
+        run = pipeline.run(['python', 'django'], scope='week')
+        next(run)
+        # closing the generator must not leave the stages blocked on full queues
+        run.close()
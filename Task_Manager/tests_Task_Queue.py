@@ -0,0 +1,87 @@
+import datetime
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from gather.models import Inference_task
+
+from .Task_Queue import Task_Queue
+
+
+class Task_Queue_Test(TestCase):
+    def setUp(self) -> None:
+        self.now = timezone.now()
+        self.worker1 = Task_Queue('worker1', lease=60)
+        self.worker2 = Task_Queue('worker2', lease=60)
+
+    def create_task(self, start_sched, status=0, **fields):
+        return Inference_task.objects.create(start_sched=start_sched, time_scale='day', subreddit_set=['sub1'],
+                                             status=status, **fields)
+
+    def test_claim_earliest_due(self):
+        later = self.create_task(self.now - datetime.timedelta(minutes=1))
+        earliest = self.create_task(self.now - datetime.timedelta(minutes=5))
+        self.create_task(self.now + datetime.timedelta(minutes=5))
+
+        task = self.worker1.claim(self.now)
+        self.assertEqual(task.pk, earliest.pk)
+        earliest.refresh_from_db()
+        self.assertEqual(earliest.status, 1)
+        self.assertEqual(earliest.worker, 'worker1')
+        self.assertEqual(earliest.lease_expires, self.now + datetime.timedelta(seconds=60))
+
+        # a claimed task is not handed to another worker, and future tasks are not due
+        self.assertEqual(self.worker2.claim(self.now).pk, later.pk)
+        self.assertIsNone(self.worker2.claim(self.now))
+
+    def test_reclaim_expired_lease(self):
+        self.create_task(self.now)
+        task = self.worker1.claim(self.now)
+        self.assertIsNone(self.worker2.claim(self.now + datetime.timedelta(seconds=30)))
+
+        reclaimed = self.worker2.claim(self.now + datetime.timedelta(seconds=61))
+        self.assertEqual(reclaimed.pk, task.pk)
+        self.assertEqual(reclaimed.worker, 'worker2')
+        # the worker that lost the lease can neither renew it nor overwrite the status
+        self.assertFalse(self.worker1.heartbeat(task))
+        self.assertFalse(self.worker1.release(task, 3))
+        self.assertTrue(self.worker2.release(reclaimed, 2))
+        reclaimed.refresh_from_db()
+        self.assertEqual((reclaimed.status, reclaimed.worker, reclaimed.lease_expires), (2, None, None))
+
+    def test_heartbeat(self):
+        self.create_task(self.now - datetime.timedelta(minutes=5))
+        task = self.worker1.claim(self.now - datetime.timedelta(minutes=5))
+        self.assertTrue(self.worker1.heartbeat(task))
+        task.refresh_from_db()
+        self.assertGreater(task.lease_expires, self.now)
+        self.assertIsNone(self.worker2.claim(self.now))
+
+    def test_next_due(self):
+        self.assertIsNone(self.worker1.next_due())
+        self.create_task(self.now + datetime.timedelta(minutes=10))
+        self.create_task(self.now + datetime.timedelta(minutes=20))
+        self.create_task(self.now - datetime.timedelta(minutes=20), status=2)
+        self.assertEqual(self.worker1.next_due(), self.now + datetime.timedelta(minutes=10))
+        # a running task becomes claimable when its lease lapses
+        self.create_task(self.now)
+        self.worker1.claim(self.now)
+        self.assertEqual(self.worker1.next_due(), self.now + datetime.timedelta(seconds=60))
+
+    def test_next_due_skips_due_tasks(self):
+        # due, but skipped by claim while another worker holds its row, and a lapsed lease
+        self.create_task(self.now - datetime.timedelta(minutes=5))
+        self.create_task(self.now - datetime.timedelta(minutes=10), status=1,
+                         lease_expires=self.now - datetime.timedelta(minutes=1))
+        self.assertIsNone(self.worker1.next_due(self.now))
+        self.create_task(self.now + datetime.timedelta(minutes=10))
+        self.assertEqual(self.worker1.next_due(self.now), self.now + datetime.timedelta(minutes=10))
+
+    def test_keep_alive(self):
+        task = self.create_task(self.now)
+        with patch.object(Task_Queue, 'heartbeat', return_value=False) as heartbeat, \
+                patch('Task_Manager.Task_Queue.connection'):
+            with self.worker1.keep_alive(task, interval=0.01) as lost:
+                self.assertTrue(lost.wait(5))
+        heartbeat.assert_called_with(task)
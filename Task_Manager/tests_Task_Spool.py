@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+import numpy as np
+from django.test import TestCase
+
+from .Comment_Batch import Comment_Batch
+from .Task_Spool import COLLECTED, INFERRED, Task_Spool
+
+
+class Task_Spool_Test(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.spool = Task_Spool(self.directory.name, 1)
+        self.batch = Comment_Batch(comment_body=["comment 1", "comment 2"],
+                                   username=["username1", "username2"],
+                                   permalink=["permalink1", "permalink2"],
+                                   mhs_score=np.array([0.5, np.nan], dtype=np.float32))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        self.spool.save("a/b", self.batch, COLLECTED)
+        stage, batch = self.spool.load("a/b")
+        self.assertEqual(stage, COLLECTED)
+        self.assertEqual(batch.comment_body, self.batch.comment_body)
+        self.assertEqual(batch.username, self.batch.username)
+        self.assertEqual(batch.mhs_score[0], 0.5)
+        self.assertTrue(np.isnan(batch.mhs_score[1]))
+
+    def test_stages(self):
+        self.assertEqual(self.spool.stages(), {})
+        self.spool.save("sub1", self.batch, COLLECTED)
+        self.spool.save("sub2", self.batch, INFERRED)
+        self.spool.save("sub1", self.batch, INFERRED)
+        # listed from the file names alone, with one checkpoint per subreddit
+        with patch('Task_Manager.Task_Spool.pickle.load') as load:
+            self.assertEqual(self.spool.stages(), {"sub1": INFERRED, "sub2": INFERRED})
+        load.assert_not_called()
+        self.assertEqual(len(os.listdir(os.path.join(self.directory.name, "1"))), 2)
+        # spools of other tasks are separate
+        self.assertEqual(Task_Spool(self.directory.name, 2).stages(), {})
+
+    def test_clear(self):
+        self.spool.save("sub1", self.batch, INFERRED)
+        self.spool.clear()
+        self.assertEqual(self.spool.stages(), {})
+
+    def test_expire(self):
+        self.spool.save("sub1", self.batch, INFERRED)
+        Task_Spool(self.directory.name, 2).save("sub1", self.batch, COLLECTED)
+        old = time.time() - 3600
+        os.utime(os.path.join(self.directory.name, "1"), (old, old))
+
+        self.assertEqual(Task_Spool.expire(self.directory.name, 600), [1])
+        self.assertEqual(self.spool.stages(), {})
+        self.assertEqual(Task_Spool(self.directory.name, 2).stages(), {"sub1": COLLECTED})
@@ -0,0 +1,101 @@
+import datetime
+
+import numpy as np
+from django.test import TestCase
+from django.utils import timezone
+
+from gather.models import (Author, Comment, Comment_result, Inference_task, Subreddit, Subreddit_result,
+                           Subreddit_status, Subreddit_trend)
+
+from .Score_Stats import Score_Stats
+from .Trend_Rollup import Trend_Rollup
+
+
+class Trend_Rollup_Test(TestCase):
+    def setUp(self) -> None:
+        self.subreddit = Subreddit.objects.create(custom_id='abc', display_name='test_subreddit')
+        self.scores = [np.array([0.5, 1.5, -2.0]), np.array([3.0, 1.0]), np.array([-1.0, 0.0, 2.0, 4.0])]
+        # wednesday the 1st and friday the 3rd of march, and monday the 6th
+        self.days = [datetime.datetime(2023, 3, day, 12) for day in (1, 3, 6)]
+
+    def result(self, scores, day):
+        task = Inference_task.objects.create(start_sched=timezone.now(), time_scale='week',
+                                             subreddit_set=['test_subreddit'], status=2)
+        stats = Score_Stats()
+        stats.update(scores)
+        result = Subreddit_result.objects.create(subreddit=self.subreddit, inference_task=task,
+                                                 min_result=stats.min, max_result=stats.max,
+                                                 mean_result=stats.mean, std_result=stats.std,
+                                                 histogram=stats.histogram(), edges=[])
+        # the timestamp is set when the result is created
+        result.timestamp = timezone.make_aware(day)
+        result.save(update_fields=['timestamp'])
+        return result
+
+    def test_bucket(self):
+        rollup = Trend_Rollup()
+        timestamp = timezone.make_aware(datetime.datetime(2023, 3, 3, 23, 30))
+        self.assertEqual(rollup.bucket(timestamp, 'day'), timezone.make_aware(datetime.datetime(2023, 3, 3)))
+        self.assertEqual(rollup.bucket(timestamp, 'week'), timezone.make_aware(datetime.datetime(2023, 2, 27)))
+        self.assertEqual(rollup.bucket(timestamp, 'month'), timezone.make_aware(datetime.datetime(2023, 3, 1)))
+
+    def test_add(self):
+        rollup = Trend_Rollup()
+        for scores, day in zip(self.scores, self.days):
+            rollup.add([self.result(scores, day)], 'week')
+
+        weeks = Subreddit_trend.objects.filter(subreddit=self.subreddit, period='week').order_by('start')
+        self.assertEqual([(week.results, week.scored) for week in weeks], [(2, 5), (1, 4)])
+        first = np.concatenate(self.scores[:2])
+        self.assertAlmostEqual(weeks[0].mean_result, first.mean())
+        self.assertAlmostEqual(weeks[0].std_result, first.std())
+        self.assertEqual((weeks[0].min_result, weeks[0].max_result), (-2.0, 3.0))
+        self.assertEqual(sum(weeks[0].histogram['counts']), 5)
+
+        month = Subreddit_trend.objects.get(subreddit=self.subreddit, period='month')
+        self.assertEqual(month.scored, 9)
+        self.assertAlmostEqual(month.std_result, np.concatenate(self.scores).std())
+        self.assertEqual(Subreddit_trend.objects.filter(period='day').count(), 3)
+
+    def legacy_result(self, scores, day):
+        # stored before the histogram, with the unscored comments as 0.0
+        result = self.result(np.array([score for score in scores if score != 0.0]), day)
+        result.histogram = None
+        result.save(update_fields=['histogram'])
+        for i, score in enumerate(scores):
+            comment = Comment.objects.create(reddit_id=f"{result.pk}_{i}", author=self.author,
+                                             permalink=f"/{result.pk}/{i}", body="body")
+            Comment_result.objects.create(subreddit_result=result, subreddit=self.subreddit, comment=comment,
+                                          mhs_score=score)
+        return result
+
+    def test_legacy_unscored(self):
+        self.author = Author.objects.create(name="user")
+        without_status = self.legacy_result([0.5, 1.5, 0.0], self.days[0])
+        with_status = self.legacy_result([3.0, 0.0, 0.0], self.days[1])
+        # one of the 0.0 scores of this result is a real score, as its status tells
+        Subreddit_status.objects.create(inference_task=with_status.inference_task, display_name='test_subreddit',
+                                        subreddit_result=with_status, status=1, unscored=1)
+        Trend_Rollup().add([without_status, with_status], 'week')
+
+        days = Subreddit_trend.objects.filter(subreddit=self.subreddit, period='day').order_by('start')
+        self.assertEqual([day.scored for day in days], [2, 2])
+
+    def test_rebuild(self):
+        rollup = Trend_Rollup()
+        results = [self.result(scores, day) for scores, day in zip(self.scores, self.days)]
+        rollup.add(results, 'week')
+        before = list(Subreddit_trend.objects.order_by('period', 'start').values_list(
+            'period', 'start', 'results', 'scored', 'mean_result'))
+
+        results[0].delete()
+        self.assertEqual(rollup.rebuild(['test_subreddit']), 2)
+        self.assertEqual(Subreddit_trend.objects.get(period='month').results, 2)
+
+        self.result(self.scores[0], self.days[0])
+        rollup.rebuild()
+        after = list(Subreddit_trend.objects.order_by('period', 'start').values_list(
+            'period', 'start', 'results', 'scored', 'mean_result'))
+        self.assertEqual([row[:4] for row in after], [row[:4] for row in before])
+        for a, b in zip(after, before):
+            self.assertAlmostEqual(a[4], b[4])
@@ -1,33 +1,23 @@
 import json
+import time
 from functools import partialmethod
 from unittest.mock import Mock, patch
 
+import numpy as np
 import requests
 from django.test import TestCase
 from tqdm import tqdm
 
-from . import commentData
-from .inferencer import Inferencer
-from google.cloud import secretmanager
-
-
-def fetch_secret(secret_id):
-    '''
-    This utility function returns a secret payload at runtime using the secure google secrets API 
-    '''
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/mhs-reddit/secrets/{secret_id}/versions/latest"
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode('UTF-8')
+from . import Comment_Batch, commentData
+from .inferencer import MAX_BACKOFF, Batch_Budget, Circuit_Breaker, Inferencer
+from .MHS_Stub_Server import MHS_Stub_Server
+from .Score_Cache import Score_Cache
 
 
 class Inferencer_Test(TestCase):
     def setUp(self) -> None:
         # Silence tqdm while doing tests. Stolen from https://stackoverflow.com/questions/37091673/silence-tqdms-output-while-running-tests-or-running-the-code-via-cron
         tqdm.__init__ = partialmethod(tqdm.__init__, disable=True)
-        real_apikey = fetch_secret('mhs_api_key')
-        real_url = fetch_secret('mhs_api_url')
-        self.realInferencer = Inferencer(real_apikey, real_url)
         self.inferencer = Inferencer("test_apikey", "www.sample.com/")
 
     comments = [
@@ -48,8 +38,36 @@ class Inferencer_Test(TestCase):
         self.assertEqual(len(chunks[0]), 2)
         self.assertEqual(len(chunks[1]), 1)
 
+    def test_chunker_budget(self):
+        inferencer = Inferencer("test_apikey", "www.sample.com/", budget=Batch_Budget(max_chars=10, min_chars=1))
+        chunks = inferencer._Inferencer__chunker(["aaaa", "bbbb", "cccc", "d" * 20, "e"], 100)
+        self.assertEqual(chunks, [["aaaa", "bbbb"], ["cccc"], ["d" * 20], ["e"]])
+
+    def test_budget_adapts(self):
+        budget = Batch_Budget(max_chars=10000, target_latency=1.0, smoothing=0.5)
+        budget.observe(10000, 2.0)
+        self.assertEqual(budget.max_chars, 7500)
+        # batches under half of the budget say little about the throughput
+        budget.observe(100, 10.0)
+        self.assertEqual(budget.max_chars, 7500)
+        budget.shrink()
+        self.assertEqual(budget.max_chars, 3750)
+
+    def test_request_inference_too_large(self):
+        def post(url, json, headers):
+            if len(json["instances"]) > 1:
+                return Mock(status_code=413)
+            return Mock(status_code=200, json=Mock(return_value={"predictions": [[0.1]]}))
+
+        budget = Batch_Budget(max_chars=10000)
+        inferencer = Inferencer("test_apikey", "www.sample.com/", budget=budget)
+        with patch.object(requests.Session, 'post', side_effect=post):
+            response = inferencer._Inferencer__request_inference(["comment 1", "comment 2", "comment 3"])
+        self.assertEqual(response, {'predictions': [[0.1], [0.1], [0.1]]})
+        self.assertLess(budget.max_chars, 10000)
+
     def test_request_inference(self):
-        with patch.object(requests,
+        with patch.object(requests.Session,
                           'post',
                           return_value=Mock(json=Mock(return_value={"predictions": [[0.1], [0.2], [0.3]]}))):
 
@@ -62,7 +80,7 @@ class Inferencer_Test(TestCase):
         self.assertEqual(response, [0.1, 0.2, 0.3])
 
     def test_infer(self):
-        with patch.object(requests,
+        with patch.object(requests.Session,
                           'post',
                           return_value=Mock(json=Mock(return_value={"predictions": [[0.1], [0.2], [0.3], [0.4]]}))):
 
@@ -79,9 +97,122 @@ class Inferencer_Test(TestCase):
             ]
             self.assertEqual(result, correctResult)
 
-    # This is the only test that directly connects to mhs, everthing else is local,
-    # comment it out if you don't need it
-    # def test_Connection(self):
-    #     res = self.realInferencer._Inferencer__request_inference(
-    #         ["I support human rights because its the correct thing to do"])['predictions'][0][0]
-    #     self.assertAlmostEqual(-0.484849691, res)
+    def test_infer_concurrent_order(self):
+        def post(url, json, headers):
+            # answer the longer chunks first to shuffle the completion order
+            time.sleep(0.01 * (5 - len(json["instances"])))
+            return Mock(json=Mock(return_value={"predictions": [[len(x) / 100] for x in json["instances"]]}))
+
+        comments = [commentData("x" * i, f"username{i}", f"permalink{i}", None, False)
+                    for i in range(1, 10)]
+        inferencer = Inferencer("test_apikey", "www.sample.com/", max_in_flight=4)
+        with patch.object(requests.Session, 'post', side_effect=post) as mock_post:
+            result = inferencer.infer(comments, 2)
+        self.assertEqual(mock_post.call_count, 5)
+        self.assertEqual([c.mhs_score for c in result], [i / 100 for i in range(1, 10)])
+
+    def test_infer_cached(self):
+        cache = Score_Cache(':memory:', 'model-1')
+        cache.put_many({"bumblebees are a type of insect": 0.5})
+        inferencer = Inferencer("test_apikey", "www.sample.com/", cache=cache)
+        comments = [commentData(c.comment_body, c.username, c.permalink, None, c.edited) for c in self.comments]
+        with patch.object(requests.Session,
+                          'post',
+                          return_value=Mock(json=Mock(return_value={"predictions": [[0.2], [0.3], [0.4]]}))) as mock_post:
+            result = inferencer.infer(comments, 4)
+        # only the misses are sent
+        self.assertEqual(mock_post.call_args.kwargs['json']['instances'], [c.comment_body for c in comments[1:]])
+        self.assertEqual([c.mhs_score for c in result], [0.5, 0.2, 0.3, 0.4])
+        self.assertEqual(cache.get_many([comments[3].comment_body]), [0.4])
+        cache.close()
+
+    def test_request_inference_retry(self):
+        responses = [Mock(status_code=503, ok=False, headers={'Retry-After': '7'}),
+                     requests.exceptions.ConnectionError("connection reset"),
+                     Mock(status_code=200, json=Mock(return_value={"predictions": [[0.1]]}))]
+        breaker = Mock()
+        inferencer = Inferencer("test_apikey", "www.sample.com/", breaker=breaker)
+        with patch.object(requests.Session, 'post', side_effect=responses), \
+                patch('time.sleep') as sleep:
+            response = inferencer._Inferencer__request_inference(["comment 1"])
+        self.assertEqual(response, {'predictions': [[0.1]]})
+        # the first wait is the one asked for by the server, and it pauses the other threads too
+        self.assertEqual(sleep.call_args_list[0].args[0], 7.0)
+        breaker.record_failure.assert_any_call(7.0)
+        breaker.record_success.assert_called_once()
+
+    def test_retry_after_capped(self):
+        responses = [Mock(status_code=429, ok=False, headers={'Retry-After': '86400'}),
+                     Mock(status_code=200, json=Mock(return_value={"predictions": [[0.1]]}))]
+        with patch.object(requests.Session, 'post', side_effect=responses), \
+                patch('time.sleep') as sleep:
+            self.inferencer._Inferencer__request_inference(["comment 1"])
+        self.assertEqual(sleep.call_args_list[0].args[0], MAX_BACKOFF)
+
+        clock = [0.0]
+        with patch('time.monotonic', side_effect=lambda: clock[0]), \
+                patch('time.sleep', side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds)):
+            breaker = Circuit_Breaker()
+            breaker.record_failure(retry_after=86400)
+            breaker.wait()
+        self.assertEqual(clock[0], MAX_BACKOFF)
+
+    def test_infer_failed_chunk_alignment(self):
+        def post(url, json, headers):
+            if json["instances"] == ["comment 2"]:
+                return Mock(status_code=400, ok=False)
+            return Mock(status_code=200, json=Mock(return_value={"predictions": [[0.1] for _ in json["instances"]]}))
+
+        comments = [commentData(f"comment {i}", f"username{i}", f"permalink{i}", None, False) for i in range(1, 4)]
+        with patch.object(requests.Session, 'post', side_effect=post):
+            result = self.inferencer.infer(comments, 1)
+        self.assertEqual([c.mhs_score for c in result], [0.1, None, 0.1])
+
+    def test_circuit_breaker(self):
+        clock = [0.0]
+        with patch('time.monotonic', side_effect=lambda: clock[0]), \
+                patch('time.sleep', side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds)) as sleep:
+            breaker = Circuit_Breaker(failure_threshold=2, cooldown=30.0)
+            breaker.record_failure()
+            breaker.wait()
+            sleep.assert_not_called()
+            breaker.record_failure()
+            breaker.wait()
+            self.assertEqual(clock[0], 30.0)
+            breaker.record_success()
+            breaker.record_failure()
+            breaker.wait()
+            self.assertEqual(clock[0], 30.0)
+
+    def test_infer_batch(self):
+        def post(url, json, headers):
+            if json["instances"] == ["comment 2"]:
+                return Mock(status_code=400, ok=False)
+            return Mock(status_code=200, json=Mock(return_value={"predictions": [[0.25] for _ in json["instances"]]}))
+
+        batch = Comment_Batch.from_comments(
+            [commentData(f"comment {i}", f"username{i}", f"permalink{i}", None, False) for i in range(1, 4)])
+        with patch.object(requests.Session, 'post', side_effect=post):
+            result = self.inferencer.infer_batch(batch, 1)
+        self.assertIs(result, batch)
+        self.assertEqual(result.mhs_score[0], 0.25)
+        self.assertTrue(np.isnan(result.mhs_score[1]))
+
+    def test_infer_batch_only_missing(self):
+        batch = Comment_Batch.from_comments(
+            [commentData(f"comment {i}", f"username{i}", f"permalink{i}", None, False) for i in range(1, 4)])
+        batch.mhs_score[0] = 0.5
+        response = Mock(status_code=200, json=Mock(return_value={"predictions": [[0.25], [0.25]]}))
+        with patch.object(requests.Session, 'post', return_value=response) as post:
+            self.inferencer.infer_batch(batch, 10)
+        self.assertEqual(post.call_args.kwargs["json"]["instances"], ["comment 2", "comment 3"])
+        self.assertEqual(batch.mhs_score.tolist(), [0.5, 0.25, 0.25])
+
+    # connects to the local stub of mhs, so that the tests need neither secrets nor the live api
+    def test_Connection(self):
+        text = "I support human rights because its the correct thing to do"
+        with MHS_Stub_Server(api_key="test_apikey") as server:
+            inf = Inferencer("test_apikey", server.url)
+            res = inf._Inferencer__request_inference([text])['predictions'][0][0]
+            inf.close()
+        self.assertAlmostEqual(server.score(text), res)
@@ -0,0 +1,70 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from Task_Manager.Collection_Pool import Collection_Pool, Rate_Limiter
+from Task_Manager.inferencer import Batch_Budget, Inferencer
+from Task_Manager.MHS_Stub_Server import MHS_Stub_Server
+from Task_Manager.Reddit_Fixture import FIXTURE, Reddit_Fixture, Replay_Reddit
+from Task_Manager.Subreddit_Data_Collector import Subreddit_Data_Collector
+from Task_Manager.Task_Metrics import Task_Metrics
+from Task_Manager.Task_Pipeline import Task_Pipeline
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks the collection and inference of a task against a replayed Reddit fixture "
+            "and the MHS stub, without writing to the database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixture', default=FIXTURE, help="The fixture recorded with record_reddit")
+        parser.add_argument('--subreddits', nargs='+', help="The subreddits to run, every recorded one by default")
+        parser.add_argument('--scope', default='week', help="The time filter of the top listing")
+        parser.add_argument('--comments', type=int, default=100, help="The comments collected per subreddit")
+        parser.add_argument('--per-post', type=int, default=100, help="The comment limit of each post")
+        parser.add_argument('--min-words', type=int, default=1)
+        parser.add_argument('--forest-width', type=int, default=10)
+        parser.add_argument('--latency', type=float, default=0.05, help="The seconds every Reddit request takes")
+        parser.add_argument('--jitter', type=float, default=0.05, help="The most seconds added to a Reddit request")
+        parser.add_argument('--seed', type=int, default=0, help="Seeds the jitter and the stub's scores")
+        parser.add_argument('--api-latency', type=float, default=0.05, help="The seconds every MHS request takes")
+        parser.add_argument('--per-item-latency', type=float, default=0.001,
+                            help="The seconds added per comment in an MHS request")
+        parser.add_argument('--chunk-size', type=int, default=100)
+        parser.add_argument('--max-workers', type=int, default=4)
+        parser.add_argument('--calls-per-minute', type=int, default=6000)
+        parser.add_argument('--max-in-flight', type=int, default=4)
+        parser.add_argument('--target-latency', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        fixture = Reddit_Fixture.load(options['fixture'])
+        subreddits = options['subreddits'] or list(fixture.subreddits.keys())
+        reddit = Replay_Reddit(fixture, latency=options['latency'], jitter=options['jitter'], seed=options['seed'])
+        metrics = Task_Metrics()
+        sdc = Subreddit_Data_Collector(reddit, rate_limiter=Rate_Limiter(options['calls_per_minute']),
+                                       metrics=metrics)
+
+        with MHS_Stub_Server(seed=options['seed'], latency=options['api_latency'],
+                             per_item_latency=options['per_item_latency']) as server:
+            inf = Inferencer("benchmark", server.url, max_in_flight=options['max_in_flight'],
+                             budget=Batch_Budget(target_latency=options['target_latency']), metrics=metrics)
+            pipeline = Task_Pipeline(Collection_Pool(sdc, options['max_workers'], metrics), inf,
+                                     options['chunk_size'], metrics=metrics)
+            start = time.perf_counter()
+            comments = 0
+            for sub, batch in pipeline.run(subreddits, scope=options['scope'], min_words=options['min_words'],
+                                           forest_width=options['forest_width'], per_post_n=options['per_post'],
+                                           comments_n=options['comments']):
+                comments += len(batch)
+            wall_time = time.perf_counter() - start
+            inf.close()
+
+        summary = metrics.summary()
+        self.stdout.write(json.dumps({'subreddits': len(subreddits),
+                                      'failed': sorted(pipeline.failures),
+                                      'comments': comments,
+                                      'wall_time': round(wall_time, 3),
+                                      'comments_per_sec': round(comments / wall_time, 1) if wall_time > 0 else None,
+                                      'reddit_requests': reddit.requests,
+                                      'mhs_requests': server.requests,
+                                      'stages': summary['stages']}, indent=2))
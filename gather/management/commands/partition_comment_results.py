@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from Task_Manager import Task_Manager
+from Task_Manager.Comment_Partitions import Comment_Partitions
+
+
+class Command(BaseCommand):
+    help = "Partitions toxit_comment_result by ranges of task ids on PostgreSQL, or detaches old partitions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks-per-partition', type=int, default=Task_Manager.tasks_per_partition,
+                            help="The number of task ids in each partition")
+        parser.add_argument('--detach-before', type=int,
+                            help="Detach the partitions holding only tasks before this task id")
+
+    def handle(self, *args, **options):
+        partitions = Comment_Partitions(options['tasks_per_partition'])
+        if options['detach_before'] is not None:
+            for name in partitions.detach(options['detach_before']):
+                self.stdout.write(f"Detached {name}")
+            return
+        partitions.convert()
+        if not partitions.partitioned:
+            self.stderr.write("Partitioning needs PostgreSQL, the table was left as it is")
+            return
+        for name, low, high in partitions.partitions():
+            self.stdout.write(f"{name}: tasks {low} to {high - 1}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from Task_Manager.Trend_Rollup import Trend_Rollup
+
+
+class Command(BaseCommand):
+    help = "Recomputes toxit_subreddit_trend from every stored result, such as after results were deleted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('subreddits', nargs='*',
+                            help="The display names of the subreddits to rebuild, every subreddit if none are given")
+
+    def handle(self, *args, **options):
+        count = Trend_Rollup().rebuild(options['subreddits'] or None)
+        self.stdout.write(f"Rolled up {count} results")
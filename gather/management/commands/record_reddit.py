@@ -0,0 +1,27 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from Task_Manager.Reddit_Fixture import Reddit_Fixture
+from Task_Manager.Reddit_Session import Reddit_Session
+
+
+class Command(BaseCommand):
+    help = "Records live Reddit responses for the given subreddits into a fixture for Replay_Reddit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The fixture file, extended if it already exists")
+        parser.add_argument('subreddits', nargs='+', help="The display names of the subreddits to record")
+        parser.add_argument('--scope', default='week', help="The time filter of the top listing")
+        parser.add_argument('--posts', type=int, default=25, help="The number of posts recorded per subreddit")
+        parser.add_argument('--per-post', type=int, default=1000, help="The comment limit of each post")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fixture = Reddit_Fixture.load(path) if os.path.exists(path) else Reddit_Fixture()
+        reddit = Reddit_Session().get()
+        for display_name in options['subreddits']:
+            fixture.record(reddit, display_name, options['scope'], options['posts'], options['per_post'])
+            posts = fixture.subreddits[display_name]['top'][options['scope']]
+            self.stdout.write(f"Recorded r/{display_name}: {len(posts)} posts")
+        fixture.save(path)
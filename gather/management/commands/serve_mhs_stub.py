@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from Task_Manager.MHS_Stub_Server import MHS_Stub_Server
+
+
+class Command(BaseCommand):
+    help = "Serves a local stand-in for the MHS inference API"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8501)
+        parser.add_argument('--seed', type=int, default=0, help="Seeds the scores and the injected errors")
+        parser.add_argument('--latency', type=float, default=0.0, help="The seconds every request takes")
+        parser.add_argument('--per-item-latency', type=float, default=0.0,
+                            help="The seconds added per comment in a request")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="The share of requests that fail")
+        parser.add_argument('--error-status', type=int, default=503, help="The status of a failed request")
+        parser.add_argument('--max-concurrency', type=int, help="The most requests served at once")
+        parser.add_argument('--max-instances', type=int, help="The most comments per request")
+        parser.add_argument('--max-chars', type=int, help="The most characters per request")
+        parser.add_argument('--api-key', help="The apikey header required of every request")
+
+    def handle(self, *args, **options):
+        server = MHS_Stub_Server(host=options['host'], port=options['port'], seed=options['seed'],
+                                 latency=options['latency'], per_item_latency=options['per_item_latency'],
+                                 error_rate=options['error_rate'], error_status=options['error_status'],
+                                 max_concurrency=options['max_concurrency'],
+                                 max_instances=options['max_instances'], max_chars=options['max_chars'],
+                                 api_key=options['api_key'])
+        self.stdout.write(f"Serving the MHS stub at {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
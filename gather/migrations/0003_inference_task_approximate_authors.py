@@ -0,0 +1,29 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:02
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0002_alter_author_edge_from_sub_alter_author_edge_to_sub_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inference_task',
+            name='approximate_authors',
+            field=models.BooleanField(default=False, help_text='Estimate the author edges from MinHash sketches instead of the exact author sets'),
+        ),
+        migrations.AddField(
+            model_name='inference_task',
+            name='author_edge_error',
+            field=models.FloatField(blank=True, help_text='Standard error bound of approximate author edge weights, relative to the sum of both author counts', null=True),
+        ),
+        migrations.AlterField(
+            model_name='inference_task',
+            name='forest_width',
+            field=models.IntegerField(default=10, help_text='[DEPRECIATED]', validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0003_inference_task_approximate_authors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inference_task',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, help_text="When the worker's claim on the task lapses unless it is renewed", null=True),
+        ),
+        migrations.AddField(
+            model_name='inference_task',
+            name='worker',
+            field=models.CharField(blank=True, help_text='The worker that has claimed the task', max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# the channel that Task_Manager.Task_Listener listens on
+CHANNEL = 'inference_task'
+
+CREATE = f'''
+CREATE OR REPLACE FUNCTION toxit_inference_task_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANNEL}', NEW.id::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER toxit_inference_task_notify
+    AFTER INSERT OR UPDATE OF start_sched, status ON toxit_inference_task
+    FOR EACH ROW WHEN (NEW.status = 0)
+    EXECUTE FUNCTION toxit_inference_task_notify();
+'''
+
+DROP = '''
+DROP TRIGGER IF EXISTS toxit_inference_task_notify ON toxit_inference_task;
+DROP FUNCTION IF EXISTS toxit_inference_task_notify();
+'''
+
+
+def create_trigger(apps, schema_editor):
+    # saves from any client, not only this app, wake the listening workers
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE)
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0004_inference_task_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0005_inference_task_notify'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Subreddit_status',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('display_name', models.CharField(help_text='The display name of the subreddit as requested', max_length=255)),
+                ('status', models.PositiveSmallIntegerField(choices=[('0', 'Completed'), ('1', 'Partially Scored'), ('2', 'Failed')], help_text='The outcome for this subreddit')),
+                ('attempts', models.PositiveSmallIntegerField(default=1, help_text='The number of times the subreddit was attempted')),
+                ('unscored', models.PositiveIntegerField(default=0, help_text='The number of comments that could not be scored')),
+                ('error', models.TextField(blank=True, help_text='The traceback of the last failed attempt', null=True)),
+                ('inference_task', models.ForeignKey(help_text='The inference task that requested the subreddit', on_delete=django.db.models.deletion.CASCADE, to='gather.inference_task')),
+                ('subreddit_result', models.OneToOneField(blank=True, help_text='The results of the subreddit, unless it failed', null=True, on_delete=django.db.models.deletion.CASCADE, to='gather.subreddit_result')),
+            ],
+            options={
+                'db_table': 'toxit_subreddit_status',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='subreddit_status',
+            constraint=models.UniqueConstraint(fields=('inference_task', 'display_name'), name='toxit_subreddit_status_unique'),
+        ),
+    ]
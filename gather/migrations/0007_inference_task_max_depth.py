@@ -0,0 +1,24 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:15
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0006_subreddit_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inference_task',
+            name='max_depth',
+            field=models.IntegerField(blank=True, help_text='The deepest level of replies harvested, 0 for top level comments only, empty for no limit', null=True, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AlterField(
+            model_name='inference_task',
+            name='forest_width',
+            field=models.IntegerField(default=10, help_text='The most top level comments, and replies to each comment, harvested per post, 0 for no limit', validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
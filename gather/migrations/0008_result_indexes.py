@@ -0,0 +1,54 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def copy_inference_task(apps, schema_editor):
+    Comment_result = apps.get_model('gather', 'Comment_result')
+    Subreddit_result = apps.get_model('gather', 'Subreddit_result')
+    # checking the new foreign keys at once leaves no pending trigger events to block the ALTER TABLE below
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    Comment_result.objects.update(inference_task=Subquery(
+        Subreddit_result.objects.filter(pk=OuterRef('subreddit_result')).values('inference_task')[:1]))
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0007_inference_task_max_depth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment_result',
+            name='inference_task',
+            field=models.ForeignKey(help_text='The task of the result, the partition key when the table is partitioned', null=True, on_delete=django.db.models.deletion.CASCADE, to='gather.inference_task'),
+        ),
+        migrations.RunPython(copy_inference_task, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='comment_result',
+            name='inference_task',
+            field=models.ForeignKey(help_text='The task of the result, the partition key when the table is partitioned', on_delete=django.db.models.deletion.CASCADE, to='gather.inference_task'),
+        ),
+        migrations.AddIndex(
+            model_name='comment_result',
+            index=models.Index(fields=['subreddit_result', 'mhs_score'], name='toxit_comment_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inference_task',
+            index=models.Index(fields=['status', 'start_sched'], name='toxit_task_status_sched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subreddit_result',
+            index=models.Index(fields=['inference_task', 'subreddit'], name='toxit_result_task_sub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subreddit_result',
+            index=models.Index(fields=['subreddit', 'timestamp'], name='toxit_result_sub_time_idx'),
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 4.1.5 on 2026-10-18 15:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+# the most rows read or written at once while the data is moved
+BATCH = 1000
+
+# the end of the permalink, as Comment.id_from_permalink, or legacy<pk> where that is no id, in PostgreSQL
+END_SQL = "substring(rtrim(permalink, '/') from '[^/]*$')"
+REDDIT_ID_SQL = f"CASE WHEN {END_SQL} = '' OR length({END_SQL}) > 20 THEN 'legacy' || id ELSE {END_SQL} END"
+
+
+def reddit_id(pk, permalink):
+    end = permalink.rstrip('/').rsplit('/', 1)[-1]
+    return f"legacy{pk}" if end == '' or len(end) > 20 else end
+
+
+def normalise(apps, schema_editor):
+    Author = apps.get_model('gather', 'Author')
+    Comment = apps.get_model('gather', 'Comment')
+    Comment_result = apps.get_model('gather', 'Comment_result')
+    Subreddit_mod = apps.get_model('gather', 'Subreddit_mod')
+    quote = schema_editor.quote_name
+    author, comment, result, mod = (quote(model._meta.db_table) for model in (Author, Comment, Comment_result,
+                                                                               Subreddit_mod))
+    postgresql = schema_editor.connection.vendor == 'postgresql'
+    # checking the new foreign keys at once leaves no pending trigger events to block the ALTER TABLE below
+    if postgresql:
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    schema_editor.execute(f"INSERT INTO {author} (name) "
+                          f"SELECT username FROM {result} UNION SELECT username FROM {mod}")
+
+    # the id of a comment is the end of its permalink, the latest sample of a comment is kept
+    if postgresql:
+        schema_editor.execute(
+            f"INSERT INTO {comment} (reddit_id, author_id, permalink, body, edited) "
+            f"SELECT DISTINCT ON (r.reddit_id) r.reddit_id, a.id, r.permalink, r.comment_body, false "
+            f"FROM (SELECT id, username, permalink, comment_body, {REDDIT_ID_SQL} AS reddit_id "
+            f"FROM {result}) r JOIN {author} a ON a.name = r.username "
+            f"ORDER BY r.reddit_id, r.id DESC")
+        schema_editor.execute(f"UPDATE {result} SET comment_id = {REDDIT_ID_SQL}")
+    else:
+        # in chunks of primary keys, each written before the next is read
+        last = 0
+        while True:
+            rows = list(Comment_result.objects.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', 'permalink', 'comment_body', 'username')[:BATCH])
+            if len(rows) == 0:
+                break
+            last = rows[-1][0]
+            authors = dict(Author.objects.filter(name__in={username for *_, username in rows})
+                           .values_list('name', 'id'))
+            comments = {}
+            results = []
+            for pk, permalink, body, username in rows:
+                id = reddit_id(pk, permalink)
+                comments[id] = Comment(reddit_id=id, author_id=authors[username], permalink=permalink, body=body)
+                results.append(Comment_result(pk=pk, comment_id=id))
+            # a comment sampled again in a later chunk overwrites the earlier sample
+            Comment.objects.bulk_create(comments.values(), update_conflicts=True, unique_fields=['reddit_id'],
+                                        update_fields=['author', 'permalink', 'body'])
+            Comment_result.objects.bulk_update(results, ['comment'])
+
+    Subreddit_mod.objects.update(author=Subquery(
+        Author.objects.filter(name=OuterRef('username')).values('id')[:1]))
+    if postgresql:
+        schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0008_result_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The username of the redditor', max_length=32, unique=True)),
+            ],
+            options={
+                'db_table': 'toxit_author',
+            },
+        ),
+        migrations.CreateModel(
+            name='Comment',
+            fields=[
+                ('reddit_id', models.CharField(help_text='Custom key from reddit', max_length=20, primary_key=True, serialize=False)),
+                ('permalink', models.TextField(help_text='The permalink to the comment')),
+                ('body', models.TextField(help_text='The sanitized text of the comment')),
+                ('edited', models.BooleanField(default=False, help_text='Whether the comment had been edited when it was last harvested')),
+                ('author', models.ForeignKey(help_text='The author of the comment', on_delete=django.db.models.deletion.CASCADE, to='gather.author')),
+            ],
+            options={
+                'db_table': 'toxit_comment',
+            },
+        ),
+        migrations.AddField(
+            model_name='comment_result',
+            name='comment',
+            field=models.ForeignKey(help_text='The comment sample, shared by every task that harvested it', null=True, on_delete=django.db.models.deletion.CASCADE, to='gather.comment'),
+        ),
+        migrations.AddField(
+            model_name='subreddit_mod',
+            name='author',
+            field=models.ForeignKey(help_text='The moderator', null=True, on_delete=django.db.models.deletion.CASCADE, to='gather.author'),
+        ),
+        migrations.RunPython(normalise, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='comment_result',
+            name='comment',
+            field=models.ForeignKey(help_text='The comment sample, shared by every task that harvested it', on_delete=django.db.models.deletion.CASCADE, to='gather.comment'),
+        ),
+        migrations.AlterField(
+            model_name='subreddit_mod',
+            name='author',
+            field=models.ForeignKey(help_text='The moderator', on_delete=django.db.models.deletion.CASCADE, to='gather.author'),
+        ),
+        migrations.RemoveField(
+            model_name='comment_result',
+            name='comment_body',
+        ),
+        migrations.RemoveField(
+            model_name='comment_result',
+            name='permalink',
+        ),
+        migrations.RemoveField(
+            model_name='comment_result',
+            name='username',
+        ),
+        migrations.RemoveField(
+            model_name='subreddit_mod',
+            name='username',
+        ),
+    ]
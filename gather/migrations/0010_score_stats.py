@@ -0,0 +1,28 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0009_author_comment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subreddit_result',
+            name='histogram',
+            field=models.JSONField(blank=True, help_text='The bin edges of the scores and the number of scores in each bin', null=True),
+        ),
+        migrations.AddField(
+            model_name='subreddit_result',
+            name='percentiles',
+            field=models.JSONField(blank=True, help_text='Estimates of the 1st, 5th, 25th, 50th, 75th, 95th and 99th percentile scores, by percentile', null=True),
+        ),
+        migrations.AlterField(
+            model_name='comment_result',
+            name='mhs_score',
+            field=models.FloatField(blank=True, help_text='The mhs inference score of the sample, empty if it could not be scored', null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0010_score_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Subreddit_trend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_scale', models.CharField(choices=[('hour', 'This Hour'), ('day', 'Today'), ('week', 'This Week'), ('month', 'This Month'), ('year', 'This Year'), ('all', 'All Time')], help_text='The period overwhich the comments of the rolled up results were harvested', max_length=5)),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], help_text='The length of the bucket', max_length=5)),
+                ('start', models.DateTimeField(help_text='The start of the bucket')),
+                ('results', models.PositiveIntegerField(default=0, help_text='The number of results collected during the bucket')),
+                ('scored', models.PositiveIntegerField(default=0, help_text='The number of scored comments of those results')),
+                ('min_result', models.FloatField(blank=True, help_text='The minimum score during the bucket', null=True)),
+                ('max_result', models.FloatField(blank=True, help_text='The maximum score during the bucket', null=True)),
+                ('mean_result', models.FloatField(blank=True, help_text='The average score of every scored comment during the bucket', null=True)),
+                ('std_result', models.FloatField(blank=True, help_text='The standard deviation of every scored comment during the bucket', null=True)),
+                ('histogram', models.JSONField(blank=True, help_text='The sum of the histograms of the results', null=True)),
+                ('subreddit', models.ForeignKey(help_text='The subreddit of the trend', on_delete=django.db.models.deletion.CASCADE, to='gather.subreddit')),
+            ],
+            options={
+                'db_table': 'toxit_subreddit_trend',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='subreddit_trend',
+            constraint=models.UniqueConstraint(fields=('subreddit', 'time_scale', 'period', 'start'), name='toxit_subreddit_trend_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gather', '0011_subreddit_trend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inference_task',
+            name='metrics',
+            field=models.JSONField(blank=True, help_text='The wall time, throughput, api calls, retries, database round trips and memory growth of each stage of the last run, in total and per subreddit, and the peak memory of the task', null=True),
+        ),
+    ]
@@ -26,6 +26,10 @@ class Subreddit(models.Model):
 class Inference_task(models.Model):
     class Meta:
         db_table = 'toxit_inference_task'
+        indexes = [
+            # claiming the next due task, see `Task_Queue`
+            models.Index(fields=['status', 'start_sched'], name='toxit_task_status_sched_idx'),
+        ]
     TIME_SCALES =   [
                     ('hour', 'This Hour'),
                     ('day', 'Today'),
@@ -47,7 +51,10 @@ class Inference_task(models.Model):
                                     help_text="The period overwhich the comments will be harvested")
     min_words = models.IntegerField(default=20, null=True, validators=[MinValueValidator(1), MaxValueValidator(168)],
                                     help_text="The minimum number of words to be considered a valid comment")
-    forest_width = models.IntegerField(default=10, validators=[MinValueValidator(0)], help_text="[DEPRECIATED]")
+    forest_width = models.IntegerField(default=10, validators=[MinValueValidator(0)],
+                                    help_text="The most top level comments, and replies to each comment, harvested per post, 0 for no limit")
+    max_depth = models.IntegerField(blank=True, null=True, validators=[MinValueValidator(0)],
+                                    help_text="The deepest level of replies harvested, 0 for top level comments only, empty for no limit")
     per_post_n = models.IntegerField(default=1000, validators=[MinValueValidator(1)],
                                     help_text="The maximum number of comments per post to be harvested")
     comments_n = models.IntegerField(default=1000, validators=[MinValueValidator(1)],
@@ -56,6 +63,16 @@ class Inference_task(models.Model):
                                     help_text="A set of the subreddits to be harvested")
     status = models.PositiveSmallIntegerField(choices=STATUS_TYPES,
                                     help_text="The status of the task")
+    approximate_authors = models.BooleanField(default=False,
+                                    help_text="Estimate the author edges from MinHash sketches instead of the exact author sets")
+    author_edge_error = models.FloatField(blank=True, null=True,
+                                    help_text="Standard error bound of approximate author edge weights, relative to the sum of both author counts")
+    worker = models.CharField(max_length=255, blank=True, null=True,
+                                    help_text="The worker that has claimed the task")
+    lease_expires = models.DateTimeField(blank=True, null=True,
+                                    help_text="When the worker's claim on the task lapses unless it is renewed")
+    metrics = models.JSONField(blank=True, null=True,
+                                    help_text="The wall time, throughput, api calls, retries, database round trips and memory growth of each stage of the last run, in total and per subreddit, and the peak memory of the task")
 
     def __str__(self):
         if (self.start_sched):
@@ -65,6 +82,11 @@ class Inference_task(models.Model):
 class Subreddit_result(models.Model):
     class Meta:
         db_table = 'toxit_subreddit_result'
+        indexes = [
+            models.Index(fields=['inference_task', 'subreddit'], name='toxit_result_task_sub_idx'),
+            # the history of a subreddit across tasks
+            models.Index(fields=['subreddit', 'timestamp'], name='toxit_result_sub_time_idx'),
+        ]
     subreddit = models.ForeignKey(Subreddit, on_delete=models.CASCADE,
                                     help_text="The subreddit that was analyzed")
     inference_task = models.ForeignKey(Inference_task, on_delete=models.CASCADE,
@@ -77,6 +99,10 @@ class Subreddit_result(models.Model):
                                     help_text="The average score from this subreddit")
     std_result = models.FloatField(blank=True, null=True,
                                     help_text="The standard deviation for this subreddit")
+    percentiles = models.JSONField(blank=True, null=True,
+                                    help_text="Estimates of the 1st, 5th, 25th, 50th, 75th, 95th and 99th percentile scores, by percentile")
+    histogram = models.JSONField(blank=True, null=True,
+                                    help_text="The bin edges of the scores and the number of scores in each bin")
     timestamp = models.DateTimeField(auto_now_add=True,
                                     help_text="The time when the data was collected")
     edges = models.JSONField(help_text="The edges for this subreddit")
@@ -85,30 +111,141 @@ class Subreddit_result(models.Model):
         return f"Results for {self.subreddit} collected on {self.inference_task.start_sched}"
 
 
+class Subreddit_trend(models.Model):
+    class Meta:
+        db_table = 'toxit_subreddit_trend'
+        constraints = [
+            # also the index of a trend query, a subreddit's buckets of one scale and period in order
+            models.UniqueConstraint(fields=['subreddit', 'time_scale', 'period', 'start'],
+                                    name='toxit_subreddit_trend_unique'),
+        ]
+    PERIODS =       [
+                    ('day', 'Day'),
+                    ('week', 'Week'),
+                    ('month', 'Month')
+                    ]
+    subreddit = models.ForeignKey(Subreddit, on_delete=models.CASCADE,
+                                    help_text="The subreddit of the trend")
+    time_scale = models.CharField(max_length=5, choices=Inference_task.TIME_SCALES,
+                                    help_text="The period overwhich the comments of the rolled up results were harvested")
+    period = models.CharField(max_length=5, choices=PERIODS,
+                                    help_text="The length of the bucket")
+    start = models.DateTimeField(help_text="The start of the bucket")
+    results = models.PositiveIntegerField(default=0,
+                                    help_text="The number of results collected during the bucket")
+    scored = models.PositiveIntegerField(default=0,
+                                    help_text="The number of scored comments of those results")
+    min_result = models.FloatField(blank=True, null=True,
+                                    help_text="The minimum score during the bucket")
+    max_result = models.FloatField(blank=True, null=True,
+                                    help_text="The maximum score during the bucket")
+    mean_result = models.FloatField(blank=True, null=True,
+                                    help_text="The average score of every scored comment during the bucket")
+    std_result = models.FloatField(blank=True, null=True,
+                                    help_text="The standard deviation of every scored comment during the bucket")
+    histogram = models.JSONField(blank=True, null=True,
+                                    help_text="The sum of the histograms of the results")
+
+    def __str__(self):
+        return f"Trend of {self.subreddit} for the {self.period} of {self.start:%Y-%m-%d}"
+
+
+class Subreddit_status(models.Model):
+    class Meta:
+        db_table = 'toxit_subreddit_status'
+        constraints = [models.UniqueConstraint(fields=['inference_task', 'display_name'],
+                                               name='toxit_subreddit_status_unique')]
+    STATUS_TYPES = [
+                    ('0', 'Completed'),
+                    ('1', 'Partially Scored'),
+                    ('2', 'Failed')
+                    ]
+    inference_task = models.ForeignKey(Inference_task, on_delete=models.CASCADE,
+                                    help_text="The inference task that requested the subreddit")
+    display_name = models.CharField(max_length=255,
+                                    help_text="The display name of the subreddit as requested")
+    subreddit_result = models.OneToOneField(Subreddit_result, blank=True, null=True, on_delete=models.CASCADE,
+                                    help_text="The results of the subreddit, unless it failed")
+    status = models.PositiveSmallIntegerField(choices=STATUS_TYPES,
+                                    help_text="The outcome for this subreddit")
+    attempts = models.PositiveSmallIntegerField(default=1,
+                                    help_text="The number of times the subreddit was attempted")
+    unscored = models.PositiveIntegerField(default=0,
+                                    help_text="The number of comments that could not be scored")
+    error = models.TextField(blank=True, null=True,
+                                    help_text="The traceback of the last failed attempt")
+
+    def __str__(self):
+        return f"{self.display_name} in {self.inference_task}: {dict(self.STATUS_TYPES).get(str(self.status))}"
+
+
+class Author(models.Model):
+    class Meta:
+        db_table = 'toxit_author'
+    name = models.CharField(max_length=32, unique=True,
+                                    help_text="The username of the redditor")
+
+    def __str__(self):
+        return self.name
+
+
+class Comment(models.Model):
+    class Meta:
+        db_table = 'toxit_comment'
+    reddit_id = models.CharField(primary_key=True, max_length=20,
+                                    help_text="Custom key from reddit")
+    author = models.ForeignKey(Author, on_delete=models.CASCADE,
+                                    help_text="The author of the comment")
+    permalink = models.TextField(help_text='The permalink to the comment')
+    body = models.TextField(help_text='The sanitized text of the comment')
+    edited = models.BooleanField(default=False,
+                                    help_text="Whether the comment had been edited when it was last harvested")
+
+    @staticmethod
+    def id_from_permalink(permalink: str) -> str:
+        # a comment's permalink ends with its id, /r/<sub>/comments/<post>/<title>/<id>/
+        return permalink.rstrip('/').rsplit('/', 1)[-1]
+
+    def __str__(self):
+        return f"Comment {self.reddit_id} by {self.author}"
+
+
 class Subreddit_mod(models.Model):
     class Meta:
         db_table = 'toxit_subreddit_mod'
     subreddit = models.ForeignKey(Subreddit, on_delete=models.CASCADE)
     subreddit_result = models.ForeignKey(Subreddit_result, on_delete=models.CASCADE,
                                     help_text="The collection that the user was a moderator during")
-    username = models.CharField(max_length=32,
-                                    help_text="The username of the moderator")
+    author = models.ForeignKey(Author, on_delete=models.CASCADE,
+                                    help_text="The moderator")
     def __str__(self):
-        return f"User: {self.username}, Subreddit: {self.subreddit_result.subreddit}"
+        return f"User: {self.author.name}, Subreddit: {self.subreddit_result.subreddit}"
 
 
 class Comment_result(models.Model):
     class Meta:
         db_table = 'toxit_comment_result'
+        indexes = [
+            # the highest and lowest scoring comments of a result
+            models.Index(fields=['subreddit_result', 'mhs_score'], name='toxit_comment_score_idx'),
+        ]
     subreddit_result = models.ForeignKey(Subreddit_result, on_delete=models.CASCADE)
+    inference_task = models.ForeignKey(Inference_task, on_delete=models.CASCADE,
+                                    help_text="The task of the result, the partition key when the table is partitioned")
     subreddit = models.ForeignKey(Subreddit, on_delete=models.CASCADE)
-    permalink = models.TextField(help_text='The permalink to the comment sample')
-    mhs_score = models.FloatField(default=0, help_text='The mhs inference score of the sample')
-    comment_body = models.TextField(help_text='The comment sample')
-    username = models.CharField(max_length=32, help_text='The username of the commentor')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE,
+                                    help_text="The comment sample, shared by every task that harvested it")
+    mhs_score = models.FloatField(blank=True, null=True,
+                                    help_text='The mhs inference score of the sample, empty if it could not be scored')
+
+    def save(self, *args, **kwargs):
+        # the task is copied from the result so that the partition key is always set
+        if self.inference_task_id is None:
+            self.inference_task_id = self.subreddit_result.inference_task_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Post By: {self.username} in: {self.subreddit.display_name}.\nScore: {self.mhs_score}.\nText: {self.comment_body}"
+        return f"Post By: {self.comment.author.name} in: {self.subreddit.display_name}.\nScore: {self.mhs_score}.\nText: {self.comment.body}"
 
 
 class Author_edge(models.Model):
@@ -1,6 +1,6 @@
 from django.test import TestCase
 from django.utils import timezone
-from .models import Subreddit, Inference_task, Subreddit_mod, Subreddit_result, Comment_result
+from .models import Author, Comment, Subreddit, Inference_task, Subreddit_mod, Subreddit_result, Comment_result
 from django.db.utils import IntegrityError
 from django.db.transaction import TransactionManagementError
 
@@ -142,16 +142,16 @@ class Subreddit_Mod_Test(TestCase):
         Subreddit_mod.objects.create(
             subreddit=subreddit,
             subreddit_result=subreddit_result,
-            username="test_user"
+            author=Author.objects.create(name="test_user")
         )
 
     def test_str_representation(self):
-        mod = Subreddit_mod.objects.get(username="test_user")
+        mod = Subreddit_mod.objects.get(author__name="test_user")
         self.assertEqual(
             str(mod), "User: test_user, Subreddit: test_subreddit")
 
     def test_foreign_key_relationships(self):
-        mod = Subreddit_mod.objects.get(username="test_user")
+        mod = Subreddit_mod.objects.get(author__name="test_user")
         self.assertEqual(mod.subreddit.display_name, "test_subreddit")
         self.assertEqual(
             mod.subreddit_result.subreddit.display_name, "test_subreddit")
@@ -180,15 +180,19 @@ class CommentResultModelTestCase(TestCase):
             std_result=2.0,
             edges=[{"node1": "a", "node2": "b"}]
         )
+        self.comment = Comment.objects.create(
+            reddit_id='abc123',
+            author=Author.objects.create(name='testuser'),
+            permalink='/r/test/comments/xyz/test_comment/abc123/',
+            body='This is a test comment'
+        )
 
     def test_comment_result_str(self):
         comment_result = Comment_result.objects.create(
             subreddit_result=self.subreddit_result,
             subreddit=self.subreddit,
-            permalink='https://www.example.com/test_comment',
-            mhs_score=0.5,
-            comment_body='This is a test comment',
-            username='testuser'
+            comment=self.comment,
+            mhs_score=0.5
         )
         self.assertEqual(str(
             comment_result), "Post By: testuser in: Test Subreddit.\nScore: 0.5.\nText: This is a test comment")
@@ -197,10 +201,14 @@ class CommentResultModelTestCase(TestCase):
         comment_result = Comment_result.objects.create(
             subreddit_result=self.subreddit_result,
             subreddit=self.subreddit,
-            permalink='https://www.example.com/test_comment',
-            mhs_score=0.5,
-            comment_body='This is a test comment',
-            username='testuser')
+            comment=self.comment,
+            mhs_score=0.5)
         self.assertEqual(comment_result.subreddit_result,
                          self.subreddit_result)
         self.assertEqual(comment_result.subreddit, self.subreddit)
+        self.assertEqual(comment_result.inference_task, self.inference_task)
+        self.assertEqual(comment_result.comment.author.name, 'testuser')
+
+    def test_comment_id_from_permalink(self):
+        self.assertEqual(Comment.id_from_permalink(self.comment.permalink), 'abc123')
+        self.assertEqual(str(self.comment), "Comment abc123 by testuser")
@@ -1,17 +1,14 @@
 import os
 import json
-import praw
 import django
 import datetime
 import pytz
-import time
 import logging
 import traceback
 import google.cloud.logging
 
-from google.cloud import secretmanager
+from mysite.secret_provider import fetch_secret, get_provider
 
-# TODO: further abstract away the settings fetching and secrets etc
 # TODO: validate that the fetching logic is sound and what we need
 
 # setup google cloud logging handler
@@ -19,16 +16,6 @@ client = google.cloud.logging.Client()
 client.setup_logging()
 
 
-def fetch_secret(secret_id):
-    '''
-    This utility function returns a secret payload at runtime using the secure google secrets API 
-    '''
-    client = secretmanager.SecretManagerServiceClient()
-    name = f"projects/mhs-reddit/secrets/{secret_id}/versions/latest"
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode('UTF-8')
-
-
 def main():
     '''
     This pseudocode describes the main loop function of the Gather bot.  
@@ -36,13 +23,13 @@ def main():
     now = now()
 
     FROM toxit_inference_task table as job
-        fetch most recent record
-            WHERE start_sched > now AND status == 0
+        claim the earliest record, skipping records locked by other workers
+            WHERE (start_sched <= now AND status == 0) OR (status == 1 AND lease expired)
 
-                if None job wait 10 seconds and loop
+                if None job wait for a new job or until the next start_sched and loop
 
     if job exists start inference task on job
-        set job.status == 1
+        set job.status == 1 with a lease, renewed by heartbeats while the task runs
 
         if inference task succeeds
             set job.status = 2 and loop
@@ -56,50 +43,42 @@ def main():
     # copying how manage.py does it for some reason we must import the libs here and not at the top
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
     django.setup()
-    from Task_Manager import Task_Manager
-    from gather.models import Inference_task
+    from Task_Manager import Reddit_Session, Task_Listener, Task_Manager, Task_Queue
 
     logging.info("Starting Task Manager...")
     task_manager = Task_Manager()
+    task_queue = Task_Queue()
+    listener = Task_Listener()
+    # one praw object is kept across tasks and only rebuilt when its credentials change
+    reddit = Reddit_Session()
     while True:
-        # fetch and construct praw object
-        praw_obj = praw.Reddit(
-            client_id=fetch_secret('praw_client_id'),
-            client_secret=fetch_secret('praw_client_secret'),
-            password=fetch_secret('praw_client_password'),
-            user_agent=fetch_secret('praw_user_agent'),
-            username=fetch_secret('praw_user_name'),
-        )
-
-        # set readonly mode
-        praw_obj.read_only = False
-
         # when is now?
         now = datetime.datetime.now(pytz.timezone('America/Regina'))
 
-        # try to fetch a task from the database
-        task = Inference_task.objects.filter(
-            start_sched__lte=now, status=0).first()
+        # try to claim a task from the database, a task whose worker died resumes from its checkpoints
+        task = task_queue.claim(now)
         if task == None:
+            # sleep until the next task is due, or a new one is scheduled
             logging.debug('Task Manager is Idle...')
-            time.sleep(10)
-            continue
-        logging.info(f"Starting task: {task}")
-        task.status = 1
-        task.save()
-        try:
-            task_manager.do_Task(task, fetch_secret(
-                'mhs_api_url'), fetch_secret('mhs_api_key'), praw_obj)
-        except:
-            logging.error(f"UNABLE TO COMPLETE: {task}")
-            logging.error(traceback.format_exc())
-            task.status = 3
-            task.save()
+            due = task_queue.next_due(now)
+            listener.wait(None if due == None else (due - now).total_seconds())
             continue
+        logging.info(f"Starting task: {task} on {task_queue.worker_id}")
+        with task_queue.keep_alive(task):
+            try:
+                task_manager.do_Task(task, fetch_secret(
+                    'mhs_api_url'), fetch_secret('mhs_api_key'), reddit.get(), worker=task_queue.worker_id)
+            except:
+                logging.error(f"UNABLE TO COMPLETE: {task}")
+                logging.error(traceback.format_exc())
+                task_queue.release(task, 3)
+                # the failure may be a rotated credential, read every secret again for the next task
+                get_provider().invalidate()
+                reddit.invalidate()
+                continue
         # at this point in the code we have a job object, do we want to do anything with it?
         logging.info(f"Completed task: {task}")
-        task.status = 2
-        task.save()
+        task_queue.release(task, 2)
 
 
 if __name__ == '__main__':
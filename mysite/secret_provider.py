@@ -0,0 +1,114 @@
+'''
+The single source of secrets for the settings, the main loop and the tests.
+
+Secrets are read from the google secrets API by default. Setting `MHS_SECRETS=local` reads them
+from the environment instead, as `MHS_SECRET_<SECRET_ID>` variables, or from the JSON object in
+the file named by `MHS_SECRETS_FILE`, for offline runs. This module is imported by the settings,
+so it must not depend on Django.
+'''
+
+import json
+import os
+import threading
+import time
+
+
+class Google_Secret_Backend():
+    '''
+    Reads the latest version of each secret from the google secrets API with one reused client
+    '''
+
+    def __init__(self, project='mhs-reddit'):
+        self.__project = project
+        self.__client = None
+        self.__lock = threading.Lock()
+
+    def fetch(self, secret_id):
+        with self.__lock:
+            if self.__client is None:
+                from google.cloud import secretmanager
+                self.__client = secretmanager.SecretManagerServiceClient()
+        name = f"projects/{self.__project}/secrets/{secret_id}/versions/latest"
+        response = self.__client.access_secret_version(name=name)
+        return response.payload.data.decode('UTF-8')
+
+
+class Local_Secret_Backend():
+    '''
+    Reads secrets from `MHS_SECRET_<SECRET_ID>` environment variables, then from a JSON file of
+    secret ids to values. The file is read again on every fetch so that edits are picked up
+    '''
+
+    def __init__(self, path=None):
+        self.__path = path
+
+    def fetch(self, secret_id):
+        value = os.environ.get(f"MHS_SECRET_{secret_id.upper()}")
+        if value is not None:
+            return value
+        if self.__path is not None:
+            with open(self.__path) as f:
+                secrets = json.load(f)
+            if secret_id in secrets:
+                return secrets[secret_id]
+        raise KeyError(f"Secret {secret_id} is not set in the environment or {self.__path}")
+
+
+class Secret_Provider():
+    '''
+    Caches the secrets of a backend for `ttl` seconds, so that rotated secrets are picked up
+    within `ttl` without a network round trip on every read
+    '''
+
+    def __init__(self, backend, ttl=300.0):
+        self.__backend = backend
+        self.__ttl = ttl
+        self.__cache = {}
+        self.__lock = threading.Lock()
+
+    def get(self, secret_id):
+        with self.__lock:
+            cached = self.__cache.get(secret_id)
+            if cached is not None and time.monotonic() - cached[1] < self.__ttl:
+                return cached[0]
+        value = self.__backend.fetch(secret_id)
+        with self.__lock:
+            self.__cache[secret_id] = (value, time.monotonic())
+        return value
+
+    def invalidate(self, *secret_ids):
+        '''
+        Forgets the given secrets, or every secret if none are given, after a credential is rejected
+        '''
+        with self.__lock:
+            if len(secret_ids) == 0:
+                self.__cache.clear()
+            for secret_id in secret_ids:
+                self.__cache.pop(secret_id, None)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    '''
+    Returns the process wide provider, configured from the `MHS_SECRETS`, `MHS_SECRETS_FILE`
+    and `MHS_SECRETS_TTL` environment variables
+    '''
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if os.environ.get('MHS_SECRETS', 'google') == 'local':
+                backend = Local_Secret_Backend(os.environ.get('MHS_SECRETS_FILE'))
+            else:
+                backend = Google_Secret_Backend()
+            _provider = Secret_Provider(backend, float(os.environ.get('MHS_SECRETS_TTL', 300)))
+        return _provider
+
+
+def fetch_secret(secret_id):
+    '''
+    This utility function returns a secret payload at runtime from the process wide provider
+    '''
+    return get_provider().get(secret_id)
@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from .secret_provider import Google_Secret_Backend, Local_Secret_Backend, Secret_Provider
+
+
+class Secret_Provider_Test(SimpleTestCase):
+    def test_ttl_cache(self):
+        backend = Mock(fetch=Mock(side_effect=["value1", "value2", "value3"]))
+        provider = Secret_Provider(backend, ttl=60)
+        with patch('mysite.secret_provider.time.monotonic', return_value=0):
+            self.assertEqual(provider.get("secret"), "value1")
+        with patch('mysite.secret_provider.time.monotonic', return_value=59):
+            self.assertEqual(provider.get("secret"), "value1")
+        # a rotated secret is picked up once the cached value expires
+        with patch('mysite.secret_provider.time.monotonic', return_value=61):
+            self.assertEqual(provider.get("secret"), "value2")
+            provider.invalidate("secret")
+            self.assertEqual(provider.get("secret"), "value3")
+        self.assertEqual(backend.fetch.call_count, 3)
+
+    def test_google_client_reused(self):
+        client = Mock()
+        client.access_secret_version.return_value = Mock(payload=Mock(data=b"value"))
+        with patch('google.cloud.secretmanager.SecretManagerServiceClient', return_value=client) as constructor:
+            backend = Google_Secret_Backend()
+            self.assertEqual(backend.fetch("secret1"), "value")
+            backend.fetch("secret2")
+        constructor.assert_called_once()
+        client.access_secret_version.assert_called_with(name="projects/mhs-reddit/secrets/secret2/versions/latest")
+
+    def test_local_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'secrets.json')
+            with open(path, 'w') as f:
+                json.dump({"mhs_api_url": "http://localhost:8501"}, f)
+            backend = Local_Secret_Backend(path)
+            with patch.dict(os.environ, {"MHS_SECRET_MHS_API_KEY": "key"}, clear=True):
+                self.assertEqual(backend.fetch("mhs_api_key"), "key")
+                self.assertEqual(backend.fetch("mhs_api_url"), "http://localhost:8501")
+                with self.assertRaises(KeyError):
+                    backend.fetch("praw_client_id")